@@ -0,0 +1,123 @@
+"""
+Agenda del taller: duración de los turnos según el tipo de trabajo, horario de atención y
+búsqueda de horarios libres.
+
+Cada turno ocupa a su mecánico durante [fecha_hora, fin), con fin = fecha_hora + la duración
+de su tipo de trabajo (columna turnos.fin). gestor_datos busca los turnos de un mecánico por
+rango en el índice (mecanico_id, fecha_hora): como ningún turno dura más que DURACION_MAXIMA,
+los únicos que pueden superponerse con [inicio, fin) empiezan en (inicio - DURACION_MAXIMA, fin),
+y ese rango se ubica en el índice en O(log n). Este módulo no consulta la base: trabaja sobre
+los intervalos ya leídos, en orden de inicio.
+
+El horario se configura con AGENDA_APERTURA y AGENDA_CIERRE ('HH:MM'), AGENDA_DIAS (días de
+atención, 0 = lunes), AGENDA_INTERVALO (minutos entre horarios posibles) y AGENDA_HORIZONTE_DIAS
+(hasta dónde se busca un horario libre).
+"""
+import heapq
+import math
+import os
+from datetime import date, datetime, time, timedelta
+
+# Duración en minutos de cada tipo de trabajo.
+TIPOS_TRABAJO = {
+    'General': 60,
+    'Service': 60,
+    'Diagnóstico': 60,
+    'Frenos': 90,
+    'Electricidad': 90,
+    'Aire acondicionado': 90,
+    'Tren delantero': 120,
+    'Distribución': 240,
+}
+TIPO_POR_DEFECTO = 'General'
+DURACION_MAXIMA = timedelta(minutes=max(TIPOS_TRABAJO.values()))
+
+# Estados en los que un turno ocupa al mecánico (mismo criterio que ESTADOS_TURNO_OCUPA en SQL).
+ESTADOS_OCUPAN = ('Agendado', 'En Progreso')
+
+APERTURA = time.fromisoformat(os.environ.get('AGENDA_APERTURA', '08:00'))
+CIERRE = time.fromisoformat(os.environ.get('AGENDA_CIERRE', '18:00'))
+DIAS_DE_ATENCION = frozenset(int(dia) for dia in os.environ.get('AGENDA_DIAS', '0,1,2,3,4').split(','))
+if not DIAS_DE_ATENCION <= set(range(7)):
+    # Sin ningún día real, siguiente_horario no encontraría nunca una jornada.
+    raise ValueError(f"AGENDA_DIAS debe listar días de 0 (lunes) a 6 (domingo): {sorted(DIAS_DE_ATENCION)}")
+INTERVALO = timedelta(minutes=int(os.environ.get('AGENDA_INTERVALO', '30')))
+HORIZONTE = timedelta(days=int(os.environ.get('AGENDA_HORIZONTE_DIAS', '60')))
+
+
+def tipo_valido(tipo_trabajo):
+    """El tipo si es uno de TIPOS_TRABAJO; si no, TIPO_POR_DEFECTO."""
+    return tipo_trabajo if tipo_trabajo in TIPOS_TRABAJO else TIPO_POR_DEFECTO
+
+
+def duracion(tipo_trabajo):
+    return timedelta(minutes=TIPOS_TRABAJO[tipo_valido(tipo_trabajo)])
+
+
+def semana(dia):
+    """(lunes, lunes siguiente) de la semana que contiene `dia`."""
+    lunes = dia - timedelta(days=dia.weekday())
+    return lunes, lunes + timedelta(days=7)
+
+
+def siguiente_horario(momento, largo):
+    """
+    Primer horario de atención desde `momento` (inclusive), alineado a INTERVALO desde la
+    apertura, en el que entra un turno de duración `largo` antes del cierre. None si el
+    turno no entra en ninguna jornada o si no queda ninguna antes del fin del calendario.
+    """
+    if datetime.combine(date.min, CIERRE) - datetime.combine(date.min, APERTURA) < largo or not DIAS_DE_ATENCION:
+        return None
+    try:
+        while True:
+            apertura = datetime.combine(momento.date(), APERTURA)
+            if momento <= apertura:
+                candidato = apertura
+            else:
+                candidato = apertura + math.ceil((momento - apertura) / INTERVALO) * INTERVALO
+            if candidato.weekday() in DIAS_DE_ATENCION and candidato + largo <= datetime.combine(momento.date(), CIERRE):
+                return candidato
+            momento = datetime.combine(momento.date() + timedelta(days=1), APERTURA)
+    except OverflowError:
+        return None
+
+
+def primer_horario_libre(ocupados, desde, largo, hasta=None):
+    """
+    Primer horario de atención a partir de `desde` en el que entra un turno de duración
+    `largo` sin superponerse con `ocupados`: intervalos (inicio, fin) en orden de inicio, que
+    pueden superponerse entre sí. Recorre `ocupados` una sola vez y deja de leer en cuanto
+    encuentra el hueco. None si no hay lugar antes de `hasta` (por defecto desde + HORIZONTE).
+    """
+    hasta = hasta or desde + HORIZONTE
+    candidato = siguiente_horario(desde, largo)
+    for inicio, fin in ocupados:
+        if candidato is None or candidato >= hasta:
+            return None
+        if fin <= candidato:
+            continue
+        if inicio >= candidato + largo:
+            return candidato
+        candidato = siguiente_horario(fin, largo)
+    return candidato if candidato is not None and candidato < hasta else None
+
+
+def superpuestos(turnos):
+    """
+    ids de los turnos que se superponen con otro del mismo mecánico. `turnos` son dicts con
+    id, mecanico_id, estado, inicio y fin (datetime), en orden de inicio. Barrido con un
+    montículo de turnos en curso por mecánico: O(n log n).
+    """
+    ids = set()
+    en_curso = {}  # mecanico_id -> montículo de (fin, id) de los turnos que todavía no terminaron.
+    for turno in turnos:
+        if turno['mecanico_id'] is None or turno['estado'] not in ESTADOS_OCUPAN:
+            continue
+        activos = en_curso.setdefault(turno['mecanico_id'], [])
+        while activos and activos[0][0] <= turno['inicio']:
+            heapq.heappop(activos)
+        if activos:
+            ids.add(turno['id'])
+            ids.update(turno_id for _, turno_id in activos)
+        heapq.heappush(activos, (turno['fin'], turno['id']))
+    return ids
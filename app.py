@@ -1,8 +1,24 @@
 import os
+import io
+import math
+import logging
+import sqlite3
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, make_response, Response
 import gestor_datos
-from datetime import date, datetime # Se importa aquí para usarlo en detalle_reparacion
+import agenda
+import importacion
+import exportacion
+import reportes
+import contrasenas
+import limitador_intentos
+import bitacora
+import perfil_consultas
+import metricas
+from datetime import date, datetime, timedelta # Se importa aquí para usarlo en detalle_reparacion
+
+bitacora.configurar()
+log = logging.getLogger(__name__)
 
 # ==========================================================
 # CONFIGURACIÓN DE LA APLICACIÓN FLASK
@@ -14,6 +30,8 @@ app = Flask(__name__)
 # o seguir usando os.environ.get para flexibilidad si ya tienes la variable configurada.
 # Si la ejecutas localmente sin la variable de entorno 'SECRET_KEY', usará el valor por defecto.
 app.secret_key = os.environ.get("SECRET_KEY", "una_clave_secreta_muy_larga_y_aleatoria_para_pruebas_locales")
+# Latencia por ruta, peticiones en curso y render de plantillas; expone GET /metrics.
+metricas.instrumentar_flask(app, 'mecanicos')
 
 # ==========================================================
 # 1. DECORADOR PARA REQUERIR INICIO DE SESIÓN
@@ -27,12 +45,68 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _argumentos_de_pagina():
+    """Lee ?limite=, ?despues= y ?antes= de los listados paginados."""
+    return {
+        'limite': request.args.get('limite', type=int),
+        'despues': request.args.get('despues'),
+        'antes': request.args.get('antes'),
+    }
+
 # ==========================================================
 # 2. CONFIGURACIÓN DE BASE DE DATOS Y TABLAS (al inicio de la aplicación)
 # ==========================================================
+# Peticiones que no son GET pero sólo leen: el inicio de sesión corre bcrypt después de leer
+# las credenciales y no debe hacerlo con el bloqueo de escritura de SQLite tomado. Su única
+# escritura posible (rehacer el hash) tolera fallar y se reintenta en el próximo inicio.
+_SOLO_LECTURA = {'login_mecanico'}
+
+
+# Las migraciones se aplican una sola vez al arrancar. Este hook sólo consulta el flag
+# de "esquema verificado" del proceso; reintenta si la base no estaba disponible al inicio.
 @app.before_request
 def before_request():
-    gestor_datos.crear_tablas()
+    # Id de correlación de la petición: aparece en cada registro de log que genere.
+    g.id_peticion = bitacora.iniciar_correlacion(request.headers.get('X-Request-ID'))
+    gestor_datos.asegurar_esquema()
+    # Unidad de trabajo de la petición: todas las llamadas a gestor_datos comparten
+    # una conexión y una transacción, que se confirma una sola vez al final. Las que no
+    # son GET pueden escribir: en SQLite toman el bloqueo de escritura al empezar.
+    g.unidad_trabajo = gestor_datos.iniciar_unidad_de_trabajo(escritura=_es_escritura())
+
+
+def _es_escritura():
+    return request.method not in ('GET', 'HEAD') and request.endpoint not in _SOLO_LECTURA
+
+
+@app.after_request
+def confirmar_unidad_de_trabajo(response):
+    if not gestor_datos.finalizar_unidad_de_trabajo(exito=response.status_code < 500):
+        if response.status_code < 500:
+            return make_response('Error al guardar los cambios en la base de datos.', 500)
+    response.headers['X-Request-ID'] = g.id_peticion
+    return response
+
+
+@app.teardown_request
+def cerrar_unidad_de_trabajo(error):
+    # Sólo queda abierta si la vista lanzó una excepción: en ese caso se deshace todo.
+    gestor_datos.finalizar_unidad_de_trabajo(exito=False)
+
+
+@app.errorhandler(contrasenas.ContrasenasSaturadasError)
+def contrasenas_saturadas(error):
+    # El grupo de bcrypt está lleno: se rechaza en lugar de encolar sin límite.
+    log.warning("Petición rechazada: %s", error)
+    return make_response('El servidor está ocupado. Intente nuevamente en unos segundos.', 503, {'Retry-After': '1'})
+
+
+@app.errorhandler(sqlite3.OperationalError)
+def base_ocupada(error):
+    # Una función de datos no pudo usar la base (p. ej. "database is locked" tras agotar el
+    # busy_timeout): la unidad de trabajo se deshace al terminar la petición.
+    log.error("Petición rechazada por un error de la base de datos: %s", error)
+    return make_response('La base de datos está ocupada. Intente nuevamente en unos segundos.', 503, {'Retry-After': '1'})
 
 
 # ==========================================================
@@ -46,7 +120,14 @@ def login_mecanico():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        # Demasiados fallos recientes para este usuario o IP: se rechaza sin gastar un bcrypt.
+        espera = limitador_intentos.espera_login(username, request.remote_addr)
+        if espera:
+            log.warning("Inicio de sesión de mecánico bloqueado para '%s' desde %s (%.0fs)", username, request.remote_addr, espera)
+            flash(f'Demasiados intentos fallidos. Intente nuevamente en {math.ceil(espera)} segundos.', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(math.ceil(espera))}
         mecanico = gestor_datos.verificar_credenciales_mecanico(username, password)
+        limitador_intentos.registrar_login(username, request.remote_addr, bool(mecanico))
         if mecanico:
             session['username'] = username
             session['user_id'] = mecanico['id']
@@ -76,14 +157,16 @@ def logout_mecanico():
 @app.route('/dashboard')
 @login_required 
 def dashboard():
-    return render_template('dashboard.html')
+    # Indicadores precalculados (ver reportes.py): la consulta recorre días, no reparaciones.
+    semanas = request.args.get('semanas', reportes.SEMANAS, type=int)
+    return render_template('dashboard.html', tablero=reportes.tablero(semanas))
 
 
 @app.route('/clientes')
 @login_required 
 def clientes():
-    clientes = gestor_datos.obtener_todos_los_clientes()
-    return render_template('clientes.html', clientes=clientes)
+    pagina = gestor_datos.obtener_clientes_paginados(**_argumentos_de_pagina())
+    return render_template('clientes.html', clientes=pagina.registros, pagina=pagina)
 
 
 @app.route('/clientes/agregar', methods=['GET', 'POST'])
@@ -225,12 +308,11 @@ def eliminar_vehiculo_web(vehiculo_id):
 @login_required
 def historial_vehiculo(vehiculo_id):
     """Muestra el historial de reparaciones para un vehículo específico."""
-    print(f"\nDEBUG FLASK (app.py): === INICIO DE RUTA historial_vehiculo para ID: {vehiculo_id} ===")
     
     vehiculo = gestor_datos.obtener_vehiculo_por_id(vehiculo_id)
     if not vehiculo:
         flash('Vehículo no encontrado.', 'error')
-        print(f"DEBUG FLASK (app.py): Vehículo con ID {vehiculo_id} NO encontrado. Redirigiendo a clientes.")
+        log.debug("Vehículo con ID %s NO encontrado. Redirigiendo a clientes.", vehiculo_id)
         return redirect(url_for('clientes'))
         
     historial = gestor_datos.obtener_historial_reparaciones_vehiculo(vehiculo_id)
@@ -248,9 +330,7 @@ def historial_vehiculo(vehiculo_id):
             vehiculo['dni_cliente'] = 'N/A'
 
 
-    print(f"DEBUG FLASK (app.py): Vehículo recuperado para historial: {vehiculo}")
-    print(f"DEBUG FLASK (app.py): Historial de reparaciones recuperado: {historial}")
-    print(f"DEBUG FLASK (app.py): === FIN DE RUTA historial_vehiculo ===\n")
+    log.debug("Historial del vehículo %s (%s): %s reparaciones", vehiculo_id, vehiculo['patente'], len(historial))
     return render_template('historial_vehiculo.html', vehiculo=vehiculo, historial=historial)
 
 
@@ -261,8 +341,8 @@ def historial_vehiculo(vehiculo_id):
 @app.route('/mecanicos')
 @login_required 
 def mecanicos():
-    mecanicos = gestor_datos.obtener_todos_los_mecanicos()
-    return render_template('mecanicos.html', mecanicos=mecanicos)
+    pagina = gestor_datos.obtener_mecanicos_paginados(**_argumentos_de_pagina())
+    return render_template('mecanicos.html', mecanicos=pagina.registros, pagina=pagina)
 
 @app.route('/mecanicos/agregar', methods=['GET', 'POST'])
 @login_required 
@@ -321,10 +401,63 @@ def eliminar_mecanico_web(mecanico_id):
 @app.route('/turnos')
 @login_required 
 def lista_turnos():
-    turnos = gestor_datos.obtener_todos_los_turnos() 
-    return render_template('turnos.html', turnos=turnos)
+    pagina = gestor_datos.obtener_turnos_paginados(**_argumentos_de_pagina())
+    return render_template('turnos.html', turnos=pagina.registros, pagina=pagina)
 
 
+@app.route('/turnos/agenda')
+@login_required
+def agenda_turnos():
+    """Agenda semanal de turnos (?semana=YYYY-MM-DD, cualquier día de la semana; ?mecanico_id=)."""
+    try:
+        dia = date.fromisoformat(request.args.get('semana', ''))
+        # También se muestran los enlaces a la semana anterior y la siguiente: en los extremos
+        # del calendario (año 1 o 9999) no existen, y se muestra la semana actual.
+        agenda.semana(dia - timedelta(days=7))
+        agenda.semana(dia + timedelta(days=7))
+    except (ValueError, OverflowError):
+        dia = date.today()
+    lunes, lunes_siguiente = agenda.semana(dia)
+    mecanico_id = request.args.get('mecanico_id', type=int)
+    turnos = gestor_datos.obtener_turnos_en_rango(lunes, lunes_siguiente, mecanico_id)
+
+    # Los turnos vienen en orden de fecha y hora: se marcan los que se superponen con otro del mismo mecánico.
+    for turno in turnos:
+        turno['inicio'] = datetime.fromisoformat(f"{turno['fecha']} {turno['hora']}")
+        turno['fin'] = datetime.fromisoformat(f"{turno['fecha_fin']} {turno['hora_fin']}")
+    superpuestos = agenda.superpuestos(turnos)
+    dias = [lunes + timedelta(days=i) for i in range(7)]
+    turnos_por_dia = {d.isoformat(): [] for d in dias}
+    for turno in turnos:
+        turno['superpuesto'] = turno['id'] in superpuestos
+        turnos_por_dia[turno['fecha']].append(turno)
+
+    return render_template('agenda.html', dias=dias, turnos_por_dia=turnos_por_dia,
+                           cantidad_superpuestos=len(superpuestos),
+                           mecanicos=gestor_datos.obtener_todos_los_mecanicos(), mecanico_id=mecanico_id,
+                           semana_anterior=(lunes - timedelta(days=7)).isoformat(),
+                           semana_siguiente=lunes_siguiente.isoformat())
+
+
+def _avisar_superposicion(mecanico_id, fecha, hora, tipo_trabajo, turno_id=None):
+    """
+    Si el turno no se guardó porque el mecánico ya estaba ocupado, lo avisa con el turno que
+    lo ocupa y el próximo horario libre. Devuelve False si no había superposición.
+    """
+    if not mecanico_id:
+        return False
+    conflictos = gestor_datos.obtener_conflictos_turno(mecanico_id, fecha, hora, tipo_trabajo, turno_id)
+    if not conflictos:
+        return False
+    otro = conflictos[0]
+    mensaje = (f"El mecánico ya tiene el turno {otro['id']} de {otro['hora']} a {otro['hora_fin']} "
+               f"({otro['nombre_cliente']} {otro['apellido_cliente']}, {otro['patente']}).")
+    libre = gestor_datos.obtener_proximo_horario_libre(mecanico_id, f'{fecha} {hora}', tipo_trabajo, turno_id)
+    if libre:
+        mensaje += f" Próximo horario libre: {libre['fecha']} {libre['hora']}."
+    flash(mensaje, 'error')
+    return True
+
 
 @app.route('/turnos/agregar', methods=['GET', 'POST'])
 @login_required 
@@ -336,16 +469,19 @@ def agregar_turno_web():
         fecha = request.form['fecha']
         hora = request.form['hora'] 
         problema_reportado = request.form['problema_reportado']
+        tipo_trabajo = request.form.get('tipo_trabajo', agenda.TIPO_POR_DEFECTO)
 
-        if gestor_datos.agregar_turno(cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado):
+        if gestor_datos.agregar_turno(cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, tipo_trabajo):
             flash('Turno agendado exitosamente.', 'success')
             return redirect(url_for('lista_turnos'))
-        else:
+        elif not _avisar_superposicion(mecanico_id, fecha, hora, tipo_trabajo):
             flash('Error al agendar el turno.', 'error')
     
-    clientes = gestor_datos.obtener_todos_los_clientes()
+    # El cliente se elige con el buscador (/api/clientes/buscar): sólo se precarga el ya elegido.
+    cliente = gestor_datos.obtener_cliente_por_id(request.form['cliente_id']) if request.method == 'POST' else None
     mecanicos = gestor_datos.obtener_todos_los_mecanicos()
-    return render_template('agendar_turno.html', clientes=clientes, mecanicos=mecanicos, accion='Agendar Nuevo Turno')
+    return render_template('agendar_turno.html', cliente=cliente, mecanicos=mecanicos,
+                           tipos_trabajo=agenda.TIPOS_TRABAJO, accion='Agendar Nuevo Turno')
 
 
 @app.route('/turnos/modificar/<int:turno_id>', methods=['GET', 'POST'])
@@ -364,8 +500,10 @@ def modificar_turno_web(turno_id):
         hora = request.form['hora']
         problema_reportado = request.form['problema_reportado']
         estado = request.form['estado']
+        tipo_trabajo = request.form.get('tipo_trabajo')
 
-        if gestor_datos.actualizar_turno(turno_id, cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, estado):
+        if gestor_datos.actualizar_turno(turno_id, cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, estado,
+                                         tipo_trabajo):
             # Si el turno pasa a "En Progreso", intentar crear una reparación si no existe
             if estado == 'En Progreso':
                 reparacion_id = gestor_datos.crear_reparacion_desde_turno(turno_id)
@@ -375,16 +513,18 @@ def modificar_turno_web(turno_id):
                     flash('Advertencia: No se pudo iniciar la reparación desde el turno o ya existía.', 'warning')
             flash('Turno actualizado exitosamente.', 'success')
             return redirect(url_for('lista_turnos'))
-        else:
+        elif not _avisar_superposicion(mecanico_id, fecha, hora, tipo_trabajo or turno['tipo_trabajo'], turno_id):
             flash('Error al actualizar el turno.', 'error')
     
-    clientes = gestor_datos.obtener_todos_los_clientes()
+    cliente = None
     mecanicos = gestor_datos.obtener_todos_los_mecanicos()
     vehiculos = []
     if turno and turno['cliente_id']: # Asegurarse de que turno y cliente_id existan
+        cliente = gestor_datos.obtener_cliente_por_id(turno['cliente_id'])
         vehiculos = gestor_datos.obtener_vehiculos_por_cliente(turno['cliente_id'])
 
-    return render_template('agendar_turno.html', turno=turno, clientes=clientes, mecanicos=mecanicos, vehiculos=vehiculos, accion='Modificar Turno')
+    return render_template('agendar_turno.html', turno=turno, cliente=cliente, mecanicos=mecanicos, vehiculos=vehiculos,
+                           tipos_trabajo=agenda.TIPOS_TRABAJO, accion='Modificar Turno')
 
 
 @app.route('/turnos/eliminar/<int:turno_id>', methods=['POST'])
@@ -428,6 +568,8 @@ def pasar_turno_a_taller(turno_id):
 # 8. RUTAS DE REPARACIONES PROTEGIDAS
 # ==========================================================
 
+VEHICULOS_EN_FORMULARIO_MAX = 200
+
 @app.route('/reparaciones/ingreso_directo', methods=['GET', 'POST'])
 @login_required
 def registrar_ingreso_directo():
@@ -452,12 +594,14 @@ def registrar_ingreso_directo():
         else:
             flash('Error al registrar el ingreso directo.', 'error')
     
-    clientes = gestor_datos.obtener_todos_los_clientes()
-    vehiculos = [] 
-    for cliente in clientes:
-        vehiculos.extend(gestor_datos.obtener_vehiculos_por_cliente(cliente['id']))
+    # Una sola consulta con los vehículos agrupados por cliente. Si el taller tiene más de
+    # VEHICULOS_EN_FORMULARIO_MAX, el formulario no los precarga y usa sólo la búsqueda.
+    clientes = gestor_datos.obtener_vehiculos_con_cliente(limite=VEHICULOS_EN_FORMULARIO_MAX + 1)
+    if sum(len(cliente['vehiculos']) for cliente in clientes) > VEHICULOS_EN_FORMULARIO_MAX:
+        clientes = []
 
-    return render_template('reparacion_directa_form.html', clientes=clientes, vehiculos=vehiculos)
+    return render_template('reparacion_directa_form.html', clientes=clientes,
+                           today_date=datetime.now().strftime('%Y-%m-%d'))
 
 
 @app.route('/reparaciones/detalle/<int:reparacion_id>', methods=['GET'])
@@ -486,7 +630,7 @@ def registrar_reparacion_directa_web():
     Permite registrar una nueva reparación directamente en el taller.
     No vinculada a un turno previo.
     """
-    print(f"DEBUG FLASK: Accediendo a registrar_reparacion_directa_web. Sesión: {session.get('username')}")
+    log.debug("Accediendo a registrar_reparacion_directa_web. Sesión: %s", session.get('username'))
     if request.method == 'POST':
         vehiculo_id = request.form['vehiculo_id']
         mecanico_id = request.form['mecanico_id'] if request.form['mecanico_id'] else None
@@ -505,17 +649,16 @@ def registrar_reparacion_directa_web():
         else:
             flash('Error al registrar la reparación.', 'error')
     
-    clientes = gestor_datos.obtener_todos_los_clientes()
     mecanicos = gestor_datos.obtener_todos_los_mecanicos()
     today_date = date.today().isoformat() # Formato YYYY-MM-DD
-    return render_template('ingreso_taller_form.html', clientes=clientes, mecanicos=mecanicos, today_date=today_date)
+    return render_template('ingreso_taller_form.html', mecanicos=mecanicos, today_date=today_date)
 
 
 @app.route('/reparaciones/<int:reparacion_id>', methods=['GET'])
 @login_required
 def detalle_reparacion_web(reparacion_id):
     """Muestra los detalles de una reparación específica."""
-    print(f"DEBUG FLASK: Accediendo a detalle_reparacion_web para ID: {reparacion_id}. Sesión: {session.get('username')}")
+    log.debug("Accediendo a detalle_reparacion_web para ID: %s. Sesión: %s", reparacion_id, session.get('username'))
     reparacion = gestor_datos.obtener_reparacion_por_id(reparacion_id)
     if not reparacion:
         flash('Reparación no encontrada.', 'error')
@@ -530,7 +673,7 @@ def modificar_reparacion_web(reparacion_id):
     Permite modificar los detalles de una reparación existente.
     Esto podría incluir cambiar estado, trabajos, repuestos, costos, etc.
     """
-    print(f"DEBUG FLASK: Accediendo a modificar_reparacion_web para ID: {reparacion_id}. Sesión: {session.get('username')}")
+    log.debug("Accediendo a modificar_reparacion_web para ID: %s. Sesión: %s", reparacion_id, session.get('username'))
     reparacion = gestor_datos.obtener_reparacion_por_id(reparacion_id)
     if not reparacion:
         flash('Reparación no encontrada.', 'error')
@@ -563,7 +706,7 @@ def finalizar_reparacion_web(reparacion_id):
     """
     Permite finalizar una reparación.
     """
-    print(f"DEBUG FLASK: Accediendo a finalizar_reparacion_web para ID: {reparacion_id}. Sesión: {session.get('username')}")
+    log.debug("Accediendo a finalizar_reparacion_web para ID: %s. Sesión: %s", reparacion_id, session.get('username'))
     
     reparacion = gestor_datos.obtener_reparacion_por_id(reparacion_id)
     if not reparacion:
@@ -628,13 +771,54 @@ def actualizar_estado_reparacion_web(reparacion_id):
 @login_required
 def api_vehiculos_por_cliente(cliente_id):
     """API: Obtener vehículos por cliente (para carga dinámica en formularios, ej. agendar_turno.html)"""
-    print(f"DEBUG FLASK: API solicitando vehículos para cliente ID: {cliente_id}")
+    log.debug("API solicitando vehículos para cliente ID: %s", cliente_id)
     vehiculos = gestor_datos.obtener_vehiculos_por_cliente(cliente_id)
     if vehiculos:
-        return jsonify({'success': True, 'vehiculos': [dict(v) for v in vehiculos]})
+        return jsonify({'success': True, 'vehiculos': vehiculos})
     return jsonify({'success': False, 'message': 'No se encontraron vehículos para este cliente.'})
 
 
+@app.route('/api/clientes/buscar', methods=['GET'])
+@login_required
+def api_buscar_clientes():
+    """API: Búsqueda incremental de clientes por nombre, apellido o DNI (?q=, ?limite=)."""
+    texto = request.args.get('q', '')
+    if len(texto.strip()) < 2:
+        return jsonify({'success': True, 'clientes': []})
+    limite = request.args.get('limite', 10, type=int)
+    return jsonify({'success': True, 'clientes': gestor_datos.buscar_clientes(texto, limite)})
+
+
+@app.route('/api/vehiculos/buscar', methods=['GET'])
+@login_required
+def api_buscar_vehiculos():
+    """API: Búsqueda incremental de vehículos por patente, marca, modelo o datos del cliente (?q=, ?limite=)."""
+    texto = request.args.get('q', '')
+    if len(texto.strip()) < 2:
+        return jsonify({'success': True, 'vehiculos': []})
+    limite = request.args.get('limite', 20, type=int)
+    return jsonify({'success': True, 'vehiculos': gestor_datos.buscar_vehiculos(texto, limite)})
+
+
+@app.route('/api/turnos/proximo_libre', methods=['GET'])
+@login_required
+def api_proximo_horario_libre():
+    """
+    API: Próximo horario libre de un mecánico (?mecanico_id=, ?fecha=, ?hora=, ?tipo_trabajo=, ?excluir=).
+    Sin fecha, busca desde ahora; ?excluir= deja afuera al turno que se está modificando.
+    """
+    mecanico_id = request.args.get('mecanico_id', type=int)
+    if not mecanico_id:
+        return jsonify({'success': False, 'message': 'Falta el mecánico.'}), 400
+    fecha = request.args.get('fecha')
+    desde = f"{fecha} {request.args.get('hora') or '00:00'}" if fecha else None
+    libre = gestor_datos.obtener_proximo_horario_libre(mecanico_id, desde, request.args.get('tipo_trabajo'),
+                                                       request.args.get('excluir', type=int))
+    if libre:
+        return jsonify({'success': True, 'horario': libre})
+    return jsonify({'success': False, 'message': 'No hay horarios libres en los próximos días.'})
+
+
 
 @app.route('/taller')
 @login_required 
@@ -659,11 +843,114 @@ def create_first_mecanico():
         # Si ya existe, puedes intentar manejar el caso, o simplemente retornar un mensaje
         return "Error al crear el primer mecánico admin (posiblemente ya existe).", 409
 
+
+# ==========================================================
+# 9. RUTAS DE ADMINISTRACIÓN (diagnóstico de rendimiento)
+# ==========================================================
+@app.route('/admin/consultas', methods=['GET'])
+@login_required
+def admin_consultas():
+    """Perfil de consultas (tiempo acumulado, percentiles, filas por sentencia) y estado del pool."""
+    limite = request.args.get('limite', 50, type=int)
+    resumen = perfil_consultas.instantanea(limite=max(1, min(limite, 500)))
+    resumen['perfil_activo'] = perfil_consultas.ACTIVO
+    resumen['pool'] = gestor_datos.estadisticas_pool()
+    return jsonify(resumen)
+
+
+@app.route('/admin/consultas/reiniciar', methods=['POST'])
+@login_required
+def admin_consultas_reiniciar():
+    """Vacía el perfil de consultas, para medir desde cero (por ejemplo, tras crear un índice)."""
+    perfil_consultas.reiniciar()
+    return jsonify({'success': True})
+
+# ==========================================================
+# 10. IMPORTACIÓN MASIVA (clientes, vehículos, reparaciones históricas)
+# ==========================================================
+def _importar_archivo(tabla, archivo):
+    """
+    Importa el archivo subido (ver importacion.py). La importación confirma de a un lote con su
+    propia conexión, así que la unidad de trabajo de la petición se cierra antes: no hay nada
+    que agregar a su transacción y en SQLite compartirían la conexión del hilo.
+    """
+    gestor_datos.finalizar_unidad_de_trabajo()
+    texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    formato = request.values.get('formato') or importacion.formato_de(archivo.filename or '')
+    return importacion.importar(tabla, texto, formato)
+
+
+@app.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar_web():
+    resultado = None
+    if request.method == 'POST':
+        tabla = request.form.get('tabla')
+        archivo = request.files.get('archivo')
+        if tabla not in importacion.TABLAS or not archivo or not archivo.filename:
+            flash('Elija qué importar y el archivo.', 'error')
+        else:
+            resultado = _importar_archivo(tabla, archivo)
+            flash(f'{resultado.importadas} de {resultado.leidas} registros importados.',
+                  'success' if not resultado.cantidad_errores else 'warning')
+    return render_template('importar.html', resultado=resultado, tablas=sorted(importacion.TABLAS))
+
+
+@app.route('/api/importar/<tabla>', methods=['POST'])
+@login_required
+def api_importar(tabla):
+    """API: Importa el archivo del campo 'archivo' (CSV o JSON; ?formato= o según la extensión)."""
+    archivo = request.files.get('archivo')
+    if tabla not in importacion.TABLAS or not archivo:
+        return jsonify({'success': False, 'message': 'Tabla desconocida o falta el archivo.'}), 400
+    resultado = _importar_archivo(tabla, archivo)
+    return jsonify({'success': True, **resultado.como_dict()})
+
+# ==========================================================
+# 11. EXPORTACIÓN (copias de seguridad y contabilidad)
+# ==========================================================
+def _respuesta_exportacion(tabla):
+    """
+    Descarga de `tabla` (ver exportacion.py) con ?formato=, ?desde=, ?hasta= (YYYY-MM-DD) y
+    ?gzip=1. El archivo se escribe a medida que se lee, después de cerrar la unidad de trabajo
+    de la petición, con su propia conexión. ValueError si algún parámetro no es válido.
+    """
+    formato = request.args.get('formato', 'csv')
+    comprimir = request.args.get('gzip') == '1'
+    partes = exportacion.exportar(tabla, formato, request.args.get('desde') or None,
+                                  request.args.get('hasta') or None, comprimir)
+    respuesta = Response(partes, mimetype='application/gzip' if comprimir else exportacion.FORMATOS[formato][1])
+    respuesta.headers['Content-Disposition'] = \
+        f'attachment; filename="{exportacion.nombre_de_archivo(tabla, formato, comprimir)}"'
+    return respuesta
+
+
+@app.route('/exportar')
+@login_required
+def exportar_web():
+    tabla = request.args.get('tabla')
+    if tabla:
+        try:
+            return _respuesta_exportacion(tabla)
+        except ValueError as e:
+            flash(f'No se pudo exportar: {e}', 'error')
+    return render_template('exportar.html', tablas=exportacion.TABLAS, formatos=sorted(exportacion.FORMATOS))
+
+
+@app.route('/api/exportar/<tabla>')
+@login_required
+def api_exportar(tabla):
+    """API: Descarga la tabla completa o, en turnos y reparaciones, un rango de fechas."""
+    try:
+        return _respuesta_exportacion(tabla)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 # ==========================================================
 # PUNTO DE ARRANQUE DE LA APLICACIÓN FLASK (AJUSTADO PARA DESPLIEGUE LOCAL)
 # ==========================================================
 if __name__ == '__main__':
-    gestor_datos.crear_tablas() # Las tablas se crearán en la base de datos local (sqlite por defecto)
+    gestor_datos.asegurar_esquema() # Aplica las migraciones pendientes (sqlite por defecto)
     
     # Ejecutar la aplicación Flask para desarrollo local
     # host='127.0.0.1' (o localhost) para que solo sea accesible desde tu máquina
@@ -0,0 +1,17 @@
+"""
+Benchmarks de carga y microbenchmarks sobre bases sembradas con datos sintéticos.
+
+    python -m benchmarks.carga --escala media --duracion 30 --hilos 4
+    python -m benchmarks.carga --escala grande --base /tmp/taller_grande.db
+    python -m benchmarks.carga --postgres postgresql://localhost/taller_bench --escala chica
+    python -m benchmarks.micro --escalas mini,chica,media
+    python -m benchmarks.resultados benchmarks/resultados/A.json benchmarks/resultados/B.json
+
+datos.py siembra la base (misma semilla, mismos datos), carga.py recorre las rutas reales de
+app.py y cliente_app.py con sus clientes de prueba de Flask, micro.py cronometra cada función
+de gestor_datos en varias escalas y ajusta su curva tiempo vs. filas, y resultados.py guarda y
+compara los JSON con p50/p95/p99 (y throughput, en las de carga) de cada corrida.
+
+Los módulos de la aplicación se importan recién después de fijar DATABASE_FILE / DATABASE_URL,
+porque gestor_datos lee la configuración de la base al importarse.
+"""
@@ -0,0 +1,221 @@
+"""
+Prueba de carga de extremo a extremo con los clientes de prueba de Flask.
+
+Cada hilo abre sus propios clientes de app.py y cliente_app.py, inicia sesión y repite su
+escenario hasta agotar la duración; cada petición se cronometra por separado. Al final se
+guarda un JSON con p50/p95/p99 y throughput por operación y por escenario.
+
+Escenarios:
+  panel_mecanico  un mecánico recorre el panel: listados, fichas de cliente, historiales, taller.
+  agenda_turnos   un mecánico abre el formulario de turnos, agenda uno y vuelve al listado.
+  sondeo_cliente  un cliente sondea el estado de sus vehículos con If-None-Match, como la app.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+from benchmarks import datos, resultados
+
+ESCENARIOS = ('panel_mecanico', 'agenda_turnos', 'sondeo_cliente')
+
+
+class Sesion:
+    """Cliente de prueba que cronometra cada petición bajo un nombre de operación."""
+
+    def __init__(self, cliente, muestras):
+        self.cliente = cliente
+        self.muestras = muestras
+        self.errores = 0
+
+    def pedir(self, operacion, metodo, url, esperados=(200, 302), **kwargs):
+        inicio = time.perf_counter()
+        respuesta = getattr(self.cliente, metodo)(url, **kwargs)
+        self.muestras.setdefault(operacion, []).append((time.perf_counter() - inicio) * 1000.0)
+        if respuesta.status_code not in esperados:
+            self.errores += 1
+        return respuesta
+
+
+def _panel_mecanico(sesion, rng, vol, estado):
+    sesion.pedir('GET /dashboard', 'get', '/dashboard')
+    sesion.pedir('GET /clientes', 'get', '/clientes')
+    cliente_id = rng.randint(1, vol.clientes)
+    sesion.pedir('GET /clientes/<id>', 'get', f'/clientes/{cliente_id}')
+    vehiculo_id = rng.randint(1, vol.vehiculos)
+    sesion.pedir('GET /vehiculo/<id>/historial', 'get', f'/vehiculo/{vehiculo_id}/historial')
+    sesion.pedir('GET /taller', 'get', '/taller')
+    sesion.pedir('GET /turnos', 'get', '/turnos')
+    sesion.pedir('GET /api/vehiculos/buscar', 'get', f"/api/vehiculos/buscar?q={rng.choice(datos.APELLIDOS)[:3]}")
+    sesion.pedir('GET /reparaciones/<id>', 'get', f'/reparaciones/{rng.randint(1, vol.reparaciones)}')
+
+
+def _agenda_turnos(sesion, rng, vol, estado):
+    sesion.pedir('GET /turnos/agregar', 'get', '/turnos/agregar')
+    vehiculo_id = rng.randint(1, vol.vehiculos)
+    sesion.pedir('POST /turnos/agregar', 'post', '/turnos/agregar', data={
+        'cliente_id': datos.cliente_de_vehiculo(vehiculo_id, vol),
+        'vehiculo_id': vehiculo_id,
+        'mecanico_id': rng.randint(1, vol.mecanicos),
+        'fecha': datos.fecha_relativa(rng.randint(1, 30)),
+        'hora': rng.choice(datos.HORAS),
+        'problema_reportado': rng.choice(datos.PROBLEMAS),
+    })
+    sesion.pedir('GET /turnos', 'get', '/turnos')
+
+
+def _sondeo_cliente(sesion, rng, vol, estado):
+    cabeceras = {'If-None-Match': estado['etag']} if estado.get('etag') else {}
+    respuesta = sesion.pedir('GET /api/cliente/vehiculos/estado', 'get', '/api/cliente/vehiculos/estado',
+                             esperados=(200, 304), headers=cabeceras)
+    if respuesta.status_code == 200:
+        estado['etag'] = respuesta.headers.get('ETag')
+    if rng.random() < 0.1:
+        sesion.pedir('GET /api/cliente/dashboard', 'get', '/api/cliente/dashboard', esperados=(200, 304))
+
+
+def _iniciar_sesion(escenario, hilo, vol):
+    """Clientes de prueba ya autenticados para el escenario."""
+    import app
+    import cliente_app
+    if escenario == 'sondeo_cliente':
+        cliente = cliente_app.cliente_app.test_client()
+        usuario = f'cliente{(hilo % min(vol.usuarios, vol.clientes)) + 1}'
+        respuesta = cliente.post('/api/login', json={'username': usuario, 'password': datos.CONTRASENA})
+    else:
+        cliente = app.app.test_client()
+        respuesta = cliente.post('/login', data={'username': datos.USUARIO_MECANICO, 'password': datos.CONTRASENA})
+    if respuesta.status_code not in (200, 302):
+        raise RuntimeError(f"No se pudo iniciar sesión para {escenario}: {respuesta.status_code}")
+    return cliente
+
+
+def _trabajador(escenario, hilo, vol, semilla, hasta, calentamiento, salida):
+    funcion = {'panel_mecanico': _panel_mecanico, 'agenda_turnos': _agenda_turnos,
+               'sondeo_cliente': _sondeo_cliente}[escenario]
+    rng = random.Random(semilla * 1000 + hilo)
+    sesion = Sesion(None, {})
+    iteraciones = 0
+    try:
+        sesion.cliente = _iniciar_sesion(escenario, hilo, vol)
+        estado = {}
+        for _ in range(calentamiento):
+            funcion(Sesion(sesion.cliente, {}), rng, vol, estado)
+        while time.perf_counter() < hasta:
+            funcion(sesion, rng, vol, estado)
+            iteraciones += 1
+    except Exception as e:
+        # Un hilo caído no debe desaparecer del informe: se cuenta como error.
+        print(f"El hilo {escenario}-{hilo} se detuvo: {e!r}", file=sys.stderr)
+        sesion.errores += 1
+    salida.append((escenario, iteraciones, sesion.muestras, sesion.errores))
+
+
+def ejecutar(vol, escenarios, hilos, duracion, semilla=1, calentamiento=2):
+    """Corre los escenarios en paralelo (`hilos` por escenario) durante `duracion` segundos."""
+    salida, trabajadores = [], []
+    inicio = time.perf_counter()
+    hasta = inicio + duracion
+    for escenario in escenarios:
+        for hilo in range(hilos):
+            trabajador = threading.Thread(target=_trabajador, name=f'{escenario}-{hilo}',
+                                          args=(escenario, hilo, vol, semilla, hasta, calentamiento, salida))
+            trabajadores.append(trabajador)
+            trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    transcurrido = time.perf_counter() - inicio
+
+    por_operacion, por_escenario = {}, {}
+    for escenario, iteraciones, muestras, errores in salida:
+        resumen = por_escenario.setdefault(escenario, {'iteraciones': 0, 'errores': 0, 'peticiones': 0})
+        resumen['iteraciones'] += iteraciones
+        resumen['errores'] += errores
+        for operacion, duraciones in muestras.items():
+            por_operacion.setdefault(operacion, []).extend(duraciones)
+            resumen['peticiones'] += len(duraciones)
+    for resumen in por_escenario.values():
+        resumen['iteraciones_por_segundo'] = round(resumen['iteraciones'] / transcurrido, 2)
+    total = sum(len(duraciones) for duraciones in por_operacion.values())
+    return {
+        'duracion_s': round(transcurrido, 2),
+        'peticiones': total,
+        'peticiones_por_segundo': round(total / transcurrido, 2),
+        'escenarios': por_escenario,
+        'operaciones': {operacion: resultados.resumir(duraciones, transcurrido)
+                        for operacion, duraciones in sorted(por_operacion.items())},
+    }
+
+
+def preparar_base(args, vol):
+    """Fija la base de la corrida (antes de importar la aplicación) y la siembra si hace falta."""
+    if args.postgres:
+        os.environ['DATABASE_URL'] = args.postgres
+        motor = 'postgresql'
+    else:
+        os.environ.pop('DATABASE_URL', None)
+        ruta = os.path.abspath(args.base or f'bench_{args.escala}.db')
+        if args.resembrar and os.path.exists(ruta):
+            os.remove(ruta)
+        os.environ['DATABASE_FILE'] = ruta
+        motor = 'sqlite'
+    # Los logs por petición distorsionan la medición: sólo advertencias salvo que se pida otra cosa.
+    os.environ.setdefault('LOG_NIVEL', 'WARNING')
+
+    import gestor_datos
+    gestor_datos.asegurar_esquema()
+    conn = gestor_datos.obtener_conexion()
+    try:
+        cantidades = datos.contar(conn)
+    finally:
+        conn.close()
+    if not any(cantidades.values()):
+        print(f"Sembrando base ({args.escala}, semilla {args.semilla})...")
+        cantidades = datos.sembrar(vol, semilla=args.semilla)
+    elif cantidades['clientes'] != vol.clientes or cantidades['reparaciones'] < vol.reparaciones:
+        raise SystemExit(f"La base existente no corresponde a la escala '{args.escala}': {cantidades}. "
+                         f"Use --resembrar u otra --base.")
+    return motor, cantidades
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga sobre una base sembrada.")
+    parser.add_argument('--escala', choices=sorted(datos.ESCALAS), default='chica')
+    parser.add_argument('--base', help="Archivo SQLite (por defecto bench_<escala>.db en el directorio actual).")
+    parser.add_argument('--postgres', metavar='DSN', help="Usar esta base PostgreSQL (vacía o ya sembrada).")
+    parser.add_argument('--resembrar', action='store_true', help="Borra la base SQLite y la vuelve a sembrar.")
+    parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+    parser.add_argument('--hilos', type=int, default=2, help="Hilos por escenario.")
+    parser.add_argument('--duracion', type=float, default=20.0, help="Segundos de medición.")
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help="Directorio de resultados (por defecto benchmarks/resultados).")
+    args = parser.parse_args(argv)
+
+    escenarios = [nombre.strip() for nombre in args.escenarios.split(',') if nombre.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+    vol = datos.ESCALAS[args.escala]
+    motor, cantidades = preparar_base(args, vol)
+
+    print(f"Midiendo {', '.join(escenarios)} con {args.hilos} hilo(s) cada uno durante {args.duracion:.0f}s...")
+    resultado = ejecutar(vol, escenarios, args.hilos, args.duracion, semilla=args.semilla)
+    resultado['metadatos'] = resultados.metadatos(
+        motor=motor, escala=args.escala, volumenes=cantidades, hilos_por_escenario=args.hilos,
+        escenarios=escenarios, semilla=args.semilla)
+
+    print(f"{'operación':<40} {'n':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}")
+    for operacion, datos_operacion in resultado['operaciones'].items():
+        print(f"{operacion:<40} {datos_operacion['cantidad']:>7} {datos_operacion['p50_ms']:>8.2f} "
+              f"{datos_operacion['p95_ms']:>8.2f} {datos_operacion['p99_ms']:>8.2f} {datos_operacion['por_segundo']:>8.1f}")
+    for escenario, resumen in resultado['escenarios'].items():
+        print(f"{escenario}: {resumen['iteraciones']} iteraciones, {resumen['errores']} errores")
+    print(f"Total: {resultado['peticiones_por_segundo']} peticiones/s")
+    print(f"Resultados en {resultados.guardar(resultado, 'carga', args.salida)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Siembra de datos sintéticos y reproducibles para los benchmarks.
+
+Los ids se asignan en orden (1..N), así que las relaciones se calculan sin consultar la base:
+el vehículo i pertenece al cliente ((i - 1) % clientes) + 1. Todas las cuentas (mecánicos y
+clientes) comparten la contraseña CONTRASENA, hasheada una sola vez.
+"""
+import random
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import psycopg2
+
+Volumenes = namedtuple('Volumenes', ['clientes', 'vehiculos', 'mecanicos', 'turnos', 'reparaciones', 'usuarios'])
+
+ESCALAS = {
+    'mini': Volumenes(clientes=200, vehiculos=300, mecanicos=5, turnos=500, reparaciones=1_000, usuarios=50),
+    'chica': Volumenes(clientes=2_000, vehiculos=3_000, mecanicos=10, turnos=5_000, reparaciones=10_000, usuarios=200),
+    'media': Volumenes(clientes=20_000, vehiculos=30_000, mecanicos=20, turnos=50_000, reparaciones=100_000, usuarios=500),
+    'grande': Volumenes(clientes=100_000, vehiculos=150_000, mecanicos=40, turnos=250_000, reparaciones=1_000_000, usuarios=1_000),
+}
+
+CONTRASENA = 'bench'
+USUARIO_MECANICO = 'bench'
+LOTE = 10_000
+# Fecha fija: la misma semilla produce exactamente la misma base en cualquier día.
+HOY = date(2025, 6, 1)
+
+NOMBRES = ['Ana', 'Juan', 'María', 'Carlos', 'Lucía', 'Pedro', 'Sofía', 'Diego', 'Laura', 'Martín',
+           'Valeria', 'Jorge', 'Paula', 'Andrés', 'Camila', 'Raúl', 'Elena', 'Tomás', 'Julia', 'Hugo']
+APELLIDOS = ['Pérez', 'Gómez', 'Rodríguez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Sánchez', 'Romero',
+             'Sosa', 'Torres', 'Álvarez', 'Ruiz', 'Ramírez', 'Flores', 'Acosta', 'Benítez', 'Medina', 'Herrera',
+             'Suárez', 'Aguirre', 'Giménez', 'Gutiérrez', 'Pereyra', 'Rojas', 'Molina', 'Castro', 'Ortiz',
+             'Silva', 'Núñez', 'Luna', 'Juárez', 'Cabrera', 'Ríos', 'Morales', 'Godoy', 'Moreno', 'Ferreyra',
+             'Domínguez', 'Carrizo', 'Peralta', 'Castillo', 'Ledesma', 'Quiroga', 'Vega', 'Vera', 'Muñoz',
+             'Ojeda', 'Ponce', 'Villalba']
+MARCAS = [('Ford', ['Ka', 'Fiesta', 'Focus', 'Ranger']), ('Fiat', ['Uno', 'Palio', 'Cronos', 'Toro']),
+          ('Chevrolet', ['Onix', 'Corsa', 'Cruze', 'S10']), ('Renault', ['Clio', 'Sandero', 'Kangoo', 'Duster']),
+          ('Volkswagen', ['Gol', 'Polo', 'Vento', 'Amarok']), ('Toyota', ['Etios', 'Corolla', 'Hilux', 'Yaris']),
+          ('Peugeot', ['206', '208', '308', 'Partner'])]
+PROBLEMAS = ['Ruido en el tren delantero', 'Service de 10.000 km', 'Pierde aceite', 'No arranca en frío',
+             'Frenos gastados', 'Cambio de correa de distribución', 'Luz de check engine encendida',
+             'Vibración al frenar', 'Aire acondicionado no enfría', 'Batería descargada']
+HORAS = [f'{hora:02d}:{minuto:02d}' for hora in range(8, 18) for minuto in (0, 30)]
+ESTADOS_ACTIVOS = ['En Progreso', 'Pendiente', 'En Espera de Piezas']
+
+
+def cliente_de_vehiculo(vehiculo_id, volumenes):
+    return ((vehiculo_id - 1) % volumenes.clientes) + 1
+
+
+def _patente(i):
+    letras = chr(65 + i % 26) + chr(65 + (i // 26) % 26) + chr(65 + (i // 676) % 26)
+    return f'{letras}{i:07d}'
+
+
+def fecha_relativa(dias):
+    return (HOY + timedelta(days=dias)).isoformat()
+
+
+# --- Generadores de filas (en el orden de las columnas de cada INSERT) ---
+def _clientes(vol, rng):
+    for i in range(1, vol.clientes + 1):
+        yield (i, rng.choice(NOMBRES), rng.choice(APELLIDOS), f'11{i:08d}', f'cliente{i}@correo.test',
+               str(20_000_000 + i), 1)
+
+
+def _mecanicos(vol, rng):
+    for i in range(1, vol.mecanicos + 1):
+        yield (i, rng.choice(NOMBRES), rng.choice(APELLIDOS), f'15{i:08d}', f'mecanico{i}@taller.test', 1)
+
+
+def _usuarios_mecanicos(vol, hash_contrasena):
+    for i in range(1, vol.mecanicos + 1):
+        yield (i, i, USUARIO_MECANICO if i == 1 else f'mecanico{i}', hash_contrasena)
+
+
+def _usuarios_clientes(vol, hash_contrasena):
+    for i in range(1, min(vol.usuarios, vol.clientes) + 1):
+        yield (i, i, f'cliente{i}', hash_contrasena)
+
+
+def _vehiculos(vol, rng):
+    for i in range(1, vol.vehiculos + 1):
+        marca, modelos = rng.choice(MARCAS)
+        yield (i, cliente_de_vehiculo(i, vol), _patente(i), marca, rng.choice(modelos),
+               rng.randint(1995, 2024), rng.randint(0, 200_000), 1)
+
+
+def _turnos(vol, rng):
+    for i in range(1, vol.turnos + 1):
+        vehiculo_id = rng.randint(1, vol.vehiculos)
+        dias = rng.randint(-365, 60)
+        if dias >= 0:
+            estado = 'Agendado'
+        else:
+            estado = rng.choices(['Completado', 'Cancelado', 'Agendado'], weights=[85, 10, 5])[0]
+        inicio = datetime.fromisoformat(f'{fecha_relativa(dias)} {rng.choice(HORAS)}')
+        yield (i, cliente_de_vehiculo(vehiculo_id, vol), vehiculo_id, rng.randint(1, vol.mecanicos),
+               f'{inicio:%Y-%m-%d %H:%M:%S}', f'{inicio + timedelta(hours=1):%Y-%m-%d %H:%M:%S}', 'General',
+               rng.choice(PROBLEMAS), estado)
+
+
+def _reparaciones(vol, rng):
+    for i in range(1, vol.reparaciones + 1):
+        dias = -rng.randint(0, 3 * 365)
+        activa = dias > -30 and rng.random() < 0.3
+        mano_obra = round(rng.uniform(5_000, 80_000), 2)
+        kilometraje = rng.randint(1_000, 250_000)
+        yield (i, rng.randint(1, vol.vehiculos), rng.randint(1, vol.mecanicos), fecha_relativa(dias),
+               None if activa else fecha_relativa(dias + rng.randint(0, 10)), kilometraje,
+               None if activa else kilometraje + rng.randint(0, 50),
+               rng.choice(PROBLEMAS), None if activa else 'Trabajo realizado', None if activa else 'Repuestos varios',
+               mano_obra, round(mano_obra * rng.uniform(1.0, 3.0), 2),
+               rng.choice(ESTADOS_ACTIVOS) if activa else 'Completado', 1)
+
+
+TABLAS = [
+    ('clientes', 'id, nombre, apellido, telefono, email, dni, version', _clientes),
+    ('mecanicos', 'id, nombre, apellido, telefono, email, version', _mecanicos),
+    ('usuarios_mecanicos', 'id, mecanico_id, username, password', _usuarios_mecanicos),
+    ('usuarios_clientes', 'id, cliente_id, username, password', _usuarios_clientes),
+    ('vehiculos', 'id, cliente_id, patente, marca, modelo, anio, kilometraje_inicial, version', _vehiculos),
+    ('turnos', 'id, cliente_id, vehiculo_id, mecanico_id, fecha_hora, fin, tipo_trabajo, problema_reportado, estado',
+     _turnos),
+    ('reparaciones', 'id, vehiculo_id, mecanico_id, fecha_ingreso, fecha_salida, kilometraje_ingreso, '
+                     'kilometraje_salida, problema_reportado, trabajos_realizados, repuestos_usados, '
+                     'costo_mano_obra, costo_total, estado, version', _reparaciones),
+]
+TABLAS_VERSIONADAS = ('clientes', 'mecanicos', 'vehiculos', 'reparaciones')
+
+
+def _lotes(filas, tamano=LOTE):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _insertar(conn, es_postgresql, tabla, columnas, filas):
+    cursor = conn.cursor()
+    total = 0
+    if es_postgresql:
+        from psycopg2.extras import execute_values
+        sql = f'INSERT INTO {tabla} ({columnas}) VALUES %s'
+        for lote in _lotes(filas):
+            execute_values(cursor, sql, lote, page_size=1000)
+            total += len(lote)
+    else:
+        marcadores = ', '.join('?' for _ in columnas.split(','))
+        sql = f'INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})'
+        for lote in _lotes(filas):
+            cursor.executemany(sql, lote)
+            total += len(lote)
+    return total
+
+
+def contar(conn):
+    """Filas actuales de cada tabla sembrada."""
+    cursor = conn.cursor()
+    cantidades = {}
+    for tabla, _, _ in TABLAS:
+        cursor.execute(f'SELECT COUNT(*) FROM {tabla}')
+        cantidades[tabla] = cursor.fetchone()[0]
+    return cantidades
+
+
+def sembrar(volumenes, semilla=1, mostrar=print):
+    """
+    Aplica las migraciones y carga los volúmenes pedidos en la base configurada, que debe estar
+    vacía. Devuelve {tabla: filas}. Usa gestor_datos, así que la base ya tiene que estar elegida.
+    """
+    import gestor_datos
+    import contrasenas
+
+    if not gestor_datos.asegurar_esquema():
+        raise RuntimeError("No se pudo preparar el esquema de la base de benchmark.")
+    conn = gestor_datos.obtener_conexion()
+    if conn is None:
+        raise RuntimeError("No se pudo conectar a la base de benchmark.")
+    try:
+        es_postgresql = isinstance(conn, psycopg2.extensions.connection)
+        if any(contar(conn).values()):
+            raise RuntimeError("La base de benchmark no está vacía; use otra ruta o bórrela.")
+        rng = random.Random(semilla)
+        hash_contrasena = contrasenas.hashear(CONTRASENA)
+        cantidades = {}
+        for tabla, columnas, generador in TABLAS:
+            inicio = time.perf_counter()
+            if tabla.startswith('usuarios_'):
+                filas = generador(volumenes, hash_contrasena)
+            else:
+                filas = generador(volumenes, rng)
+            cantidades[tabla] = _insertar(conn, es_postgresql, tabla, columnas, filas)
+            conn.commit()
+            mostrar(f"  {tabla}: {cantidades[tabla]} filas en {time.perf_counter() - inicio:.1f}s")
+
+        cursor = conn.cursor()
+        for tabla in TABLAS_VERSIONADAS:
+            cursor.execute(f'UPDATE {tabla} SET actualizado_en = CURRENT_TIMESTAMP WHERE actualizado_en IS NULL')
+        if es_postgresql:
+            # Los ids se insertaron explícitamente: las secuencias tienen que seguir desde el máximo.
+            for tabla, _, _ in TABLAS:
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+                               f"COALESCE((SELECT MAX(id) FROM {tabla}), 1))")
+        conn.commit()
+        # gestor_datos mantiene el resumen diario del tablero en cada escritura; la siembra inserta
+        # directamente, así que se calcula una sola vez al final.
+        if not gestor_datos.refrescar_resumen_reparaciones():
+            raise RuntimeError("No se pudo calcular el resumen de reparaciones de la base de benchmark.")
+        # Estadísticas para el planificador: sin ellas los planes no son los de producción.
+        cursor.execute('ANALYZE')
+        conn.commit()
+        return cantidades
+    finally:
+        conn.close()
@@ -0,0 +1,348 @@
+"""
+Microbenchmarks de cada función pública de gestor_datos sobre bases sembradas de varias escalas.
+
+Cada escala se mide en un proceso propio (gestor_datos fija la base al importarse) contra su
+propia base bench_micro_<escala>.db. Cada llamada corre dentro de una unidad de trabajo que se
+deshace al final, así que las funciones que escriben no cambian los datos entre repeticiones
+ni entre corridas. Con los p50 de todas las escalas se arma la curva tiempo vs. filas de cada
+función y se ajusta su exponente (pendiente log-log): ~0 no depende del tamaño de las tablas,
+~1 recorre la tabla entera.
+
+    python -m benchmarks.micro --escalas mini,chica,media
+    python -m benchmarks.micro --escalas chica,media --funciones obtener_todos_los_turnos,buscar_vehiculos
+    python -m benchmarks.micro --postgres postgresql://localhost/taller_micro_{escala}
+
+Las bases se siembran con BCRYPT_ROUNDS=4 (salvo que el entorno diga otra cosa) para que las
+funciones que verifican o hashean contraseñas midan sobre todo su acceso a datos.
+"""
+import argparse
+import inspect
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import datos, resultados
+
+# Exponente a partir del cual una función se considera lineal en el tamaño de la base.
+EXPONENTE_LINEAL = 0.75
+
+
+# --- Argumentos de cada función ---
+# Cada caso recibe (rng, volúmenes, n) y devuelve los argumentos de una llamada; `n` es el
+# número de repetición, para los valores que tienen que ser únicos (dni, usuario, patente).
+def _cliente(rng, vol):
+    return rng.randint(1, vol.clientes)
+
+
+def _vehiculo(rng, vol):
+    return rng.randint(1, vol.vehiculos)
+
+
+def _mecanico(rng, vol):
+    return rng.randint(1, vol.mecanicos)
+
+
+def _persona(rng):
+    return rng.choice(datos.NOMBRES), rng.choice(datos.APELLIDOS)
+
+
+def _actualizar_cliente(rng, vol):
+    cliente_id = _cliente(rng, vol)
+    return (cliente_id, *_persona(rng), f'11{cliente_id:08d}', f'cliente{cliente_id}@correo.test',
+            str(20_000_000 + cliente_id))
+
+
+def _actualizar_mecanico(rng, vol):
+    mecanico_id = _mecanico(rng, vol)
+    return (mecanico_id, *_persona(rng), f'15{mecanico_id:08d}', f'mecanico{mecanico_id}@taller.test')
+
+
+def _actualizar_vehiculo(rng, vol):
+    vehiculo_id = _vehiculo(rng, vol)
+    return vehiculo_id, 'Ford', 'Ka', 2020, datos._patente(vehiculo_id), 1000
+
+
+def _turno(rng, vol):
+    """(cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema) de un turno futuro coherente."""
+    vehiculo_id = _vehiculo(rng, vol)
+    return (datos.cliente_de_vehiculo(vehiculo_id, vol), vehiculo_id, _mecanico(rng, vol),
+            datos.fecha_relativa(rng.randint(1, 30)), rng.choice(datos.HORAS), rng.choice(datos.PROBLEMAS))
+
+
+def _semana(rng, vol):
+    """(desde, hasta, mecanico_id) de una semana de agenda de un mecánico."""
+    desde = rng.randint(-60, 30)
+    return datos.fecha_relativa(desde), datos.fecha_relativa(desde + 7), _mecanico(rng, vol)
+
+
+CASOS = {
+    # Lecturas por clave
+    'obtener_cliente_por_id': lambda rng, vol, n: (_cliente(rng, vol),),
+    'obtener_cliente_por_username': lambda rng, vol, n: (f'cliente{rng.randint(1, min(vol.usuarios, vol.clientes))}',),
+    'obtener_cliente_por_nombre_apellido': lambda rng, vol, n: _persona(rng),
+    'obtener_mecanico_por_id': lambda rng, vol, n: (_mecanico(rng, vol),),
+    'obtener_vehiculo_por_id': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'obtener_vehiculos_por_cliente': lambda rng, vol, n: (_cliente(rng, vol),),
+    'obtener_turno_por_id': lambda rng, vol, n: (rng.randint(1, vol.turnos),),
+    'obtener_reparacion_por_id': lambda rng, vol, n: (rng.randint(1, vol.reparaciones),),
+    'obtener_reparacion_activa_por_vehiculo': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'obtener_historial_reparaciones_vehiculo': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'iterar_historial_reparaciones_vehiculo': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'transmitir_historial_reparaciones_vehiculo': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'obtener_estado_vehiculos_cliente': lambda rng, vol, n: (_cliente(rng, vol),),
+    'obtener_sello_cliente': lambda rng, vol, n: (_cliente(rng, vol),),
+    'obtener_sello_vehiculo': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'obtener_sello_estado_vehiculos': lambda rng, vol, n: (_cliente(rng, vol),),
+    'obtener_vehiculos_con_cliente': lambda rng, vol, n: ([_cliente(rng, vol) for _ in range(5)],),
+    'buscar_clientes': lambda rng, vol, n: (rng.choice(datos.APELLIDOS)[:3],),
+    'buscar_vehiculos': lambda rng, vol, n: (rng.choice(datos.APELLIDOS)[:3],),
+    # Listados
+    'obtener_todos_los_clientes': lambda rng, vol, n: (),
+    'obtener_todos_los_mecanicos': lambda rng, vol, n: (),
+    'obtener_todos_los_turnos': lambda rng, vol, n: (),
+    'iterar_todos_los_turnos': lambda rng, vol, n: (),
+    'obtener_vehiculos_en_taller': lambda rng, vol, n: (),
+    'obtener_clientes_paginados': lambda rng, vol, n: (),
+    'obtener_mecanicos_paginados': lambda rng, vol, n: (),
+    'obtener_turnos_paginados': lambda rng, vol, n: (),
+    'obtener_turnos_en_rango': lambda rng, vol, n: _semana(rng, vol),
+    'obtener_conflictos_turno': lambda rng, vol, n: _turno(rng, vol)[2:5],
+    'obtener_proximo_horario_libre': lambda rng, vol, n: (_mecanico(rng, vol), datos.fecha_relativa(rng.randint(1, 30))),
+    'obtener_ultimo_evento_reparaciones': lambda rng, vol, n: (),
+    'obtener_eventos_reparaciones_desde': lambda rng, vol, n: (0,),
+    'obtener_resumen_reparaciones': lambda rng, vol, n: (datos.fecha_relativa(-84), datos.fecha_relativa(7)),
+    # Escrituras (se deshacen al terminar cada llamada)
+    'agregar_cliente': lambda rng, vol, n: (*_persona(rng), f'11{n:08d}', f'micro{n}@correo.test', str(90_000_000 + n)),
+    'registrar_cliente_con_usuario': lambda rng, vol, n: (*_persona(rng), f'micro{n}', datos.CONTRASENA,
+                                                          str(90_000_000 + n)),
+    'actualizar_cliente': lambda rng, vol, n: _actualizar_cliente(rng, vol),
+    'eliminar_cliente': lambda rng, vol, n: (_cliente(rng, vol),),
+    'agregar_mecanico': lambda rng, vol, n: (*_persona(rng), f'15{n:08d}', f'micro{n}@taller.test', f'micro{n}',
+                                             datos.CONTRASENA),
+    'actualizar_mecanico': lambda rng, vol, n: _actualizar_mecanico(rng, vol),
+    'eliminar_mecanico': lambda rng, vol, n: (_mecanico(rng, vol),),
+    'agregar_vehiculo': lambda rng, vol, n: (_cliente(rng, vol), f'MIC{n:07d}', 'Ford', 'Ka', 2020, 1000),
+    'actualizar_vehiculo': lambda rng, vol, n: _actualizar_vehiculo(rng, vol),
+    'eliminar_vehiculo': lambda rng, vol, n: (_vehiculo(rng, vol),),
+    'agregar_turno': lambda rng, vol, n: _turno(rng, vol),
+    'actualizar_turno': lambda rng, vol, n: (rng.randint(1, vol.turnos), *_turno(rng, vol), 'Agendado'),
+    'eliminar_turno': lambda rng, vol, n: (rng.randint(1, vol.turnos),),
+    'crear_reparacion_desde_turno': lambda rng, vol, n: (rng.randint(1, vol.turnos),),
+    'agregar_reparacion': lambda rng, vol, n: (_vehiculo(rng, vol), _mecanico(rng, vol), datos.fecha_relativa(0),
+                                               50_000, rng.choice(datos.PROBLEMAS)),
+    'actualizar_estado_reparacion': lambda rng, vol, n: (rng.randint(1, vol.reparaciones), 'Completado',
+                                                         'Trabajo realizado', 'Repuestos varios', 20_000.0, 45_000.0,
+                                                         datos.fecha_relativa(0), 60_000),
+    'purgar_eventos_reparaciones': lambda rng, vol, n: (24,),
+    'refrescar_resumen_reparaciones': lambda rng, vol, n: (datos.fecha_relativa(-7), datos.fecha_relativa(0)),
+    # Credenciales (incluyen bcrypt con el costo de la base sembrada)
+    'verificar_credenciales_cliente': lambda rng, vol, n: (f'cliente{rng.randint(1, min(vol.usuarios, vol.clientes))}',
+                                                           datos.CONTRASENA),
+    'verificar_credenciales_mecanico': lambda rng, vol, n: (datos.USUARIO_MECANICO, datos.CONTRASENA),
+}
+
+
+def funciones_a_medir(filtro=None):
+    """[(nombre, función)] públicas de gestor_datos con caso definido, y los nombres sin caso."""
+    import gestor_datos
+    from explicar_consultas import FUNCIONES_EXCLUIDAS
+
+    funciones, sin_caso = [], []
+    for nombre, funcion in inspect.getmembers(gestor_datos, inspect.isfunction):
+        if nombre.startswith('_') or nombre in FUNCIONES_EXCLUIDAS or funcion.__module__ != gestor_datos.__name__:
+            continue
+        if filtro and nombre not in filtro:
+            continue
+        if nombre in CASOS:
+            funciones.append((nombre, funcion))
+        else:
+            sin_caso.append(nombre)
+    return funciones, sin_caso
+
+
+def _llamar(gestor_datos, funcion, argumentos):
+    """Una llamada cronometrada (en ms) dentro de una unidad de trabajo que se deshace."""
+    inicio = time.perf_counter()
+    gestor_datos.iniciar_unidad_de_trabajo()
+    try:
+        resultado = funcion(*argumentos)
+        if inspect.isgenerator(resultado):
+            for _ in resultado:
+                pass
+    finally:
+        gestor_datos.finalizar_unidad_de_trabajo(exito=False)
+    return (time.perf_counter() - inicio) * 1000.0
+
+
+def medir_funcion(funcion, caso, vol, rng, tiempo, minimo=5, maximo=2_000, calentamiento=2):
+    """Repite la función hasta agotar `tiempo` segundos (entre `minimo` y `maximo` llamadas)."""
+    import gestor_datos
+
+    for n in range(calentamiento):
+        _llamar(gestor_datos, funcion, caso(rng, vol, n))
+    muestras = []
+    hasta = time.perf_counter() + tiempo
+    n = calentamiento
+    while len(muestras) < maximo and (len(muestras) < minimo or time.perf_counter() < hasta):
+        muestras.append(_llamar(gestor_datos, funcion, caso(rng, vol, n)))
+        n += 1
+    return resultados.resumir(muestras)
+
+
+def medir_escala(args):
+    """Proceso hijo: prepara la base de una escala y mide cada función. Devuelve el resultado."""
+    from benchmarks import carga
+
+    vol = datos.ESCALAS[args.escala]
+    base = argparse.Namespace(
+        escala=args.escala, semilla=args.semilla, resembrar=args.resembrar,
+        postgres=args.postgres.format(escala=args.escala) if args.postgres else None,
+        base=os.path.join(args.directorio_bases, f'bench_micro_{args.escala}.db'))
+    motor, cantidades = carga.preparar_base(base, vol)
+
+    filtro = set(args.funciones.split(',')) if args.funciones else None
+    funciones, sin_caso = funciones_a_medir(filtro)
+    medidas = {}
+    for nombre, funcion in funciones:
+        rng = random.Random(args.semilla)
+        print(f"  [{args.escala}] {nombre}...", file=sys.stderr)
+        medidas[nombre] = medir_funcion(funcion, CASOS[nombre], vol, rng, args.tiempo)
+    return {'motor': motor, 'volumenes': cantidades, 'filas': sum(cantidades.values()),
+            'funciones': medidas, 'sin_caso': sin_caso}
+
+
+# --- Curvas de escalamiento ---
+def exponente(puntos):
+    """Pendiente de mínimos cuadrados de log(tiempo) sobre log(filas); None con menos de dos escalas."""
+    puntos = [(math.log(filas), math.log(ms)) for filas, ms in puntos if filas > 0 and ms > 0]
+    if len(puntos) < 2:
+        return None
+    media_x = sum(x for x, _ in puntos) / len(puntos)
+    media_y = sum(y for _, y in puntos) / len(puntos)
+    varianza = sum((x - media_x) ** 2 for x, _ in puntos)
+    if not varianza:
+        return None
+    return sum((x - media_x) * (y - media_y) for x, y in puntos) / varianza
+
+
+def crecimiento(valor):
+    if valor is None:
+        return '-'
+    if valor < 0.25:
+        return 'constante'
+    if valor < EXPONENTE_LINEAL:
+        return 'sublineal'
+    if valor < 1.25:
+        return 'lineal'
+    return 'superlineal'
+
+
+def curvas(por_escala):
+    """{función: {'puntos': [(filas, p50_ms)], 'exponente', 'crecimiento'}} ordenadas por escala."""
+    resultado = {}
+    escalas = sorted(por_escala.values(), key=lambda medida: medida['filas'])
+    nombres = sorted({nombre for medida in escalas for nombre in medida['funciones']})
+    for nombre in nombres:
+        puntos = [(medida['filas'], medida['funciones'][nombre]['p50_ms'])
+                  for medida in escalas if nombre in medida['funciones']]
+        valor = exponente(puntos)
+        resultado[nombre] = {'puntos': puntos, 'exponente': round(valor, 3) if valor is not None else None,
+                             'crecimiento': crecimiento(valor)}
+    return resultado
+
+
+def _ejecutar_escala(escala, args):
+    """Lanza `python -m benchmarks.micro --medir <escala>` y lee su JSON."""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as archivo:
+        salida = archivo.name
+    comando = [sys.executable, '-m', 'benchmarks.micro', '--medir', escala, '--json', salida,
+               '--tiempo', str(args.tiempo), '--semilla', str(args.semilla),
+               '--directorio-bases', args.directorio_bases]
+    if args.funciones:
+        comando += ['--funciones', args.funciones]
+    if args.postgres:
+        comando += ['--postgres', args.postgres]
+    if args.resembrar:
+        comando.append('--resembrar')
+    entorno = dict(os.environ)
+    entorno.setdefault('BCRYPT_ROUNDS', '4')
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    entorno['PYTHONPATH'] = os.pathsep.join(filter(None, [raiz, entorno.get('PYTHONPATH')]))
+    try:
+        subprocess.run(comando, env=entorno, check=True)
+        with open(salida, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    finally:
+        os.remove(salida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks de gestor_datos y curvas de escalamiento.")
+    parser.add_argument('--escalas', default='mini,chica,media', help="Escalas separadas por coma.")
+    parser.add_argument('--funciones', help="Medir sólo estas funciones (separadas por coma).")
+    parser.add_argument('--tiempo', type=float, default=0.5, help="Segundos de medición por función y escala.")
+    parser.add_argument('--postgres', metavar='DSN', help="DSN con {escala}, p. ej. postgresql://localhost/micro_{escala}.")
+    parser.add_argument('--directorio-bases', default='.', help="Dónde crear las bases SQLite de cada escala.")
+    parser.add_argument('--resembrar', action='store_true', help="Borra las bases SQLite y las vuelve a sembrar.")
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help="Directorio de resultados (por defecto benchmarks/resultados).")
+    parser.add_argument('--medir', metavar='ESCALA', help=argparse.SUPPRESS)
+    parser.add_argument('--json', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.directorio_bases = os.path.abspath(args.directorio_bases)
+
+    if args.medir:
+        args.escala = args.medir
+        with open(args.json, 'w', encoding='utf-8') as archivo:
+            json.dump(medir_escala(args), archivo)
+        return 0
+
+    escalas = [nombre.strip() for nombre in args.escalas.split(',') if nombre.strip()]
+    desconocidas = set(escalas) - set(datos.ESCALAS)
+    if desconocidas:
+        parser.error(f"Escalas desconocidas: {', '.join(sorted(desconocidas))}")
+    if args.postgres and len(escalas) > 1 and '{escala}' not in args.postgres:
+        parser.error("Con varias escalas el DSN de --postgres tiene que incluir {escala}.")
+
+    por_escala = {}
+    for escala in escalas:
+        print(f"Midiendo escala {escala}...")
+        por_escala[escala] = _ejecutar_escala(escala, args)
+    resultado = {
+        'escalas': por_escala,
+        'curvas': curvas(por_escala),
+        # Mismo formato que las corridas de carga, para comparar con benchmarks.resultados.
+        'operaciones': {f'{nombre}@{escala}': medida
+                        for escala, datos_escala in por_escala.items()
+                        for nombre, medida in datos_escala['funciones'].items()},
+    }
+    sin_caso = sorted({nombre for datos_escala in por_escala.values() for nombre in datos_escala['sin_caso']})
+    motor = next(iter(por_escala.values()))['motor']
+    resultado['metadatos'] = resultados.metadatos(
+        motor=motor, escalas=escalas, tiempo_por_funcion_s=args.tiempo, semilla=args.semilla,
+        bcrypt_rounds=int(os.environ.get('BCRYPT_ROUNDS', 4)), sin_caso=sin_caso)
+
+    encabezado = ''.join(f"{escala + ' p50':>14}" for escala in escalas)
+    print(f"{'función':<42}{encabezado} {'exp.':>6}  crecimiento")
+    for nombre, curva in sorted(resultado['curvas'].items(), key=lambda item: -(item[1]['exponente'] or 0)):
+        tiempos = ''
+        for escala in escalas:
+            medida = por_escala[escala]['funciones'].get(nombre)
+            tiempos += f"{medida['p50_ms']:>14.3f}" if medida else f"{'-':>14}"
+        valor = curva['exponente']
+        marca = '  <-- O(n)' if valor is not None and valor >= EXPONENTE_LINEAL else ''
+        print(f"{nombre:<42}{tiempos} {valor if valor is not None else '-':>6}  {curva['crecimiento']}{marca}")
+    print("Filas por escala: " + ', '.join(f"{escala}={por_escala[escala]['filas']}" for escala in escalas))
+    if sin_caso:
+        print(f"Funciones sin caso de benchmark (agregarlas a CASOS): {', '.join(sin_caso)}")
+    print(f"Resultados en {resultados.guardar(resultado, 'micro', args.salida)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Resumen, guardado y comparación de resultados de benchmark.
+
+    python -m benchmarks.resultados ANTES.json DESPUES.json
+
+compara dos corridas y muestra, por operación, la variación del p95 y del throughput.
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def percentil(ordenadas, p):
+    """Percentil p (0-100) por el método del rango más cercano sobre una lista ya ordenada."""
+    if not ordenadas:
+        return 0.0
+    indice = max(0, math.ceil(p / 100.0 * len(ordenadas)) - 1)
+    return ordenadas[indice]
+
+
+def resumir(muestras_ms, duracion_s=None):
+    """p50/p95/p99, promedio y máximo (en ms) de una lista de duraciones; throughput si hay duración."""
+    ordenadas = sorted(muestras_ms)
+    resumen = {
+        'cantidad': len(ordenadas),
+        'p50_ms': round(percentil(ordenadas, 50), 3),
+        'p95_ms': round(percentil(ordenadas, 95), 3),
+        'p99_ms': round(percentil(ordenadas, 99), 3),
+        'promedio_ms': round(sum(ordenadas) / len(ordenadas), 3) if ordenadas else 0.0,
+        'max_ms': round(ordenadas[-1], 3) if ordenadas else 0.0,
+    }
+    if duracion_s:
+        resumen['por_segundo'] = round(len(ordenadas) / duracion_s, 2)
+    return resumen
+
+
+def _commit_actual():
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=raiz,
+                                capture_output=True, text=True, timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadatos(**extra):
+    """Datos de la corrida que hacen falta para comparar: commit, fecha, Python y plataforma."""
+    datos = {
+        'commit': _commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+    }
+    datos.update(extra)
+    return datos
+
+
+def guardar(resultado, tipo, directorio=None):
+    """Escribe el resultado en <directorio>/<tipo>-<fecha>-<commit>.json y devuelve la ruta."""
+    directorio = directorio or DIRECTORIO_RESULTADOS
+    os.makedirs(directorio, exist_ok=True)
+    meta = resultado.get('metadatos', {})
+    nombre = f"{tipo}-{datetime.now():%Y%m%d-%H%M%S}-{meta.get('commit') or 'sin-commit'}.json"
+    ruta = os.path.join(directorio, nombre)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    return ruta
+
+
+def comparar(antes, despues):
+    """Filas (operación, p95 antes, p95 después, variación %, throughput antes, después)."""
+    filas = []
+    operaciones_antes = antes.get('operaciones', {})
+    for nombre, datos in despues.get('operaciones', {}).items():
+        previo = operaciones_antes.get(nombre)
+        if not previo:
+            continue
+        variacion = ((datos['p95_ms'] - previo['p95_ms']) / previo['p95_ms'] * 100.0) if previo['p95_ms'] else 0.0
+        filas.append((nombre, previo['p95_ms'], datos['p95_ms'], variacion,
+                      previo.get('por_segundo'), datos.get('por_segundo')))
+    filas.sort(key=lambda fila: fila[3], reverse=True)
+    return filas
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("Uso: python -m benchmarks.resultados ANTES.json DESPUES.json", file=sys.stderr)
+        return 2
+    with open(argv[0], encoding='utf-8') as archivo:
+        antes = json.load(archivo)
+    with open(argv[1], encoding='utf-8') as archivo:
+        despues = json.load(archivo)
+    print(f"Antes:   {antes.get('metadatos', {}).get('commit')}  Después: {despues.get('metadatos', {}).get('commit')}")
+    print(f"{'operación':<45} {'p95 antes':>10} {'p95 desp.':>10} {'var.':>8} {'req/s antes':>12} {'req/s desp.':>12}")
+    for nombre, p95_antes, p95_despues, variacion, rps_antes, rps_despues in comparar(antes, despues):
+        print(f"{nombre:<45} {p95_antes:>10.2f} {p95_despues:>10.2f} {variacion:>+7.1f}% "
+              f"{rps_antes if rps_antes is not None else '-':>12} {rps_despues if rps_despues is not None else '-':>12}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
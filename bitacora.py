@@ -0,0 +1,113 @@
+"""
+Registro (logging) de la aplicación.
+
+Los módulos piden su logger con logging.getLogger(__name__) y registran con argumentos
+diferidos (log.debug("Turno %s", turno_id)): si el nivel está desactivado, el mensaje ni
+siquiera se formatea. configurar() lo prepara una vez por proceso:
+
+- LOG_NIVEL (DEBUG, INFO, WARNING...; por defecto INFO) y LOG_NIVEL_<MÓDULO> para ajustar
+  un módulo puntual (p. ej. LOG_NIVEL_GESTOR_DATOS=DEBUG).
+- Las peticiones sólo encolan el registro; un hilo aparte lo escribe en stderr. La cola es
+  acotada (LOG_COLA_MAX): si se llena, los registros se descartan y se cuentan, en lugar de
+  bloquear la petición.
+- Cada registro lleva el id de correlación de la petición en curso (cabecera X-Request-ID
+  o uno generado), para seguir una petición a través de los módulos.
+- LOG_CONSULTAS_LENTAS=<archivo> copia además el log de consultas lentas
+  (perfil_consultas.lentas) a ese archivo.
+- debug_muestreado() emite sólo una fracción (LOG_MUESTREO) de los DEBUG de rutas calientes.
+"""
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import uuid
+
+LOG_NIVEL = os.environ.get('LOG_NIVEL', 'INFO').upper()
+LOG_COLA_MAX = int(os.environ.get('LOG_COLA_MAX', '10000'))
+LOG_MUESTREO = float(os.environ.get('LOG_MUESTREO', '0.01'))
+LOG_CONSULTAS_LENTAS = os.environ.get('LOG_CONSULTAS_LENTAS')
+FORMATO = '%(asctime)s %(levelname)-7s [%(correlacion)s] %(name)s: %(message)s'
+
+_correlacion = contextvars.ContextVar('correlacion', default='-')
+_listener = None
+_manejador = None
+_lock = threading.Lock()
+
+
+class FiltroCorrelacion(logging.Filter):
+    """Agrega el id de correlación de la petición en curso a cada registro."""
+
+    def filter(self, record):
+        record.correlacion = _correlacion.get()
+        return True
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea: con la cola llena descarta el registro y lo cuenta."""
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+def configurar():
+    """Instala el manejador con cola en el logger raíz. Es idempotente."""
+    global _listener, _manejador
+    with _lock:
+        if _listener is not None:
+            return
+        salida = logging.StreamHandler()
+        salida.setFormatter(logging.Formatter(FORMATO))
+        cola = queue.Queue(LOG_COLA_MAX)
+        _manejador = ManejadorCola(cola)
+        _manejador.addFilter(FiltroCorrelacion())
+        raiz = logging.getLogger()
+        raiz.addHandler(_manejador)
+        raiz.setLevel(LOG_NIVEL)
+        for variable, valor in os.environ.items():
+            if variable.startswith('LOG_NIVEL_'):
+                logging.getLogger(variable[len('LOG_NIVEL_'):].lower()).setLevel(valor.upper())
+        destinos = [salida]
+        if LOG_CONSULTAS_LENTAS:
+            lentas = logging.FileHandler(LOG_CONSULTAS_LENTAS, encoding='utf-8')
+            lentas.setFormatter(logging.Formatter(FORMATO))
+            lentas.addFilter(logging.Filter('perfil_consultas.lentas'))
+            destinos.append(lentas)
+        _listener = logging.handlers.QueueListener(cola, *destinos, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def iniciar_correlacion(valor=None):
+    """Fija el id de correlación del contexto actual (uno nuevo si no se indica) y lo devuelve."""
+    valor = (valor or '')[:64] or uuid.uuid4().hex[:12]
+    _correlacion.set(valor)
+    return valor
+
+
+def correlacion_actual():
+    return _correlacion.get()
+
+
+def debug_muestreado(log, mensaje, *args, tasa=None):
+    """
+    DEBUG de una ruta caliente: se emite en una fracción `tasa` de las llamadas (LOG_MUESTREO
+    por defecto). Con DEBUG desactivado sólo cuesta la comparación de nivel.
+    """
+    if log.isEnabledFor(logging.DEBUG) and random.random() < (LOG_MUESTREO if tasa is None else tasa):
+        log.debug(mensaje, *args, stacklevel=2)
+
+
+def registros_descartados():
+    """Cantidad de registros perdidos por cola llena desde el arranque."""
+    return _manejador.descartados if _manejador else 0
@@ -0,0 +1,187 @@
+"""
+Caché en memoria para datos de referencia: las listas de clientes y mecánicos con las que se
+llenan los formularios de turnos y reparaciones, que cambian muy de vez en cuando.
+
+Cada entrada vence a los CACHE_TTL segundos y, si se superan CACHE_MAX_ENTRADAS, se descarta la
+usada hace más tiempo (LRU). gestor_datos llama a invalidar(tabla) al confirmar cada escritura
+sobre esa tabla. CACHE_TTL=0 desactiva la caché.
+
+Con varios procesos (workers) cada uno tiene su propia caché. CACHE_COMPARTIDA=<archivo SQLite>
+los mantiene coherentes: cada invalidación suma uno a la generación de la tabla en ese archivo,
+y antes de servir una entrada el proceso mira si otro cambió alguna generación (PRAGMA
+data_version: no lee la tabla salvo que alguien haya escrito). Sólo se comparten contadores;
+los valores nunca salen del proceso.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metricas
+
+log = logging.getLogger(__name__)
+
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '300'))
+CACHE_MAX_ENTRADAS = int(os.environ.get('CACHE_MAX_ENTRADAS', '256'))
+CACHE_COMPARTIDA = os.environ.get('CACHE_COMPARTIDA')
+
+
+class GeneracionesCompartidas:
+    """Generación de invalidación por tabla, guardada en un archivo SQLite que comparten los procesos."""
+
+    def __init__(self, ruta, timeout=5.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conexion', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS generaciones '
+                         '(tabla TEXT PRIMARY KEY, generacion INTEGER NOT NULL)')
+            self._local.conexion = conn
+            self._local.version = None
+        return conn
+
+    def cambios(self):
+        """{tabla: generación} si alguien escribió desde la última consulta de este hilo; si no, None."""
+        conn = self._conexion()
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._local.version:
+            return None
+        self._local.version = version
+        return dict(conn.execute('SELECT tabla, generacion FROM generaciones').fetchall())
+
+    def incrementar(self, tabla):
+        """Suma uno a la generación de la tabla y devuelve la nueva."""
+        conn = self._conexion()
+        conn.execute('INSERT INTO generaciones (tabla, generacion) VALUES (?, 1) '
+                     'ON CONFLICT (tabla) DO UPDATE SET generacion = generacion + 1', (tabla,))
+        return conn.execute('SELECT generacion FROM generaciones WHERE tabla = ?', (tabla,)).fetchone()[0]
+
+
+class _Entrada:
+    __slots__ = ('valor', 'vence')
+
+    def __init__(self, valor, vence):
+        self.valor = valor
+        self.vence = vence
+
+
+class CacheReferencia:
+    """
+    Caché de lectura con vencimiento (`ttl` segundos) y a lo sumo `max_entradas` entradas.
+    Las claves son (tabla, clave); invalidar(tabla) descarta todas las de esa tabla.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_entradas=CACHE_MAX_ENTRADAS, compartida=None):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.compartida = compartida
+        self._entradas = OrderedDict()
+        # Invalidaciones locales por tabla: una carga que se cruzó con una invalidación no se guarda.
+        self._generaciones = {}
+        # Última generación compartida conocida por tabla.
+        self._vistas = {}
+        self._lock = threading.Lock()
+        self._contadores = {'acierto': 0, 'fallo': 0, 'vencida': 0, 'desalojada': 0, 'invalidacion': 0}
+
+    def obtener(self, tabla, clave, cargar):
+        """
+        Devuelve el valor guardado para (tabla, clave) o, si no hay uno vigente, el de cargar().
+        Si cargar() devuelve None (p. ej. por un error de la base) no se guarda nada.
+        """
+        if self.ttl <= 0:
+            return cargar()
+        self._sincronizar()
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get((tabla, clave))
+            if entrada is not None:
+                if entrada.vence > ahora:
+                    self._entradas.move_to_end((tabla, clave))
+                    self._contadores['acierto'] += 1
+                    return entrada.valor
+                del self._entradas[(tabla, clave)]
+                self._contadores['vencida'] += 1
+            self._contadores['fallo'] += 1
+            generacion = self._generaciones.get(tabla, 0)
+        valor = cargar()
+        if valor is None:
+            return None
+        with self._lock:
+            # Si la tabla se invalidó durante la carga, el valor puede ser anterior al cambio.
+            if self._generaciones.get(tabla, 0) == generacion:
+                self._entradas[(tabla, clave)] = _Entrada(valor, time.monotonic() + self.ttl)
+                self._entradas.move_to_end((tabla, clave))
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+                    self._contadores['desalojada'] += 1
+        return valor
+
+    def _descartar(self, tabla):
+        # Llamar con self._lock tomado.
+        self._generaciones[tabla] = self._generaciones.get(tabla, 0) + 1
+        for clave in [clave for clave in self._entradas if clave[0] == tabla]:
+            del self._entradas[clave]
+        self._contadores['invalidacion'] += 1
+
+    def invalidar(self, tabla):
+        """Descarta las entradas de la tabla en este proceso y, si hay caché compartida, en los demás."""
+        with self._lock:
+            self._descartar(tabla)
+        if self.compartida is None:
+            return
+        try:
+            generacion = self.compartida.incrementar(tabla)
+        except sqlite3.Error as e:
+            log.error("No se pudo anotar la invalidación de %s en la caché compartida: %s", tabla, e)
+            return
+        with self._lock:
+            self._vistas[tabla] = generacion
+
+    def _sincronizar(self):
+        if self.compartida is None:
+            return
+        try:
+            cambios = self.compartida.cambios()
+        except sqlite3.Error as e:
+            # Sin saber qué invalidaron los demás procesos, nada de lo guardado es confiable.
+            log.warning("No se pudo consultar la caché compartida: %s", e)
+            with self._lock:
+                for tabla in {clave[0] for clave in self._entradas}:
+                    self._descartar(tabla)
+            return
+        if not cambios:
+            return
+        with self._lock:
+            for tabla, generacion in cambios.items():
+                if self._vistas.get(tabla) != generacion:
+                    self._vistas[tabla] = generacion
+                    self._descartar(tabla)
+
+    def vaciar(self):
+        with self._lock:
+            for tabla in {clave[0] for clave in self._entradas}:
+                self._descartar(tabla)
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['entradas'] = len(self._entradas)
+        return datos
+
+
+central = CacheReferencia(compartida=GeneracionesCompartidas(CACHE_COMPARTIDA) if CACHE_COMPARTIDA else None)
+
+metricas.Calculada('taller_cache_referencia_total', 'Lecturas e invalidaciones de la caché de datos de referencia.',
+                   ('resultado',),
+                   lambda: [((resultado,), cantidad) for resultado, cantidad in central.estadisticas().items()
+                            if resultado != 'entradas'],
+                   tipo='counter')
+metricas.Calculada('taller_cache_referencia_entradas', 'Entradas guardadas en la caché de datos de referencia.', (),
+                   lambda: [((), central.estadisticas()['entradas'])])
@@ -1,7 +1,20 @@
 import os
+import json
+import math
+import logging
+import sqlite3
 import bcrypt
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, Response, make_response
 import gestor_datos # Importa el módulo para interactuar con la base de datos
+import json_por_partes
+import notificaciones
+import contrasenas
+import limitador_intentos
+import bitacora
+import metricas
+
+bitacora.configurar()
+log = logging.getLogger(__name__)
 
 # ==========================================================
 # Inicialización de la aplicación Flask para clientes
@@ -12,15 +25,63 @@ import gestor_datos # Importa el módulo para interactuar con la base de datos
 # 'template_folder': donde Flask buscará el archivo HTML principal de React (generalmente index.html).
 cliente_app = Flask(__name__, static_folder='static_cliente', static_url_path='/static', template_folder='templates_cliente')
 cliente_app.secret_key = os.environ.get("CLIENT_SECRET_KEY", "una_clave_secreta_muy_larga_y_aleatoria_para_pruebas_locales_FIJA")
+# Latencia por ruta, peticiones en curso y render de plantillas; expone GET /metrics.
+metricas.instrumentar_flask(cliente_app, 'clientes')
 
 # ==========================================================
 # Configuración de Base de Datos y Tablas
 # ==========================================================
-# Este decorador asegura que las tablas de la base de datos se creen
-# antes de cada solicitud si no existen.
+# Peticiones que no son GET pero sólo leen: el inicio de sesión corre bcrypt después de leer
+# las credenciales y no debe hacerlo con el bloqueo de escritura de SQLite tomado. Su única
+# escritura posible (rehacer el hash) tolera fallar y se reintenta en el próximo inicio.
+_SOLO_LECTURA = {'login_api'}
+
+# Las migraciones se aplican una sola vez por proceso. Tras la primera verificación
+# este hook sólo consulta un flag en memoria, sin tocar la base de datos.
 @cliente_app.before_request
 def before_request_create_tables():
-    gestor_datos.crear_tablas()
+    # Id de correlación de la petición: aparece en cada registro de log que genere.
+    g.id_peticion = bitacora.iniciar_correlacion(request.headers.get('X-Request-ID'))
+    gestor_datos.asegurar_esquema()
+    # Una conexión y una transacción por petición, confirmada al final. Las que no son GET
+    # pueden escribir: en SQLite toman el bloqueo de escritura al empezar.
+    g.unidad_trabajo = gestor_datos.iniciar_unidad_de_trabajo(escritura=_es_escritura())
+
+def _es_escritura():
+    return request.method not in ('GET', 'HEAD') and request.endpoint not in _SOLO_LECTURA
+
+@cliente_app.after_request
+def confirmar_unidad_de_trabajo(response):
+    if not gestor_datos.finalizar_unidad_de_trabajo(exito=response.status_code < 500):
+        if response.status_code < 500:
+            response = jsonify({'success': False, 'message': 'Error al guardar los cambios en la base de datos.'})
+            response.status_code = 500
+    response.headers['X-Request-ID'] = g.id_peticion
+    return response
+
+@cliente_app.teardown_request
+def cerrar_unidad_de_trabajo(error):
+    # Sólo queda abierta si la vista lanzó una excepción: en ese caso se deshace todo.
+    gestor_datos.finalizar_unidad_de_trabajo(exito=False)
+
+@cliente_app.errorhandler(contrasenas.ContrasenasSaturadasError)
+def contrasenas_saturadas(error):
+    # El grupo de bcrypt está lleno: se rechaza en lugar de encolar sin límite.
+    log.warning("Petición rechazada: %s", error)
+    response = jsonify({'success': False, 'message': 'El servidor está ocupado. Intenta nuevamente en unos segundos.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@cliente_app.errorhandler(sqlite3.OperationalError)
+def base_ocupada(error):
+    # Una función de datos no pudo usar la base (p. ej. "database is locked" tras agotar el
+    # busy_timeout): la unidad de trabajo se deshace al terminar la petición.
+    log.error("Petición rechazada por un error de la base de datos: %s", error)
+    response = jsonify({'success': False, 'message': 'La base de datos está ocupada. Intenta nuevamente en unos segundos.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 # ==========================================================
 # Rutas de la Aplicación (Servir el Frontend)
@@ -80,8 +141,18 @@ def login_api():
     if not username or not password:
         return jsonify({'success': False, 'message': 'Faltan usuario o contraseña.'}), 400
 
+    # Demasiados fallos recientes para este usuario o IP: se rechaza sin gastar un bcrypt.
+    espera = limitador_intentos.espera_login(username, request.remote_addr)
+    if espera:
+        log.warning("Inicio de sesión de cliente bloqueado para '%s' desde %s (%.0fs)", username, request.remote_addr, espera)
+        response = jsonify({'success': False, 'message': 'Demasiados intentos fallidos. Intenta nuevamente más tarde.'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(espera))
+        return response
+
     # Llama a la función del gestor de datos para verificar las credenciales.
     usuario_cliente_data = gestor_datos.verificar_credenciales_cliente(username, password)
+    limitador_intentos.registrar_login(username, request.remote_addr, bool(usuario_cliente_data))
 
     if usuario_cliente_data:
         # Si las credenciales son válidas, guarda la información del cliente en la sesión.
@@ -113,6 +184,35 @@ def check_session():
         return jsonify({'logged_in': True, 'cliente_id': session['cliente_id'], 'username': session['username']})
     return jsonify({'logged_in': False})
 
+# --- GET condicional (ETag / Last-Modified) ---
+def _respuesta_condicional(sello, construir):
+    """
+    Si el navegador ya tiene la versión indicada por el sello (If-None-Match, o en su defecto
+    If-Modified-Since), responde 304 sin llamar a construir(): no se ejecutan las consultas
+    completas ni se serializa el JSON. Si no, devuelve construir() con ETag y Last-Modified.
+    El ETag incluye al cliente de la sesión, para que no se reutilice entre cuentas.
+    """
+    if sello is None:
+        return construir()
+    etag = f"{session['cliente_id']}-{sello.version}"
+    if request.if_none_match:
+        vigente = request.if_none_match.contains(etag)
+    else:
+        vigente = (request.if_modified_since is not None and sello.ultima_modificacion is not None
+                   and sello.ultima_modificacion <= request.if_modified_since)
+    if vigente:
+        respuesta = Response(status=304)
+    else:
+        respuesta = make_response(construir())
+        if respuesta.status_code != 200:
+            return respuesta
+    respuesta.set_etag(etag)
+    if sello.ultima_modificacion is not None:
+        respuesta.last_modified = sello.ultima_modificacion
+    # Se guarda en el navegador, pero siempre se revalida.
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
 @cliente_app.route('/api/cliente/dashboard')
 def cliente_dashboard_api():
     """
@@ -123,14 +223,16 @@ def cliente_dashboard_api():
         return jsonify({'success': False, 'message': 'No autenticado.'}), 401
 
     cliente_id = session['cliente_id']
-    cliente = gestor_datos.obtener_cliente_por_id(cliente_id)
-    vehiculos = gestor_datos.obtener_vehiculos_por_cliente(cliente_id)
 
-    if cliente:
-        # Convierte los objetos de fila de la base de datos a diccionarios.
-        vehiculos_dict = [dict(v) for v in vehiculos]
-        return jsonify({'success': True, 'cliente': dict(cliente), 'vehiculos': vehiculos_dict})
-    return jsonify({'success': False, 'message': 'Cliente no encontrado.'}), 404
+    def construir():
+        cliente = gestor_datos.obtener_cliente_por_id(cliente_id)
+        vehiculos = gestor_datos.obtener_vehiculos_por_cliente(cliente_id)
+
+        if cliente:
+            return jsonify({'success': True, 'cliente': cliente, 'vehiculos': vehiculos})
+        return jsonify({'success': False, 'message': 'Cliente no encontrado.'}), 404
+
+    return _respuesta_condicional(gestor_datos.obtener_sello_cliente(cliente_id), construir)
 
 @cliente_app.route('/api/vehiculo/<int:vehiculo_id>/historial')
 def vehiculo_historial_api(vehiculo_id):
@@ -141,15 +243,20 @@ def vehiculo_historial_api(vehiculo_id):
     if 'cliente_id' not in session:
         return jsonify({'success': False, 'message': 'No autenticado.'}), 401
 
-    # Obtiene el historial de reparaciones del gestor de datos.
-    historial = gestor_datos.obtener_historial_reparaciones_vehiculo(vehiculo_id)
-
-    # Verifica que el vehículo pertenezca al cliente actual por seguridad.
-    vehiculo_info = gestor_datos.obtener_vehiculo_por_id(vehiculo_id)
-    if not vehiculo_info or vehiculo_info['cliente_id'] != session['cliente_id']:
+    # Verifica que el vehículo pertenezca al cliente actual por seguridad (el sello trae el dueño).
+    sello = gestor_datos.obtener_sello_vehiculo(vehiculo_id)
+    if not sello or sello.cliente_id != session['cliente_id']:
         return jsonify({'success': False, 'message': 'Acceso denegado a este vehículo o historial no encontrado.'}), 403
 
-    return jsonify({'success': True, 'historial': [dict(h) for h in historial]})
+    def construir():
+        # El historial se escribe a medida que se lee de la base: la memoria no crece con la
+        # cantidad de reparaciones ni con el largo de sus textos.
+        historial = gestor_datos.transmitir_historial_reparaciones_vehiculo(vehiculo_id)
+        partes = json_por_partes.lista_en_partes({'success': True}, 'historial', historial,
+                                                 dumps=cliente_app.json.dumps)
+        return Response(partes, mimetype='application/json')
+
+    return _respuesta_condicional(sello._replace(version=f'h.{sello.version}'), construir)
 
 @cliente_app.route('/api/vehiculo/<int:vehiculo_id>/estado_activo')
 def vehiculo_estado_activo_api(vehiculo_id):
@@ -160,25 +267,103 @@ def vehiculo_estado_activo_api(vehiculo_id):
     if 'cliente_id' not in session:
         return jsonify({'success': False, 'message': 'No autenticado.'}), 401
 
-    # Verifica que el vehículo pertenezca al cliente actual por seguridad.
-    vehiculo_info = gestor_datos.obtener_vehiculo_por_id(vehiculo_id)
-    if not vehiculo_info or vehiculo_info['cliente_id'] != session['cliente_id']:
+    # Verifica que el vehículo pertenezca al cliente actual por seguridad (el sello trae el dueño).
+    sello = gestor_datos.obtener_sello_vehiculo(vehiculo_id)
+    if not sello or sello.cliente_id != session['cliente_id']:
         return jsonify({'success': False, 'message': 'Acceso denegado a este vehículo o reparación no encontrada.'}), 403
 
-    # Obtiene la reparación activa del vehículo.
-    reparacion_activa = gestor_datos.obtener_reparacion_activa_por_vehiculo(vehiculo_id)
+    def construir():
+        # Obtiene la reparación activa del vehículo.
+        reparacion_activa = gestor_datos.obtener_reparacion_activa_por_vehiculo(vehiculo_id)
+
+        if reparacion_activa:
+            return jsonify({'success': True, 'reparacion': reparacion_activa})
+        return jsonify({'success': False, 'message': 'No hay reparación activa para este vehículo.'})
+
+    return _respuesta_condicional(sello._replace(version=f'a.{sello.version}'), construir)
+
+@cliente_app.route('/api/cliente/vehiculos/estado')
+def cliente_vehiculos_estado_api():
+    """
+    Estado de todos los vehículos del cliente en una sola petición: reparación activa y
+    últimas reparaciones de cada uno (?historial=N, por defecto 5). Reemplaza el par de
+    peticiones historial + estado_activo por vehículo.
+    Requiere autenticación.
+    """
+    if 'cliente_id' not in session:
+        return jsonify({'success': False, 'message': 'No autenticado.'}), 401
+
+    cliente_id = session['cliente_id']
+    historial_max = max(1, min(request.args.get('historial', 5, type=int), gestor_datos.HISTORIAL_RECIENTE_MAXIMO))
+
+    def construir():
+        # La consulta filtra por el cliente de la sesión: no hace falta verificar cada vehículo.
+        vehiculos = gestor_datos.obtener_estado_vehiculos_cliente(cliente_id, historial_max)
+        return jsonify({'success': True, 'vehiculos': vehiculos})
+
+    sello = gestor_datos.obtener_sello_estado_vehiculos(cliente_id)
+    if sello is not None:
+        sello = sello._replace(version=f'{historial_max}.{sello.version}')
+    return _respuesta_condicional(sello, construir)
+
+# Cada cuántos segundos se envía un comentario de "latido" por el canal de eventos. Mantiene
+# viva la conexión a través de proxies y permite detectar (al fallar la escritura) que el
+# cliente se desconectó, para liberar su suscripción.
+LATIDO_EVENTOS = 15
+# Con el límite de conexiones alcanzado, el navegador vuelve a intentar tras este tiempo (ms).
+REINTENTO_EVENTOS_SATURADO = 30000
+
+@cliente_app.route('/api/cliente/eventos')
+def cliente_eventos_api():
+    """
+    Canal Server-Sent Events con los cambios de estado y costos de las reparaciones de los
+    vehículos del cliente. Reemplaza el sondeo periódico de historial y estado_activo:
+    cada evento "reparacion" indica qué vehículo cambió, y "resincronizar" pide recargar todo.
+    Requiere autenticación.
+    """
+    if 'cliente_id' not in session:
+        return jsonify({'success': False, 'message': 'No autenticado.'}), 401
+
+    # Los vehículos se leen una vez al conectar; el stream en sí no usa la base de datos.
+    vehiculo_ids = [v['id'] for v in gestor_datos.obtener_vehiculos_por_cliente(session['cliente_id'])]
+
+    def generar():
+        # La suscripción se abre recién al empezar a enviar: si la respuesta nunca se recorre
+        # (la reemplaza un error, o el cliente se fue antes), no queda ninguna sin cancelar.
+        suscripcion = notificaciones.central.suscribir(vehiculo_ids)
+        if suscripcion is None:
+            # Demasiadas conexiones abiertas: se cierra enseguida y EventSource reintenta después
+            # (al reconectar, el portal recarga el estado).
+            yield f'retry: {REINTENTO_EVENTOS_SATURADO}\n: saturado\n\n'
+            return
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                evento = suscripcion.esperar(LATIDO_EVENTOS)
+                if evento is None:
+                    yield ': latido\n\n'
+                elif evento is notificaciones.RESINCRONIZAR:
+                    yield 'event: resincronizar\ndata: {}\n\n'
+                else:
+                    datos = {
+                        'reparacion_id': evento['reparacion_id'],
+                        'vehiculo_id': evento['vehiculo_id'],
+                        'estado': evento['estado'],
+                    }
+                    yield f"id: {evento['id']}\nevent: reparacion\ndata: {json.dumps(datos)}\n\n"
+        finally:
+            notificaciones.central.cancelar(suscripcion)
 
-    if reparacion_activa:
-        return jsonify({'success': True, 'reparacion': dict(reparacion_activa)})
-    return jsonify({'success': False, 'message': 'No hay reparación activa para este vehículo.'})
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # ==========================================================
 # Punto de Arranque de la Aplicación Flask (Ajustado para Despliegue Web)
 # ==========================================================
 if __name__ == '__main__':
-    # Crea las tablas de la base de datos si no existen.
+    # Aplica las migraciones pendientes del esquema antes de aceptar peticiones.
     # Esto es importante para el primer arranque, especialmente en entornos de despliegue.
-    gestor_datos.crear_tablas()
+    gestor_datos.asegurar_esquema()
 
     # Obtiene el puerto de la variable de entorno 'PORT' (común en plataformas como Render).
     # Si no está definida (ej. desarrollo local), usa el puerto 5001 por defecto para el cliente.
@@ -0,0 +1,156 @@
+"""
+Hash y verificación de contraseñas con bcrypt en un grupo acotado de hilos.
+
+bcrypt es deliberadamente costoso en CPU. Si cada petición lo ejecuta en su propio hilo, una
+ráfaga de inicios de sesión ocupa todos los workers y frena al resto del tráfico. Aquí el
+trabajo se hace en HASH_HILOS hilos dedicados (bcrypt libera el GIL, así que corren en
+paralelo), con una cola de a lo sumo HASH_COLA_MAX tareas. Si la cola está llena, o la tarea
+no termina en HASH_ESPERA_MAX segundos, se lanza ContrasenasSaturadasError y la aplicación
+responde 503 en lugar de acumular peticiones.
+
+El costo se configura con BCRYPT_ROUNDS. Los hashes guardados con otro costo se rehacen en el
+siguiente inicio de sesión correcto (ver necesita_rehash).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeoutError
+
+import bcrypt
+
+import metricas
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+HASH_HILOS = int(os.environ.get('HASH_HILOS', str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_COLA_MAX = int(os.environ.get('HASH_COLA_MAX', '16'))
+HASH_ESPERA_MAX = float(os.environ.get('HASH_ESPERA_MAX', '10'))
+
+
+class ContrasenasSaturadasError(Exception):
+    """El grupo de hash está lleno o demorado: la petición debe rechazarse (503) en lugar de esperar."""
+
+
+class GrupoHash:
+    """
+    Ejecuta funciones de bcrypt en `hilos` hilos, con a lo sumo `cola_max` tareas en espera.
+    Las tareas que no consiguen lugar se rechazan de inmediato.
+    """
+
+    def __init__(self, hilos, cola_max, espera_max):
+        if hilos < 1 or cola_max < 0:
+            raise ValueError(f"Tamaños inválidos: hilos={hilos}, cola_max={cola_max}")
+        self.hilos = hilos
+        self.cola_max = cola_max
+        self.espera_max = espera_max
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='bcrypt')
+        self._cupos = threading.BoundedSemaphore(hilos + cola_max)
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._ejecutadas = 0
+        self._rechazadas = 0
+        self._vencidas = 0
+
+    def _liberar(self, _futuro):
+        with self._lock:
+            self._pendientes -= 1
+        self._cupos.release()
+
+    def ejecutar(self, funcion, *args):
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self._rechazadas += 1
+            raise ContrasenasSaturadasError("Demasiadas operaciones de contraseña en curso.")
+        with self._lock:
+            self._pendientes += 1
+        try:
+            futuro = self._executor.submit(funcion, *args)
+        except RuntimeError:
+            self._liberar(None)
+            raise
+        futuro.add_done_callback(self._liberar)
+        try:
+            resultado = futuro.result(timeout=self.espera_max)
+        except FuturoTimeoutError:
+            # Si todavía estaba en cola no llega a ejecutarse; si ya corría, termina y se descarta.
+            futuro.cancel()
+            with self._lock:
+                self._vencidas += 1
+            raise ContrasenasSaturadasError(f"La operación de contraseña no terminó en {self.espera_max}s.")
+        with self._lock:
+            self._ejecutadas += 1
+        return resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'hilos': self.hilos,
+                'cola_max': self.cola_max,
+                'pendientes': self._pendientes,
+                'ejecutadas': self._ejecutadas,
+                'rechazadas': self._rechazadas,
+                'vencidas': self._vencidas,
+            }
+
+
+_grupo = GrupoHash(HASH_HILOS, HASH_COLA_MAX, HASH_ESPERA_MAX)
+
+duracion_bcrypt = metricas.HistogramaEtiquetado(
+    'taller_bcrypt_duracion_seconds', 'Tiempo de CPU de cada hash o verificación bcrypt (sin la espera en cola).',
+    ('operacion',))
+metricas.Calculada('taller_bcrypt_pendientes', 'Operaciones bcrypt en curso o en cola.', (),
+                   lambda: [((), _grupo.estadisticas()['pendientes'])])
+
+
+def _rechazadas():
+    datos = _grupo.estadisticas()
+    return [((), datos['rechazadas'] + datos['vencidas'])]
+
+
+metricas.Calculada('taller_bcrypt_rechazadas_total', 'Operaciones bcrypt rechazadas por cola llena o demora.', (),
+                   _rechazadas, tipo='counter')
+
+
+def _hashear(password, rounds):
+    inicio = time.perf_counter()
+    try:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    finally:
+        duracion_bcrypt.observar((time.perf_counter() - inicio) * 1000.0, 'hash')
+
+
+def _verificar(password, hash_guardado):
+    inicio = time.perf_counter()
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hash_guardado.encode('utf-8'))
+    except ValueError:
+        # Hash guardado con formato inválido: se trata como contraseña incorrecta.
+        return False
+    finally:
+        duracion_bcrypt.observar((time.perf_counter() - inicio) * 1000.0, 'verificacion')
+
+
+def hashear(password):
+    """Devuelve el hash bcrypt (str) de la contraseña con el costo BCRYPT_ROUNDS."""
+    return _grupo.ejecutar(_hashear, password, BCRYPT_ROUNDS)
+
+
+def verificar(password, hash_guardado):
+    """True si la contraseña coincide con el hash guardado."""
+    return _grupo.ejecutar(_verificar, password, hash_guardado)
+
+
+def costo_de(hash_guardado):
+    """Costo (rounds) con el que se generó un hash bcrypt ($2b$12$...), o None si no se reconoce."""
+    partes = hash_guardado.split('$')
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+def necesita_rehash(hash_guardado):
+    """True si el hash se generó con un costo distinto del configurado."""
+    return costo_de(hash_guardado) != BCRYPT_ROUNDS
+
+
+def estadisticas():
+    return _grupo.estadisticas()
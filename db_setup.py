@@ -1,108 +1,117 @@
 import sqlite3
+import sys
 
-# Define el nombre de tu archivo de base de datos
-DB_NAME = 'taller_mecanico.db'
+import psycopg2
 
-def crear_tablas():
-    conn = None
-    try:
-        # Conectar a la base de datos (o crearla si no existe)
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+import bitacora
+import gestor_datos
+import migraciones
+from migraciones import m0005_fechas_nativas
 
-        # --- Tabla clientes ---
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                apellido TEXT NOT NULL,
-                telefono TEXT,
-                email TEXT,
-                dni TEXT UNIQUE
-            )
-        ''')
+# El esquema se define en un único lugar: el paquete migraciones.
+# Este script sólo aplica las migraciones pendientes sobre la base configurada
+# (DATABASE_URL para PostgreSQL, o DATABASE_FILE / taller_mecanico.db para SQLite).
+#   python db_setup.py                    # aplica las migraciones pendientes
+#   python db_setup.py version            # versión del esquema
+#   python db_setup.py fechas             # fechas antiguas que la migración 5 no reconoce
+#   python db_setup.py fechas --corregir  # pide un valor nuevo para cada una
 
-        # --- Tabla vehiculos ---
-        # Un cliente puede tener muchos vehículos, por eso se enlaza con cliente_id
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS vehiculos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cliente_id INTEGER NOT NULL,
-                marca TEXT NOT NULL,
-                modelo TEXT NOT NULL,
-                anio INTEGER,
-                patente TEXT UNIQUE NOT NULL,
-                kilometraje_inicial INTEGER,
-                FOREIGN KEY (cliente_id) REFERENCES clientes(id)
-            )
-        ''')
+def crear_tablas():
+    # La migración 5 no se aplica si alguna fecha antigua no se reconoce: se revisan antes,
+    # para mostrarlas todas con su valor en lugar de abortar la migración.
+    if revisar_fechas(silencioso=True):
+        print("Corregir esas fechas con 'python db_setup.py fechas --corregir' y volver a ejecutar.")
+        return False
+    return gestor_datos.crear_tablas()
 
-        # --- Tabla mecanicos ---
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS mecanicos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                apellido TEXT NOT NULL,
-                dni TEXT UNIQUE
-            )
-        ''')
+def _version(conn):
+    try:
+        return migraciones.version_actual(conn.cursor())
+    except (sqlite3.Error, psycopg2.Error):
+        conn.rollback()  # Base sin migraciones: todavía no existe schema_version.
+        return 0
 
-        # --- Tabla turnos ---
-        # Un turno tiene un vehículo asociado y un mecánico asignado
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS turnos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                vehiculo_id INTEGER NOT NULL,
-                mecanico_id INTEGER,
-                fecha_hora DATETIME NOT NULL,
-                estimacion_reparacion TEXT,
-                estado TEXT DEFAULT 'Pendiente', -- Ej: 'Pendiente', 'En Taller', 'Finalizado', 'Cancelado'
-                FOREIGN KEY (vehiculo_id) REFERENCES vehiculos(id),
-                FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id)
-            )
-        ''')
+def _pedir_valor(tabla, fila_id, columna, valor):
+    convertir = m0005_fechas_nativas.CONVERTIDORES[tabla][columna]
+    while True:
+        nuevo = input(f"{tabla} {fila_id}, {columna} = {valor!r}. Nuevo valor (Enter para dejarlo): ").strip()
+        if not nuevo:
+            return None
+        try:
+            convertir(nuevo)
+            return nuevo
+        except ValueError:
+            print(f"  No se reconoce {nuevo!r}: usar por ejemplo 2024-03-15 o 15/03/2024 (horas: 09:30).")
 
-        # --- Tabla reparaciones (detalles de cada vez que un auto entró al taller para ser reparado) ---
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reparaciones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                vehiculo_id INTEGER NOT NULL,
-                mecanico_id INTEGER,
-                fecha_ingreso DATETIME NOT NULL,
-                fecha_salida DATETIME,
-                kilometraje_ingreso INTEGER NOT NULL,
-                problema_reportado TEXT,
-                trabajo_realizado TEXT,
-                costo_mano_obra REAL DEFAULT 0.0,
-                costo_total REAL DEFAULT 0.0,
-                estado TEXT DEFAULT 'En Progreso', -- Ej: 'En Progreso', 'Finalizada', 'Pendiente de Pago'
-                FOREIGN KEY (vehiculo_id) REFERENCES vehiculos(id),
-                FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id)
-            )
-        ''')
+def revisar_fechas(corregir=False, silencioso=False):
+    """
+    Lista las fechas y horas guardadas como texto que la migración 5 (fechas nativas) no
+    reconoce; con corregir=True pide un valor nuevo para cada una y lo guarda.
+    Devuelve cuántas quedan sin reconocer (0 si el esquema ya pasó esa migración).
+    """
+    conn = gestor_datos.obtener_conexion()
+    if not conn:
+        print("No se pudo conectar a la base de datos.")
+        return 0
+    try:
+        if _version(conn) >= m0005_fechas_nativas.VERSION:
+            if not silencioso:
+                print("El esquema ya guarda fechas nativas: no hay fechas antiguas que revisar.")
+            return 0
+        try:
+            encontradas = m0005_fechas_nativas.fechas_no_reconocidas(conn.cursor())
+        except (sqlite3.Error, psycopg2.Error):
+            conn.rollback()  # Base vacía: las tablas se crean al migrar.
+            encontradas = []
+        if not encontradas:
+            if not silencioso:
+                print("Todas las fechas se reconocen.")
+            return 0
 
-        # --- Tabla repuestos_usados (para cada repuesto específico dentro de una reparación) ---
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS repuestos_usados (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                reparacion_id INTEGER NOT NULL,
-                nombre_repuesto TEXT NOT NULL,
-                cantidad INTEGER NOT NULL,
-                costo_unitario REAL NOT NULL,
-                costo_total_repuesto REAL AS (cantidad * costo_unitario) STORED, -- Calcula automáticamente el costo
-                FOREIGN KEY (reparacion_id) REFERENCES reparaciones(id)
-            )
-        ''')
+        print(f"Fechas u horas que la migración {m0005_fechas_nativas.VERSION} no reconoce:")
+        for tabla, fila_id, columnas in encontradas:
+            print(f"  {tabla} {fila_id}: " + ', '.join(f"{columna}={valor!r}" for columna, valor in columnas.items()))
+        if not corregir:
+            return sum(len(columnas) for _, _, columnas in encontradas)
 
-        # Confirmar los cambios y guardar en la base de datos
-        conn.commit()
-        print(f"Tablas creadas en {DB_NAME} exitosamente.")
+        p = '%s' if isinstance(conn, psycopg2.extensions.connection) else '?'
+        pendientes = 0
+        for tabla, fila_id, columnas in encontradas:
+            for columna, valor in columnas.items():
+                try:
+                    nuevo = _pedir_valor(tabla, fila_id, columna, valor)
+                except EOFError:
+                    nuevo = None
+                if nuevo is None:
+                    pendientes += 1
+                    continue
+                conn.cursor().execute(f'UPDATE {tabla} SET {columna} = {p} WHERE id = {p}', (nuevo, fila_id))
+                conn.commit()
+        print(f"Quedan {pendientes} sin corregir." if pendientes else "Todas las fechas quedaron corregidas.")
+        return pendientes
+    finally:
+        conn.close()
 
-    except sqlite3.Error as e:
-        print(f"Error al crear tablas: {e}")
+def mostrar_version():
+    conn = gestor_datos.obtener_conexion()
+    if not conn:
+        print("No se pudo conectar a la base de datos.")
+        return
+    try:
+        cursor = conn.cursor()
+        try:
+            actual = migraciones.version_actual(cursor)
+        except Exception:
+            actual = 0
+        print(f"Versión del esquema: {actual} (más reciente disponible: {migraciones.version_mas_reciente()})")
     finally:
-        if conn:
-            conn.close()
+        conn.close()
 
 if __name__ == '__main__':
-    crear_tablas()
\ No newline at end of file
+    bitacora.configurar()
+    if len(sys.argv) > 1 and sys.argv[1] == 'version':
+        mostrar_version()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'fechas':
+        sys.exit(0 if revisar_fechas(corregir='--corregir' in sys.argv[2:]) == 0 else 1)
+    else:
+        sys.exit(0 if crear_tablas() else 1)
@@ -0,0 +1,252 @@
+"""
+Informe de planes de ejecución (EXPLAIN) de las consultas de gestor_datos.
+
+Ejecuta cada función pública de gestor_datos con valores de ejemplo dentro de una unidad
+de trabajo que se deshace al final (la base no se modifica), captura las sentencias SQL
+que emiten y muestra el plan de cada una, marcando los recorridos secuenciales completos.
+
+Uso:
+    python explicar_consultas.py              # informe completo
+    python explicar_consultas.py --solo-scans # sólo las consultas con recorridos completos
+    python explicar_consultas.py --estricto   # termina con código 1 si hay recorridos completos
+"""
+import argparse
+import inspect
+import json
+import re
+import sys
+
+import psycopg2
+
+import gestor_datos
+
+# Funciones públicas que no son consultas de datos.
+FUNCIONES_EXCLUIDAS = {
+    'obtener_conexion', 'crear_tablas', 'asegurar_esquema', 'estadisticas_pool', 'cerrar_pool',
+    'iniciar_unidad_de_trabajo', 'finalizar_unidad_de_trabajo', 'unidad_de_trabajo',
+    'suscribir_cambios_reparaciones',
+}
+
+# EXECUTE es una sentencia preparada de sentencias.py: PostgreSQL explica su plan con EXPLAIN EXECUTE.
+SENTENCIAS_EXPLICABLES = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'EXECUTE')
+# Sentencias internas de FTS5 sobre sus tablas auxiliares ('main'.'clientes_busqueda_config', ...),
+# que el trace de SQLite también informa al mantener los índices de texto desde los triggers.
+_SQL_INTERNO_FTS5 = re.compile(r"'\w+'\.'\w+_(config|data|idx|docsize|content)'")
+# Literales ya aplicados a una sentencia: la misma sentencia repetida con otros valores (p. ej.
+# el resumen diario recalculado día por día) se explica una sola vez por función.
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class _CursorQueRegistra(psycopg2.extensions.cursor):
+    """Cursor de PostgreSQL que anota cada sentencia (con sus parámetros ya aplicados)."""
+    destino = None
+
+    def execute(self, query, vars=None):
+        if _CursorQueRegistra.destino is not None:
+            _CursorQueRegistra.destino(self.mogrify(query, vars).decode('utf-8', 'replace'))
+        return super().execute(query, vars)
+
+
+def _valores_de_ejemplo(conn):
+    """Toma identificadores reales de la base (si los hay) para que las consultas sean representativas."""
+    cursor = conn.cursor()
+
+    def primero(sql, defecto):
+        try:
+            cursor.execute(sql)
+            fila = cursor.fetchone()
+            return fila[0] if fila and fila[0] is not None else defecto
+        except Exception:
+            return defecto
+
+    cliente_id = primero('SELECT MIN(id) FROM clientes', 1)
+    return {
+        'cliente_id': cliente_id,
+        'vehiculo_id': primero('SELECT MIN(id) FROM vehiculos', 1),
+        'mecanico_id': primero('SELECT MIN(id) FROM mecanicos', 1),
+        'turno_id': primero('SELECT MIN(id) FROM turnos', 1),
+        'reparacion_id': primero('SELECT MIN(id) FROM reparaciones', 1),
+        'username': primero('SELECT MIN(username) FROM usuarios_clientes', 'usuario'),
+        'password': 'explain',
+        'nombre': primero('SELECT MIN(nombre) FROM clientes', 'Nombre'),
+        'apellido': primero('SELECT MIN(apellido) FROM clientes', 'Apellido'),
+        'telefono': '000',
+        'email': 'explain@taller.local',
+        'dni': 'explain-dni',
+        'patente': 'EXPLAIN1',
+        'marca': 'Marca',
+        'modelo': 'Modelo',
+        'anio': 2020,
+        'kilometraje_inicial': 0,
+        'kilometraje_ingreso': 0,
+        'fecha': '2025-01-01',
+        'hora': '09:00',
+        'fecha_ingreso': '2025-01-01',
+        'desde': '2025-01-06',
+        'hasta': '2025-01-13',
+        'problema_reportado': 'explain',
+        'estado': 'En Progreso',
+        'texto': 'AB',
+        'ultimo_id': 0,
+    }
+
+
+def _funciones_de_datos():
+    for nombre, funcion in inspect.getmembers(gestor_datos, inspect.isfunction):
+        if nombre.startswith('_') or nombre in FUNCIONES_EXCLUIDAS:
+            continue
+        if funcion.__module__ != gestor_datos.__name__:
+            continue
+        yield nombre, funcion
+
+
+def _argumentos(funcion, valores):
+    """Arma los argumentos obligatorios desde los valores de ejemplo; None si falta alguno."""
+    argumentos = {}
+    for parametro in inspect.signature(funcion).parameters.values():
+        if parametro.default is not inspect.Parameter.empty:
+            continue
+        if parametro.name not in valores:
+            return None
+        argumentos[parametro.name] = valores[parametro.name]
+    return argumentos
+
+
+def _explicar_sqlite(cursor, sql):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    lineas, scans = [], []
+    filas = cursor.fetchall()
+    # Subconsultas ya evaluadas (CO-ROUTINE / MATERIALIZE): recorrerlas no lee ninguna tabla.
+    intermedias = {fila[3].split(' ', 1)[1] for fila in filas
+                   if fila[3].startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    for fila in filas:
+        detalle = fila[3]
+        lineas.append(detalle)
+        # "SCAN t" es un recorrido completo de la tabla; "SCAN t USING INDEX" recorre un índice, y
+        # "SCAN t VIRTUAL TABLE INDEX n:M..." es una consulta MATCH resuelta por el índice de FTS5.
+        if (detalle.startswith('SCAN ') and 'USING' not in detalle and 'CONSTANT ROW' not in detalle
+                and 'VIRTUAL TABLE INDEX' not in detalle):
+            origen = detalle[len('SCAN '):]
+            if origen in intermedias or origen.startswith('(subquery-'):
+                continue
+            scans.append(detalle)
+    return lineas, scans
+
+
+def _explicar_postgresql(cursor, sql):
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lineas, scans = [], []
+
+    def recorrer(nodo, nivel):
+        descripcion = nodo['Node Type']
+        if 'Relation Name' in nodo:
+            descripcion += f" en {nodo['Relation Name']}"
+        if 'Index Name' in nodo:
+            descripcion += f" usando {nodo['Index Name']}"
+        lineas.append('  ' * nivel + descripcion)
+        if nodo['Node Type'] == 'Seq Scan':
+            scans.append(descripcion)
+        for hijo in nodo.get('Plans', []):
+            recorrer(hijo, nivel + 1)
+
+    recorrer(plan[0]['Plan'], 0)
+    return lineas, scans
+
+
+def generar_informe():
+    """Devuelve una lista de (funcion, sql, lineas_del_plan, recorridos_completos)."""
+    capturadas = []  # (funcion, sql)
+    funcion_actual = [None]
+
+    def registrar(sql):
+        texto = sql.strip()
+        if texto.split(None, 1)[0].upper() in SENTENCIAS_EXPLICABLES and not _SQL_INTERNO_FTS5.search(texto):
+            capturadas.append((funcion_actual[0], texto))
+
+    gestor_datos.asegurar_esquema()
+    gestor_datos.iniciar_unidad_de_trabajo()
+    try:
+        conn = gestor_datos.obtener_conexion()
+        if conn is None:
+            raise RuntimeError("No se pudo conectar a la base de datos.")
+        conn.close()  # La conexión sigue perteneciendo a la unidad de trabajo.
+        es_postgresql = isinstance(conn, psycopg2.extensions.connection)
+        valores = _valores_de_ejemplo(conn)
+
+        if es_postgresql:
+            fabrica_anterior = conn.cursor_factory
+            conn.cursor_factory = _CursorQueRegistra
+            _CursorQueRegistra.destino = registrar
+        else:
+            conn.set_trace_callback(registrar)
+        try:
+            for nombre, funcion in _funciones_de_datos():
+                argumentos = _argumentos(funcion, valores)
+                if argumentos is None:
+                    print(f"(omitida {nombre}: parámetros sin valor de ejemplo)", file=sys.stderr)
+                    continue
+                funcion_actual[0] = nombre
+                resultado = funcion(**argumentos)
+                if inspect.isgenerator(resultado):
+                    for _ in resultado:  # Los iteradores sólo consultan al recorrerlos.
+                        pass
+        finally:
+            if es_postgresql:
+                conn.cursor_factory = fabrica_anterior
+                _CursorQueRegistra.destino = None
+            else:
+                conn.set_trace_callback(None)
+
+        informe, vistas = [], set()
+        cursor = conn.cursor()
+        for nombre, sql in capturadas:
+            forma = _LITERALES.sub('?', sql)
+            if (nombre, forma) in vistas:
+                continue
+            vistas.add((nombre, forma))
+            try:
+                if es_postgresql:
+                    lineas, scans = _explicar_postgresql(cursor, sql)
+                else:
+                    lineas, scans = _explicar_sqlite(cursor, sql)
+            except Exception as e:
+                lineas, scans = [f"(no se pudo explicar: {e})"], []
+                if es_postgresql:
+                    conn.rollback_fisico()
+            informe.append((nombre, sql, lineas, scans))
+        return informe
+    finally:
+        # Nada de lo ejecutado se confirma.
+        gestor_datos.finalizar_unidad_de_trabajo(exito=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solo-scans', action='store_true', help='mostrar sólo consultas con recorridos completos')
+    parser.add_argument('--estricto', action='store_true', help='salir con código 1 si hay recorridos completos')
+    args = parser.parse_args(argv)
+
+    informe = generar_informe()
+    con_scans = 0
+    for nombre, sql, lineas, scans in informe:
+        if scans:
+            con_scans += 1
+        elif args.solo_scans:
+            continue
+        print(f"== {nombre}")
+        print('   ' + ' '.join(sql.split())[:300])
+        for linea in lineas:
+            print(f"     {linea}")
+        for scan in scans:
+            print(f"   !! Recorrido completo: {scan}")
+        print()
+
+    print(f"{len(informe)} consultas analizadas, {con_scans} con recorridos completos.")
+    return 1 if (args.estricto and con_scans) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
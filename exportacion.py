@@ -0,0 +1,158 @@
+"""
+Exportación de los datos del taller (clientes, vehiculos, turnos, reparaciones) para copias de
+seguridad y contabilidad.
+
+Cada tabla se lee con gestor_datos.transmitir_exportacion (cursor del lado del servidor, de a un
+lote) y se escribe en partes de unos json_por_partes.TAMANO_PARTE caracteres, opcionalmente
+comprimidas con gzip a medida que salen: la memoria no depende del tamaño de la tabla.
+
+Formatos:
+  csv       encabezado y una fila por registro
+  jsonl     un objeto JSON por línea
+  columnas  columnar por grupos de filas, al estilo de Parquet: la primera línea describe la
+            tabla y cada línea siguiente es un grupo {"filas": n, "columnas": {columna: [valores]}}
+            de hasta FILAS_POR_GRUPO registros (JSON; no necesita dependencias).
+Fechas como 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS' e importes como números, igual en ambos motores.
+
+Uso:
+    python exportacion.py                                   # las cuatro tablas en CSV, en el directorio actual
+    python exportacion.py reparaciones --desde 2024-01-01 --hasta 2025-01-01 --formato jsonl --gzip
+    python exportacion.py clientes vehiculos --formato columnas --salida /copias/2025-06-30
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import bitacora
+import gestor_datos
+import json_por_partes
+
+FILAS_POR_GRUPO = int(os.environ.get('EXPORTACION_FILAS_POR_GRUPO', 10_000))
+
+TABLAS = tuple(gestor_datos.COLUMNAS_EXPORTABLES)
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    'csv': ('csv', 'text/csv'),
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+    'columnas': ('columnas.jsonl', 'application/x-ndjson'),
+}
+
+
+def _valor(valor):
+    """Mismo texto para fechas e importes en SQLite (texto, float) y PostgreSQL (date, Decimal)."""
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def _csv(tabla, columnas, filas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow([_valor(fila[columna]) for columna in columnas])
+        if buffer.tell() >= json_por_partes.TAMANO_PARTE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _jsonl(tabla, columnas, filas):
+    partes, largo = [], 0
+    for fila in filas:
+        texto = json.dumps({columna: _valor(fila[columna]) for columna in columnas}, ensure_ascii=False) + '\n'
+        partes.append(texto)
+        largo += len(texto)
+        if largo >= json_por_partes.TAMANO_PARTE:
+            yield ''.join(partes)
+            partes, largo = [], 0
+    yield ''.join(partes)
+
+
+def _columnas(tabla, columnas, filas):
+    yield json.dumps({'tabla': tabla, 'columnas': list(columnas), 'filas_por_grupo': FILAS_POR_GRUPO}) + '\n'
+    grupo, cantidad = {columna: [] for columna in columnas}, 0
+    for fila in filas:
+        for columna in columnas:
+            grupo[columna].append(_valor(fila[columna]))
+        cantidad += 1
+        if cantidad == FILAS_POR_GRUPO:
+            yield json.dumps({'filas': cantidad, 'columnas': grupo}, ensure_ascii=False) + '\n'
+            grupo, cantidad = {columna: [] for columna in columnas}, 0
+    if cantidad:
+        yield json.dumps({'filas': cantidad, 'columnas': grupo}, ensure_ascii=False) + '\n'
+
+
+_ESCRITORES = {'csv': _csv, 'jsonl': _jsonl, 'columnas': _columnas}
+
+
+def nombre_de_archivo(tabla, formato, comprimir=False):
+    return f"{tabla}.{FORMATOS[formato][0]}{'.gz' if comprimir else ''}"
+
+
+def exportar(tabla, formato='csv', desde=None, hasta=None, comprimir=False):
+    """
+    Genera el contenido exportado de `tabla` como partes de bytes (UTF-8, o gzip si `comprimir`).
+    desde / hasta limitan turnos y reparaciones por fecha (ver gestor_datos.transmitir_exportacion);
+    ValueError si la tabla, el formato o una fecha no son válidos.
+    """
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato desconocido: {formato}")
+    columnas = gestor_datos.COLUMNAS_EXPORTABLES.get(tabla)
+    # Se valida aquí y no al empezar a leer: un error a mitad de la respuesta ya no se puede informar.
+    filas = gestor_datos.transmitir_exportacion(tabla, desde, hasta)
+    partes = _ESCRITORES[formato](tabla, columnas, filas)
+    return _comprimidas(partes) if comprimir else (parte.encode('utf-8') for parte in partes if parte)
+
+
+def _comprimidas(partes):
+    # wbits=31: formato gzip (cabecera y CRC), que se puede abrir con gunzip o gzip.open.
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for parte in partes:
+        comprimido = compresor.compress(parte.encode('utf-8'))
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('tablas', nargs='*', metavar='tabla',
+                        help=f"tablas a exportar ({', '.join(TABLAS)}; por defecto, todas)")
+    parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+    parser.add_argument('--desde', type=date.fromisoformat, help="fecha inicial (YYYY-MM-DD) de turnos y reparaciones")
+    parser.add_argument('--hasta', type=date.fromisoformat, help="fecha final, excluida")
+    parser.add_argument('--gzip', action='store_true', help="comprimir cada archivo con gzip")
+    parser.add_argument('--salida', default='.', help="directorio donde escribir los archivos")
+    args = parser.parse_args(argv)
+    desconocidas = set(args.tablas) - set(TABLAS)
+    if desconocidas:
+        parser.error(f"tablas desconocidas: {', '.join(sorted(desconocidas))}")
+
+    if not gestor_datos.asegurar_esquema():
+        print("No se pudo preparar la base de datos.", file=sys.stderr)
+        return 2
+    os.makedirs(args.salida, exist_ok=True)
+    for tabla in args.tablas or TABLAS:
+        ruta = os.path.join(args.salida, nombre_de_archivo(tabla, args.formato, args.gzip))
+        with open(ruta, 'wb') as archivo:
+            for parte in exportar(tabla, args.formato, args.desde, args.hasta, args.gzip):
+                archivo.write(parte)
+        print(f"{tabla}: {ruta} ({os.path.getsize(ruta)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    bitacora.configurar()
+    sys.exit(main())
@@ -1,175 +1,457 @@
 import sqlite3
-import bcrypt
 import os
+import threading
+import logging
+import base64
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import date, datetime, timezone
+from contextlib import contextmanager
 
 from flask import app # Asegúrate de que esto no cause un error si 'app' no está disponible globalmente
 import psycopg2
 from psycopg2 import Error as Psycopg2Error
 
+import mapeo_filas
+import migraciones
+import pool_conexiones
+import sentencias
+import unidad_trabajo
+import contrasenas
+import bitacora
+import cache_referencia
+import agenda
+import metricas
+
+log = logging.getLogger(__name__)
+
 DATABASE_URL = os.environ.get('DATABASE_URL')
-DATABASE_FILE = 'taller_mecanico.db'
+DATABASE_FILE = os.environ.get('DATABASE_FILE', 'taller_mecanico.db')
+
+# Tamaño y comportamiento del pool de conexiones (sólo PostgreSQL; SQLite reutiliza una conexión por hilo)
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_VERIFICAR_TRAS = float(os.environ.get('DB_POOL_VERIFICAR_TRAS', 30))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _obtener_pool():
+    """Crea el pool la primera vez que se necesita (PostgreSQL o SQLite según DATABASE_URL)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DATABASE_URL:
+                    _pool = pool_conexiones.PoolPostgreSQL(
+                        DATABASE_URL,
+                        minimo=DB_POOL_MIN,
+                        maximo=DB_POOL_MAX,
+                        timeout=DB_POOL_TIMEOUT,
+                        verificar_tras=DB_POOL_VERIFICAR_TRAS,
+                    )
+                else:
+                    _pool = pool_conexiones.PoolSQLitePorHilo(DATABASE_FILE)
+    return _pool
 
-def obtener_conexion():
-    """Establece y devuelve una conexión a la base de datos (PostgreSQL o SQLite)."""
+def _obtener_conexion_del_pool():
     conn = None
-    if DATABASE_URL:
-        try:
-            conn = psycopg2.connect(DATABASE_URL)
-            print("DEBUG DB: Conectado a PostgreSQL.")
-        except Psycopg2Error as e:
-            print(f"Error al conectar a PostgreSQL: {e}")
-            conn = None
-    else:
-        try:
-            conn = sqlite3.connect(DATABASE_FILE)
-            conn.row_factory = sqlite3.Row # Esto ya debería permitir acceso por nombre
-            print("DEBUG DB: Conectado a SQLite.")
-        except sqlite3.Error as e:
-            print(f"Error al conectar a SQLite: {e}")
-            conn = None
+    try:
+        conn = _obtener_pool().obtener()
+    except pool_conexiones.PoolAgotadoError as e:
+        log.error("Error al obtener conexión del pool: %s", e)
+    except Psycopg2Error as e:
+        log.error("Error al conectar a PostgreSQL: %s", e)
+    except sqlite3.Error as e:
+        log.error("Error al conectar a SQLite: %s", e)
     return conn
 
-def crear_tablas():
+def obtener_conexion():
+    """
+    Devuelve una conexión del pool (PostgreSQL o SQLite).
+    Llamar a close() sobre ella la devuelve al pool en lugar de cerrarla.
+    Si hay una unidad de trabajo activa (una por petición), devuelve siempre su conexión.
+    """
+    unidad = unidad_trabajo.activa()
+    bitacora.debug_muestreado(log, "Conexión pedida (unidad de trabajo activa: %s)", unidad is not None)
+    if unidad is not None:
+        return unidad.entrar()
+    return _obtener_conexion_del_pool()
+
+def iniciar_unidad_de_trabajo(escritura=False):
     """
-    Crea las tablas necesarias en la base de datos si no existen.
-    Adapta la sintaxis SQL para PostgreSQL o SQLite según la conexión activa.
+    Abre una unidad de trabajo en el hilo actual: desde aquí todas las funciones de este
+    módulo comparten una conexión y una transacción hasta finalizar_unidad_de_trabajo().
+    Con escritura=True, en SQLite la transacción toma el bloqueo de escritura desde el
+    principio (ver unidad_trabajo.UnidadDeTrabajo): usarlo si la unidad puede escribir.
     """
+    return unidad_trabajo.iniciar(_obtener_conexion_del_pool, escritura)
+
+def finalizar_unidad_de_trabajo(exito=True):
+    """Confirma (exito=True) o deshace la unidad de trabajo activa. Devuelve True si se confirmó."""
+    return unidad_trabajo.finalizar(exito)
+
+@contextmanager
+def unidad_de_trabajo(escritura=False):
+    """Versión como context manager, para scripts: confirma al salir o deshace si hubo una excepción."""
+    iniciar_unidad_de_trabajo(escritura)
+    try:
+        yield
+    except BaseException:
+        finalizar_unidad_de_trabajo(exito=False)
+        raise
+    else:
+        finalizar_unidad_de_trabajo(exito=True)
+
+def estadisticas_pool():
+    """Devuelve las estadísticas del pool: conexiones en uso, inactivas y tiempos de espera."""
+    return _obtener_pool().estadisticas()
+
+def _estadistica_pool(clave):
+    def leer():
+        return [((), _pool.estadisticas()[clave])] if _pool is not None else []
+    return leer
+
+metricas.Calculada('taller_db_conexiones_abiertas', 'Conexiones físicas abiertas por el pool.', (), _estadistica_pool('total'))
+metricas.Calculada('taller_db_conexiones_en_uso', 'Conexiones del pool entregadas en este momento.', (), _estadistica_pool('en_uso'))
+metricas.Calculada('taller_db_conexiones_obtenidas_total', 'Conexiones entregadas por el pool.', (), _estadistica_pool('obtenciones'), tipo='counter')
+metricas.Calculada('taller_db_esperas_total', 'Entregas que tuvieron que esperar una conexión libre.', (), _estadistica_pool('esperas'), tipo='counter')
+metricas.Calculada('taller_db_pool_agotado_total', 'Pedidos que agotaron la espera sin obtener conexión.', (), _estadistica_pool('agotamientos'), tipo='counter')
+
+def cerrar_pool():
+    """Cierra las conexiones del pool (útil al apagar la aplicación o en scripts)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
+
+# --- Notificaciones de cambios en reparaciones ---
+# Las funciones que cambian el estado o los costos de una reparación escriben una fila en
+# eventos_reparaciones dentro de su misma transacción (y en PostgreSQL, un NOTIFY que se
+# entrega al confirmar). Los oyentes registrados aquí se llaman tras el commit real; los
+# de otros procesos leen la tabla (ver notificaciones.py).
+CANAL_EVENTOS_REPARACIONES = 'eventos_reparaciones'
+_oyentes_reparaciones = []
+
+def suscribir_cambios_reparaciones(funcion):
+    """Registra una función (sin argumentos) a llamar cada vez que se confirma un cambio en una reparación."""
+    _oyentes_reparaciones.append(funcion)
+
+def _tras_confirmar(funcion):
+    unidad = unidad_trabajo.activa()
+    if unidad is not None:
+        unidad.al_confirmar(funcion)
+    else:
+        funcion()
+
+# --- Caché de datos de referencia ---
+# Las listas completas de clientes y mecánicos (para los formularios) se leen a través de
+# cache_referencia. Cada escritura sobre esas tablas la invalida al confirmarse; mientras
+# tanto, la propia unidad de trabajo lee de la base para ver sus cambios sin guardarlos en la caché.
+def _invalidar_referencia(tabla):
+    unidad = unidad_trabajo.activa()
+    if unidad is not None:
+        unidad.tablas_escritas.add(tabla)
+    _tras_confirmar(lambda: cache_referencia.central.invalidar(tabla))
+
+def _leer_referencia(tabla, cargar):
+    unidad = unidad_trabajo.activa()
+    if unidad is not None and tabla in unidad.tablas_escritas:
+        valor = cargar()
+    else:
+        valor = cache_referencia.central.obtener(tabla, 'todos', cargar)
+    return valor if valor is not None else []
+
+_SQL_INSERTAR_EVENTO = sentencias.registrar('insertar_evento_reparacion',
+    'INSERT INTO eventos_reparaciones (reparacion_id, vehiculo_id, estado) VALUES ({p}, {p}, {p})')
+_SQL_NOTIFICAR_EVENTO = f'NOTIFY {CANAL_EVENTOS_REPARACIONES}'
+
+def _registrar_evento_reparacion(conn, cursor, reparacion_id, vehiculo_id, estado):
+    """Anota el cambio en la bandeja de salida. Se confirma (o deshace) junto con el cambio."""
+    _SQL_INSERTAR_EVENTO.ejecutar(cursor, (reparacion_id, vehiculo_id, estado))
+    if isinstance(conn, psycopg2.extensions.connection):
+        cursor.execute(_SQL_NOTIFICAR_EVENTO)
+
+def _notificar_cambio_reparacion():
+    """Se llama después del commit de la función; dentro de una unidad de trabajo, al confirmarse la unidad."""
+    for oyente in _oyentes_reparaciones:
+        _tras_confirmar(oyente)
+
+_SQL_ULTIMO_EVENTO = sentencias.registrar('ultimo_evento_reparaciones', 'SELECT MAX(id) FROM eventos_reparaciones')
+
+def obtener_ultimo_evento_reparaciones():
+    """Devuelve el id del último evento registrado (0 si no hay)."""
     conn = obtener_conexion()
+    ultimo = 0
     if conn:
         try:
             cursor = conn.cursor()
-            is_postgresql = isinstance(conn, psycopg2.extensions.connection)
+            _SQL_ULTIMO_EVENTO.ejecutar(cursor)
+            fila = cursor.fetchone()
+            ultimo = fila[0] if fila and fila[0] is not None else 0
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener el último evento de reparaciones: %s", e)
+        finally:
+            if conn: conn.close()
+    return ultimo
+
+_SQL_EVENTOS_DESDE = sentencias.registrar('eventos_reparaciones_desde', '''
+    SELECT id, reparacion_id, vehiculo_id, estado
+    FROM eventos_reparaciones
+    WHERE id > {p}
+    ORDER BY id
+    LIMIT {p}
+''', preparar=True)
+
+def obtener_eventos_reparaciones_desde(ultimo_id, limite=500):
+    """Eventos con id mayor a ultimo_id, en orden. Recorre sólo la clave primaria."""
+    conn = obtener_conexion()
+    eventos = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_EVENTOS_DESDE.ejecutar(cursor, (ultimo_id, limite))
+            eventos = mapeo_filas.todos(cursor)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener eventos de reparaciones: %s", e)
+        finally:
+            if conn: conn.close()
+    return eventos
 
-            # Define el tipo de ID auto-incremental según la base de datos
-            if is_postgresql:
-                id_type_sql = 'SERIAL PRIMARY KEY' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-            else:
-                id_type_sql = 'INTEGER PRIMARY KEY AUTOINCREMENT' # Para SQLite
-
-            # Tabla Clientes
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS clientes (
-                    id {id_type_sql},
-                    nombre VARCHAR(255) NOT NULL,
-                    apellido VARCHAR(255) NOT NULL,
-                    telefono VARCHAR(50),
-                    email VARCHAR(255),
-                    dni VARCHAR(50) UNIQUE
-                )
-            ''')
-
-            # Tabla Usuarios_Clientes
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS usuarios_clientes (
-                    id {id_type_sql},
-                    cliente_id INT UNIQUE NOT NULL,
-                    username VARCHAR(255) UNIQUE NOT NULL,
-                    password VARCHAR(255) NOT NULL,
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
-                )
-            ''')
-
-            # Tabla Mecanicos
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS mecanicos (
-                    id {id_type_sql},
-                    nombre VARCHAR(255) NOT NULL,
-                    apellido VARCHAR(255) NOT NULL,
-                    telefono VARCHAR(50),
-                    email VARCHAR(255)
-                )
-            ''')
-
-            # Tabla Usuarios_Mecanicos
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS usuarios_mecanicos (
-                    id {id_type_sql},
-                    mecanico_id INT UNIQUE NOT NULL,
-                    username VARCHAR(255) UNIQUE NOT NULL,
-                    password VARCHAR(255) NOT NULL,
-                    FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id) ON DELETE CASCADE
-                )
-            ''')
-
-            # Tabla Vehiculos
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS vehiculos (
-                    id {id_type_sql},
-                    cliente_id INT NOT NULL,
-                    patente VARCHAR(50) UNIQUE NOT NULL,
-                    marca VARCHAR(255) NOT NULL,
-                    modelo VARCHAR(255) NOT NULL,
-                    anio INT,
-                    kilometraje_inicial INT,
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
-                )
-            ''')
-
-            # Tabla Turnos
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS turnos (
-                    id {id_type_sql},
-                    cliente_id INT NOT NULL,
-                    vehiculo_id INT NOT NULL,
-                    mecanico_id INT,
-                    fecha VARCHAR(50) NOT NULL,
-                    hora VARCHAR(50) NOT NULL,
-                    problema_reportado TEXT NOT NULL,
-                    estado VARCHAR(50) NOT NULL DEFAULT 'Agendado',
-                    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE,
-                    FOREIGN KEY (vehiculo_id) REFERENCES vehiculos(id) ON DELETE CASCADE,
-                    FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id) ON DELETE SET NULL
-                )
-            ''')
-
-            # Tabla Reparaciones
-            cursor.execute(f'''
-                CREATE TABLE IF NOT EXISTS reparaciones (
-                    id {id_type_sql},
-                    vehiculo_id INT NOT NULL,
-                    mecanico_id INT,
-                    fecha_ingreso VARCHAR(50) NOT NULL,
-                    fecha_salida VARCHAR(50),
-                    kilometraje_ingreso INT NOT NULL,
-                    kilometraje_salida INT,
-                    problema_reportado TEXT,
-                    trabajos_realizados TEXT,
-                    repuestos_usados TEXT,
-                    costo_mano_obra DECIMAL(10, 2),
-                    costo_total DECIMAL(10, 2),
-                    estado VARCHAR(50) NOT NULL DEFAULT 'En Progreso',
-                    turno_origen_id INT UNIQUE,
-                    FOREIGN KEY (vehiculo_id) REFERENCES vehiculos(id) ON DELETE CASCADE,
-                    FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id) ON DELETE SET NULL,
-                    FOREIGN KEY (turno_origen_id) REFERENCES turnos(id) ON DELETE SET NULL
-                )
-            ''')
+# El límite se calcula en la base, con el mismo reloj que el DEFAULT de creado_en.
+_SQL_PURGAR_EVENTOS = sentencias.registrar(
+    'purgar_eventos_reparaciones',
+    sqlite="DELETE FROM eventos_reparaciones WHERE creado_en < datetime('now', '-' || {p} || ' hours')",
+    postgresql="DELETE FROM eventos_reparaciones WHERE creado_en < LOCALTIMESTAMP - {p} * INTERVAL '1 hour'")
 
+def purgar_eventos_reparaciones(horas=24):
+    """Elimina los eventos con más de `horas` de antigüedad. Devuelve la cantidad eliminada."""
+    conn = obtener_conexion()
+    eliminados = 0
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_PURGAR_EVENTOS.ejecutar(cursor, (horas,))
+            eliminados = cursor.rowcount
             conn.commit()
-            print("Base de datos inicializada o verificada correctamente.")
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al crear tablas: {e}")
+            log.error("Error al purgar eventos de reparaciones: %s", e)
+            conn.rollback()
+        finally:
+            if conn: conn.close()
+    return eliminados
+
+def crear_tablas():
+    """
+    Aplica las migraciones de esquema pendientes (ver el paquete migraciones).
+    Se conserva el nombre por compatibilidad; devuelve True si el esquema quedó al día.
+    Usa su propia conexión: las migraciones nunca forman parte de una unidad de trabajo.
+    """
+    global _migracion_fallida
+    conn = _obtener_conexion_del_pool()
+    if conn:
+        try:
+            aplicadas = migraciones.aplicar_pendientes(conn)
+            if aplicadas:
+                log.info("Migraciones aplicadas: %s", aplicadas)
+            log.info("Base de datos inicializada o verificada correctamente.")
+            return True
+        except migraciones.MigracionFallida as e:
+            # Ya se deshizo; suele deberse a los datos (p. ej. fechas que m0005 no reconoce, ver
+            # "python db_setup.py fechas") o a un SQLite sin FTS5: reintentar no cambiaría nada.
+            log.error("No se pudo aplicar la migración %s; el esquema quedó sin cambios: %s", e.version, e.causa)
+            _migracion_fallida = e
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al crear tablas: %s", e)
         finally:
             if conn:
                 conn.close()
+    return False
+
+_esquema_verificado = False
+_migracion_fallida = None
+_esquema_lock = threading.Lock()
+
+def asegurar_esquema():
+    """
+    Verifica el esquema una sola vez por proceso.
+    Tras la primera verificación exitosa sólo consulta un flag, sin tocar la base de datos,
+    por lo que puede llamarse en cada petición sin costo. Si falló una migración no se
+    reintenta hasta reiniciar el proceso (hay que corregir la causa); si la base no estaba
+    disponible, sí se reintenta en la próxima llamada.
+    """
+    global _esquema_verificado
+    if _esquema_verificado:
+        return True
+    if _migracion_fallida:
+        return False
+    with _esquema_lock:
+        if not _esquema_verificado and not _migracion_fallida:
+            _esquema_verificado = crear_tablas()
+    return _esquema_verificado
+
+# --- Lectura por lotes ---
+# Los iteradores de este módulo (iterar_*, transmitir_*) leen de a un lote por vez: en
+# PostgreSQL desde un cursor del lado del servidor (cursor con nombre, DECLARE/FETCH) y en
+# SQLite con fetchmany, que ya avanza la consulta a medida que se lee. La memoria queda acotada
+# por el lote y no por el tamaño del resultado.
+LOTE_TRANSMISION = int(os.environ.get('DB_LOTE_TRANSMISION', 200))
+
+def _cursor_por_lotes(conn, nombre):
+    if isinstance(conn, psycopg2.extensions.connection):
+        return conn.cursor(name=f'lotes_{nombre}')
+    return conn.cursor()
+
+def _transmitir(sentencia, parametros, descripcion):
+    """
+    Entrega las filas de `sentencia` como diccionarios, de a LOTE_TRANSMISION por lectura.
+
+    Usa su propia conexión del pool y no la de la unidad de trabajo: está pensado para el cuerpo
+    de una respuesta, que se genera después de que la petición finalizó su unidad. Por lo mismo,
+    a diferencia de las demás funciones, un error se registra y se propaga: la respuesta ya
+    empezó a enviarse y cortarla es la única forma de que no se tome una lista truncada por completa.
+    """
+    conn = _obtener_pool().obtener()
+    cursor = None
+    try:
+        cursor = _cursor_por_lotes(conn, sentencia.nombre)
+        sentencia.ejecutar(cursor, parametros)
+        yield from mapeo_filas.iterar(cursor, lote=LOTE_TRANSMISION)
+    except (sqlite3.Error, Psycopg2Error) as e:
+        log.error("Error al transmitir %s: %s", descripcion, e)
+        raise
+    finally:
+        # En SQLite (WAL) una lectura sin cerrar retiene su instantánea de la base.
+        if cursor is not None:
+            try:
+                cursor.close()
+            except (sqlite3.Error, Psycopg2Error):
+                pass
+        conn.close()
+
+# --- Sentencias SQL ---
+# Cada sentencia se registra en sentencias.py junto a la función que la usa y se arma una sola
+# vez por dialecto al importar el módulo ({p} es el marcador de parámetro). Las marcadas con
+# preparar=True son las búsquedas más frecuentes: en PostgreSQL se ejecutan preparadas.
+
+# --- Versiones de fila ---
+# clientes, mecanicos, vehiculos y reparaciones llevan version y actualizado_en (UTC), que
+# cada escritura de este módulo mantiene con el fragmento {sello} de las sentencias.
+# Alimentan los sellos de obtener_sello_cliente / obtener_sello_vehiculo, con los que
+# cliente_app responde 304 sin armar la respuesta.
+
+# --- Paginación por clave (keyset) ---
+# Cada página se pide a partir de la clave de orden de la última (o primera) fila vista,
+# con una comparación de tuplas que el índice de orden resuelve sin leer las filas previas:
+# el costo por página no crece con el número de página, a diferencia de OFFSET.
+PAGINA_POR_DEFECTO = 50
+PAGINA_MAXIMA = 200
+
+# registros: filas de la página; siguiente / anterior: tokens opacos, o None si no hay más.
+Pagina = namedtuple('Pagina', ['registros', 'siguiente', 'anterior', 'limite'])
+
+def _normalizar_limite(limite):
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        return PAGINA_POR_DEFECTO
+    return max(1, min(limite, PAGINA_MAXIMA))
+
+def _codificar_cursor(valores):
+    crudo = json.dumps(list(valores), separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
 
-# --- Funciones auxiliares (adaptadas para PostgreSQL) ---
-def _map_row_to_dict(cursor, row):
-    """Mapea una fila de resultados a un diccionario."""
-    if not row:
+def _decodificar_cursor(token, cantidad):
+    """Devuelve la lista de valores del token, o None si el token no es válido."""
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno).decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != cantidad:
         return None
-    # Asegúrate de que el row_factory esté configurado para devolver diccionarios o mapea manualmente
-    # Para psycopg2, si no se usa DictCursor, devuelve tuplas.
-    # Para sqlite3, si se usa row_factory = sqlite3.Row, devuelve objetos Row accesibles como diccionarios.
-    # Esta lógica es genérica para ambos si cursor.description es consistente.
-    columns = [desc[0] for desc in cursor.description]
-    return {col_name: row[i] for i, col_name in enumerate(columns)}
-
-def _get_param_placeholder(conn):
-    """Auxiliar para obtener el marcador de posición correcto para la base de datos."""
-    # PostgreSQL y Psycopg2 usan %s
-    # SQLite usa ?
-    return '%s' if isinstance(conn, psycopg2.extensions.connection) else '?'
+    return valores
+
+# Texto de cada forma de página ya armado: (dialecto, consulta, orden, filtro, con_token, hacia_mayores) -> SQL.
+# Sólo hay cuatro formas por listado (primera página o con token, en cada dirección).
+_formas_pagina = {}
+
+def _sql_pagina(conn, consulta_base, columnas_orden, filtro, con_token, hacia_mayores):
+    clave = (sentencias.dialecto(conn), consulta_base, columnas_orden, filtro, con_token, hacia_mayores)
+    sql = _formas_pagina.get(clave)
+    if sql is None:
+        condiciones = [filtro] if filtro else []
+        if con_token:
+            comparador = '>' if hacia_mayores else '<'
+            marcas = ', '.join(['{p}'] * len(columnas_orden))
+            condiciones.append(f"({', '.join(columnas_orden)}) {comparador} ({marcas})")
+        direccion = 'ASC' if hacia_mayores else 'DESC'
+        plantilla = consulta_base
+        if condiciones:
+            plantilla += ' WHERE ' + ' AND '.join(condiciones)
+        plantilla += ' ORDER BY ' + ', '.join(f'{columna} {direccion}' for columna in columnas_orden)
+        plantilla += ' LIMIT {p}'
+        sql = _formas_pagina[clave] = sentencias.texto_dinamico(conn, plantilla)
+    return sql
+
+def _pagina_keyset(consulta_base, columnas_orden, claves, descendente=False, filtro=None,
+                   limite=None, despues=None, antes=None, contexto="registros"):
+    """
+    Ejecuta consulta_base (SELECT ... FROM ... sin WHERE ni ORDER BY) paginada por columnas_orden.
+
+    claves son los nombres de esas columnas en cada fila devuelta (para armar los tokens).
+    despues pide la página que sigue al token; antes, la que lo precede. Un token inválido
+    se ignora y se devuelve la primera página.
+    """
+    limite = _normalizar_limite(limite)
+    hacia_atras = bool(antes)
+    token = antes if hacia_atras else despues
+    valores = _decodificar_cursor(token, len(columnas_orden)) if token else None
+    if valores is None:
+        hacia_atras = False
+
+    # Se recorre el índice hacia valores mayores si el orden es ascendente y se avanza,
+    # o si el orden es descendente y se retrocede.
+    hacia_mayores = (not descendente) != hacia_atras
+    registros, hay_mas = [], False
+    conn = obtener_conexion()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            parametros = list(valores) if valores is not None else []
+            parametros.append(limite + 1)
+            sql = _sql_pagina(conn, consulta_base, columnas_orden, filtro, valores is not None, hacia_mayores)
+            cursor.execute(sql, parametros)
+            filas = mapeo_filas.todos(cursor)
+            hay_mas = len(filas) > limite
+            registros = filas[:limite]
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener la página de %s: %s", contexto, e)
+        finally:
+            if conn: conn.close()
+
+    if hacia_atras:
+        registros.reverse()
+
+    def token_de(fila):
+        return _codificar_cursor(fila[clave] for clave in claves)
+
+    siguiente = anterior = None
+    if registros:
+        if hacia_atras:
+            siguiente = token_de(registros[-1])
+            anterior = token_de(registros[0]) if hay_mas else None
+        else:
+            siguiente = token_de(registros[-1]) if hay_mas else None
+            anterior = token_de(registros[0]) if valores is not None else None
+    return Pagina(registros, siguiente, anterior, limite)
+
+_SQL_CLIENTE_POR_DNI = sentencias.registrar('cliente_por_dni',
+    'SELECT id, nombre, apellido, telefono, email, dni FROM clientes WHERE dni = {p}')
 
 def _obtener_cliente_por_dni(conn, dni):
     """
@@ -179,24 +461,22 @@ def _obtener_cliente_por_dni(conn, dni):
     cliente = None
     try:
         cursor = conn.cursor()
-        placeholder = _get_param_placeholder(conn)
-	# ### DEBUG ###
-        print(f"### DEBUG _obtener_cliente_por_dni: Buscando DNI: {dni}")
-        cursor.execute(f'SELECT id, nombre, apellido, telefono, email, dni FROM clientes WHERE dni = {placeholder}', (dni,))
-        raw_cliente = cursor.fetchone()
-        if raw_cliente:
-                cliente = _map_row_to_dict(cursor, raw_cliente)
-                # ### DEBUG ###
-                print(f"### DEBUG _obtener_cliente_por_dni: DNI {dni} ENCONTRADO. Cliente ID: {cliente['id']}")
+        log.debug("Buscando DNI: %s", dni)
+        _SQL_CLIENTE_POR_DNI.ejecutar(cursor, (dni,))
+        cliente = mapeo_filas.uno(cursor)
+        if cliente:
+                log.debug("DNI %s ENCONTRADO. Cliente ID: %s", dni, cliente['id'])
         else:
-                # ### DEBUG ###
-                print(f"### DEBUG _obtener_cliente_por_dni: DNI {dni} NO ENCONTRADO.")
+                log.debug("DNI %s NO ENCONTRADO.", dni)
     except (sqlite3.Error, Psycopg2Error) as e:
-        print(f"Error en _obtener_cliente_por_dni: {e}")
+        log.error("Error en _obtener_cliente_por_dni: %s", e)
         # No se hace rollback aquí, ya que esta función es auxiliar y la transacción se maneja externamente
     return cliente
 
 # --- FUNCIÓN AUXILIAR FALTANTE: _obtener_usuario_cliente_por_cliente_id ---
+_SQL_USUARIO_CLIENTE_POR_CLIENTE = sentencias.registrar('usuario_cliente_por_cliente',
+    'SELECT id, username, cliente_id FROM usuarios_clientes WHERE cliente_id = {p}')
+
 def _obtener_usuario_cliente_por_cliente_id(conn, cliente_id):
     """
     Función auxiliar para obtener un usuario_cliente por su cliente_id.
@@ -204,16 +484,16 @@ def _obtener_usuario_cliente_por_cliente_id(conn, cliente_id):
     usuario = None
     try:
         cursor = conn.cursor()
-        placeholder = _get_param_placeholder(conn)
-        cursor.execute(f'SELECT id, username, cliente_id FROM usuarios_clientes WHERE cliente_id = {placeholder}', (cliente_id,))
-        raw_usuario = cursor.fetchone()
-        if raw_usuario:
-            usuario = _map_row_to_dict(cursor, raw_usuario)
+        _SQL_USUARIO_CLIENTE_POR_CLIENTE.ejecutar(cursor, (cliente_id,))
+        usuario = mapeo_filas.uno(cursor)
     except (sqlite3.Error, Psycopg2Error) as e:
-        print(f"Error en _obtener_usuario_cliente_por_cliente_id: {e}")
+        log.error("Error en _obtener_usuario_cliente_por_cliente_id: %s", e)
     return usuario
 
 # --- FUNCIÓN AUXILIAR FALTANTE: _obtener_usuario_cliente_por_username ---
+_SQL_USUARIO_CLIENTE_POR_USERNAME = sentencias.registrar('usuario_cliente_por_username',
+    'SELECT id, username, cliente_id FROM usuarios_clientes WHERE username = {p}')
+
 def _obtener_usuario_cliente_por_username(conn, username):
     """
     Función auxiliar para obtener un usuario_cliente por su nombre de usuario.
@@ -221,13 +501,10 @@ def _obtener_usuario_cliente_por_username(conn, username):
     usuario = None
     try:
         cursor = conn.cursor()
-        placeholder = _get_param_placeholder(conn)
-        cursor.execute(f'SELECT id, username, cliente_id FROM usuarios_clientes WHERE username = {placeholder}', (username,))
-        raw_usuario = cursor.fetchone()
-        if raw_usuario:
-            usuario = _map_row_to_dict(cursor, raw_usuario)
+        _SQL_USUARIO_CLIENTE_POR_USERNAME.ejecutar(cursor, (username,))
+        usuario = mapeo_filas.uno(cursor)
     except (sqlite3.Error, Psycopg2Error) as e:
-        print(f"Error en _obtener_usuario_cliente_por_username: {e}")
+        log.error("Error en _obtener_usuario_cliente_por_username: %s", e)
     return usuario
 
 
@@ -238,22 +515,19 @@ def _obtener_usuario_cliente_por_username(conn, username):
 # pero las funciones de inserción se adaptarán.
 
 # --- Funciones de Gestión de Clientes ---
+_SQL_INSERTAR_CLIENTE = sentencias.registrar('insertar_cliente', '''
+    INSERT INTO clientes (nombre, apellido, telefono, email, dni, actualizado_en)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {ahora}){retornar_id}
+''')
+
 def agregar_cliente(nombre, apellido, telefono, email, dni):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
             is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
-            query = f'''
-                INSERT INTO clientes (nombre, apellido, telefono, email, dni)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query, (nombre, apellido, telefono, email, dni))
+            _SQL_INSERTAR_CLIENTE.ejecutar(cursor, (nombre, apellido, telefono, email, dni))
             
             if is_postgresql:
                 cliente_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
@@ -261,142 +535,172 @@ def agregar_cliente(nombre, apellido, telefono, email, dni):
                 cliente_id = cursor.lastrowid # Para SQLite
 
             conn.commit()
+            _invalidar_referencia('clientes')
             return cliente_id
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
-            print(f"Error al agregar cliente: {e}")
+            log.error("Error al agregar cliente: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_TODOS_LOS_CLIENTES = sentencias.registrar('todos_los_clientes',
+    'SELECT id, nombre, apellido, telefono, email, dni FROM clientes ORDER BY apellido, nombre')
+
 def obtener_todos_los_clientes():
+    """
+    Lista completa ordenada por apellido y nombre, servida desde la caché de datos de referencia.
+    La lista es compartida entre peticiones: no modificarla.
+    """
+    return _leer_referencia('clientes', _leer_todos_los_clientes)
+
+def _leer_todos_los_clientes():
     conn = obtener_conexion()
-    clientes = []
+    clientes = None
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute('SELECT id, nombre, apellido, telefono, email, dni FROM clientes ORDER BY apellido, nombre')
-            raw_clientes = cursor.fetchall()
-            clientes = [_map_row_to_dict(cursor, row) for row in raw_clientes]
+            _SQL_TODOS_LOS_CLIENTES.ejecutar(cursor)
+            clientes = mapeo_filas.todos(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener todos los clientes: {e}")
+            log.error("Error al obtener todos los clientes: %s", e)
         finally:
             if conn: conn.close()
     return clientes
 
+def obtener_clientes_paginados(limite=None, despues=None, antes=None):
+    """Página de clientes ordenada por (apellido, nombre, id). Devuelve una Pagina."""
+    return _pagina_keyset(
+        'SELECT id, nombre, apellido, telefono, email, dni FROM clientes',
+        ('apellido', 'nombre', 'id'), ('apellido', 'nombre', 'id'),
+        limite=limite, despues=despues, antes=antes, contexto="clientes")
+
+_SQL_CLIENTE_POR_ID = sentencias.registrar('cliente_por_id',
+    'SELECT id, nombre, apellido, telefono, email, dni FROM clientes WHERE id = {p}', preparar=True)
+
 def obtener_cliente_por_id(cliente_id):
     conn = obtener_conexion()
     cliente = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'SELECT id, nombre, apellido, telefono, email, dni FROM clientes WHERE id = {placeholder}', (cliente_id,))
-            raw_cliente = cursor.fetchone()
-            if raw_cliente:
-                cliente = _map_row_to_dict(cursor, raw_cliente)
+            _SQL_CLIENTE_POR_ID.ejecutar(cursor, (cliente_id,))
+            cliente = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener cliente por ID: {e}")
+            log.error("Error al obtener cliente por ID: %s", e)
         finally:
             if conn: conn.close()
     return cliente
 
+_SQL_CLIENTE_POR_USERNAME = sentencias.registrar('cliente_por_username', '''
+    SELECT c.id, c.nombre, c.apellido, c.telefono, c.email, c.dni, uc.username, uc.id AS usuario_cliente_id
+    FROM clientes c
+    JOIN usuarios_clientes uc ON c.id = uc.cliente_id
+    WHERE uc.username = {p}
+''', preparar=True)
+
 def obtener_cliente_por_username(username):
     conn = obtener_conexion()
     cliente_data = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT c.id, c.nombre, c.apellido, c.telefono, c.email, c.dni, uc.username, uc.id AS usuario_cliente_id
-                FROM clientes c
-                JOIN usuarios_clientes uc ON c.id = uc.cliente_id
-                WHERE uc.username = {placeholder}
-            ''', (username,))
-            raw_cliente = cursor.fetchone()
-            if raw_cliente:
-                cliente_data = _map_row_to_dict(cursor, raw_cliente)
+            _SQL_CLIENTE_POR_USERNAME.ejecutar(cursor, (username,))
+            cliente_data = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener cliente por username: {e}")
+            log.error("Error al obtener cliente por username: %s", e)
         finally:
             if conn: conn.close()
     return cliente_data
 
+_SQL_ACTUALIZAR_CLIENTE = sentencias.registrar('actualizar_cliente', '''
+    UPDATE clientes
+    SET nombre = {p}, apellido = {p}, telefono = {p}, email = {p}, dni = {p}, {sello}
+    WHERE id = {p}
+''')
+
 def actualizar_cliente(cliente_id, nombre, apellido, telefono, email, dni):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                UPDATE clientes
-                SET nombre = {placeholder}, apellido = {placeholder}, telefono = {placeholder}, email = {placeholder}, dni = {placeholder}
-                WHERE id = {placeholder}
-            ''', (nombre, apellido, telefono, email, dni, cliente_id))
+            _SQL_ACTUALIZAR_CLIENTE.ejecutar(cursor, (nombre, apellido, telefono, email, dni, cliente_id))
             conn.commit()
+            _invalidar_referencia('clientes')
             return True
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
-            print(f"Error al actualizar cliente: {e}")
+            log.error("Error al actualizar cliente: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_ELIMINAR_CLIENTE = sentencias.registrar('eliminar_cliente', 'DELETE FROM clientes WHERE id = {p}')
+
 def eliminar_cliente(cliente_id):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'DELETE FROM clientes WHERE id = {placeholder}', (cliente_id,))
+            dias = _dias_de_reparaciones(cursor, _SQL_DIAS_REPARACIONES_CLIENTE, (cliente_id,))
+            _SQL_ELIMINAR_CLIENTE.ejecutar(cursor, (cliente_id,))
+            _recalcular_resumen(cursor, dias)
             conn.commit()
+            _invalidar_referencia('clientes')
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al eliminar cliente: {e}")
+            log.error("Error al eliminar cliente: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_CLIENTE_POR_NOMBRE_APELLIDO = sentencias.registrar('cliente_por_nombre_apellido',
+    'SELECT id, nombre, apellido, telefono, email, dni FROM clientes WHERE nombre = {p} AND apellido = {p}')
+
 def obtener_cliente_por_nombre_apellido(nombre, apellido):
     conn = obtener_conexion()
     cliente = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'SELECT id, nombre, apellido, telefono, email, dni FROM clientes WHERE nombre = {placeholder} AND apellido = {placeholder}', (nombre, apellido))
-            raw_cliente = cursor.fetchone()
-            if raw_cliente:
-                cliente = _map_row_to_dict(cursor, raw_cliente)
+            _SQL_CLIENTE_POR_NOMBRE_APELLIDO.ejecutar(cursor, (nombre, apellido))
+            cliente = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener cliente por nombre y apellido: {e}")
+            log.error("Error al obtener cliente por nombre y apellido: %s", e)
         finally:
             if conn: conn.close()
     return cliente
 
+_SQL_INSERTAR_USUARIO_CLIENTE = sentencias.registrar('insertar_usuario_cliente', '''
+    INSERT INTO usuarios_clientes (cliente_id, username, password)
+    VALUES ({p}, {p}, {p}){retornar_id}
+''')
+_SQL_INSERTAR_CLIENTE_REGISTRO = sentencias.registrar('insertar_cliente_registro', '''
+    INSERT INTO clientes (nombre, apellido, dni, actualizado_en)
+    VALUES ({p}, {p}, {p}, {ahora}){retornar_id}
+''')
+
 def registrar_cliente_con_usuario(nombre, apellido, username, password, dni):
+    # El hash se calcula antes de abrir la conexión (fuera de una unidad de trabajo, no se retiene durante bcrypt).
+    # Puede lanzar contrasenas.ContrasenasSaturadasError (la ruta responde 503).
+    hashed_password = contrasenas.hashear(password)
     conn = obtener_conexion()
     if not conn:
-	# ### DEBUG ###
-        print("### DEBUG registrar_cliente_con_usuario: NO SE PUDO OBTENER CONEXIÓN A LA DB.")
+        log.error("No se pudo obtener conexión a la base de datos para registrar el cliente.")
         return False, "Error de conexión a la base de datos."
 
     try:
-        placeholder = _get_param_placeholder(conn)
         is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
-	# ### DEBUG ###
-        print(f"### DEBUG registrar_cliente_con_usuario: Intentando registrar cliente: {nombre} {apellido}, DNI: {dni}, User: {username}")
+        log.debug("Intentando registrar cliente: %s %s, DNI: %s, User: %s", nombre, apellido, dni, username)
 
         cliente_existente_por_dni = _obtener_cliente_por_dni(conn, dni)
         if cliente_existente_por_dni:
-            ### DEBUG ###
-            print(f"### DEBUG registrar_cliente_con_usuario: Cliente con DNI {dni} YA EXISTE. ID: {cliente_existente_por_dni['id']}")
+            log.debug("Cliente con DNI %s YA EXISTE. ID: %s", dni, cliente_existente_por_dni['id'])
             usuario_existente_para_cliente = _obtener_usuario_cliente_por_cliente_id(conn, cliente_existente_por_dni['id'])
             if usuario_existente_para_cliente:
                 return False, "Ya existe una cuenta asociada a este DNI. Por favor, inicia sesión."
@@ -404,18 +708,10 @@ def registrar_cliente_con_usuario(nombre, apellido, username, password, dni):
                 if _obtener_usuario_cliente_por_username(conn, username):
                     return False, "El nombre de usuario propuesto ya está en uso."
 
-                hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
                 cursor = conn.cursor()
-                query_insert_user = f'''
-                    INSERT INTO usuarios_clientes (cliente_id, username, password)
-                    VALUES ({placeholder}, {placeholder}, {placeholder})
-                '''
-                if is_postgresql:
-                    query_insert_user += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-		# ### DEBUG ###
-                print(f"### DEBUG registrar_cliente_con_usuario: Ejecutando INSERT de usuario para cliente ID {cliente_existente_por_dni['id']}")
+                log.debug("Ejecutando INSERT de usuario para cliente ID %s", cliente_existente_por_dni['id'])
 
-                cursor.execute(query_insert_user, (cliente_existente_por_dni['id'], username, hashed_password))
+                _SQL_INSERTAR_USUARIO_CLIENTE.ejecutar(cursor, (cliente_existente_por_dni['id'], username, hashed_password))
 
 
                 # No necesitamos el ID del usuario_cliente para este flujo, pero lo obtenemos si se usa RETURNING
@@ -429,35 +725,20 @@ def registrar_cliente_con_usuario(nombre, apellido, username, password, dni):
                 return False, "El nombre de usuario ya existe. Por favor, elige otro."
 
             cursor = conn.cursor()
-            insert_cliente_sql = f'''
-                INSERT INTO clientes (nombre, apellido, dni)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                insert_cliente_sql += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(insert_cliente_sql, (nombre, apellido, dni))
+            _SQL_INSERTAR_CLIENTE_REGISTRO.ejecutar(cursor, (nombre, apellido, dni))
             
             if is_postgresql:
                 cliente_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
             else:
                 cliente_id = cursor.lastrowid # Para SQLite
 
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-            query_insert_user = f'''
-                INSERT INTO usuarios_clientes (cliente_id, username, password)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query_insert_user += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query_insert_user, (cliente_id, username, hashed_password))
+            _SQL_INSERTAR_USUARIO_CLIENTE.ejecutar(cursor, (cliente_id, username, hashed_password))
             
             if is_postgresql:
                 _ = cursor.fetchone()[0] # Consumir el resultado de RETURNING si existe
 
             conn.commit()
+            _invalidar_referencia('clientes')
             return True, "Registro exitoso. ¡Bienvenido! Ya puedes iniciar sesión."
 
     except (sqlite3.IntegrityError, Psycopg2Error) as e:
@@ -468,215 +749,269 @@ def registrar_cliente_con_usuario(nombre, apellido, username, password, dni):
                 return False, "El nombre de usuario ya está registrado."
             elif "dni" in error_message:
                 return False, "El DNI ya está registrado por otro cliente."
-        print(f"Error de integridad en registrar_cliente_con_usuario: {e}")
+        log.error("Error de integridad en registrar_cliente_con_usuario: %s", e)
         return False, f"Error al registrar: {e}"
     except Exception as e:
         conn.rollback()
-        print(f"Error inesperado en registrar_cliente_con_usuario: {e}")
+        log.exception("Error inesperado en registrar_cliente_con_usuario: %s", e)
         return False, f"Error inesperado al registrar: {e}"
     finally:
         if conn:
             conn.close()
 
 
+_SQL_ACTUALIZAR_HASH = {
+    tabla: sentencias.registrar(f'actualizar_hash_{tabla}', f'UPDATE {tabla} SET password = {{p}} WHERE id = {{p}}')
+    for tabla in ('usuarios_clientes', 'usuarios_mecanicos')
+}
+
+def _actualizar_hash_usuario(tabla, usuario_id, password):
+    """
+    Rehace el hash de una contraseña recién verificada con el costo actual (BCRYPT_ROUNDS).
+    Si el grupo de hash está saturado se deja para el próximo inicio de sesión.
+    """
+    try:
+        nuevo_hash = contrasenas.hashear(password)
+    except contrasenas.ContrasenasSaturadasError:
+        return
+    conn = obtener_conexion()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_ACTUALIZAR_HASH[tabla].ejecutar(cursor, (nuevo_hash, usuario_id))
+            conn.commit()
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al actualizar el hash de contraseña en %s: %s", tabla, e)
+            conn.rollback()
+        finally:
+            if conn: conn.close()
+
+
+_SQL_CREDENCIALES_CLIENTE = sentencias.registrar('credenciales_cliente', '''
+    SELECT uc.password, c.id AS cliente_id, uc.id AS usuario_cliente_id, uc.username
+    FROM usuarios_clientes uc
+    JOIN clientes c ON uc.cliente_id = c.id
+    WHERE uc.username = {p}
+''', preparar=True)
+
 def verificar_credenciales_cliente(username, password):
     conn = obtener_conexion()
-    cliente_data = None
+    user_record = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'SELECT uc.password, c.id AS cliente_id, uc.id AS usuario_cliente_id, uc.username FROM usuarios_clientes uc JOIN clientes c ON uc.cliente_id = c.id WHERE uc.username = {placeholder}', (username,))
-            user_record_raw = cursor.fetchone()
-
-            if user_record_raw:
-                user_record = _map_row_to_dict(cursor, user_record_raw)
-                stored_hashed_password = user_record['password'].encode('utf-8')
-                if bcrypt.checkpw(password.encode('utf-8'), stored_hashed_password):
-                    cliente_data = user_record
-                    del cliente_data['password']
-            else:
-                print(f"DEBUG: No se encontró usuario '{username}'.")
+            _SQL_CREDENCIALES_CLIENTE.ejecutar(cursor, (username,))
+            user_record = mapeo_filas.uno(cursor)
+            if user_record is None:
+                log.debug("No se encontró usuario '%s'.", username)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al verificar credenciales de cliente: {e}")
+            log.error("Error al verificar credenciales de cliente: %s", e)
         finally:
             if conn: conn.close()
-    return cliente_data
+
+    # bcrypt corre después de cerrar la conexión (fuera de una unidad de trabajo ya volvió al pool).
+    if not user_record or not contrasenas.verificar(password, user_record['password']):
+        return None
+    if contrasenas.necesita_rehash(user_record['password']):
+        _actualizar_hash_usuario('usuarios_clientes', user_record['usuario_cliente_id'], password)
+    del user_record['password']
+    return user_record
 
 
 # --- Funciones de Gestión de Mecánicos ---
+_SQL_INSERTAR_MECANICO = sentencias.registrar('insertar_mecanico', '''
+    INSERT INTO mecanicos (nombre, apellido, telefono, email, actualizado_en)
+    VALUES ({p}, {p}, {p}, {p}, {ahora}){retornar_id}
+''')
+_SQL_INSERTAR_USUARIO_MECANICO = sentencias.registrar('insertar_usuario_mecanico', '''
+    INSERT INTO usuarios_mecanicos (mecanico_id, username, password)
+    VALUES ({p}, {p}, {p}){retornar_id}
+''')
+
 def agregar_mecanico(nombre, apellido, telefono, email, username, password):
+    hashed_password = contrasenas.hashear(password)
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
             is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
-            query_mecanico = f'''
-                INSERT INTO mecanicos (nombre, apellido, telefono, email)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query_mecanico += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query_mecanico, (nombre, apellido, telefono, email))
+            _SQL_INSERTAR_MECANICO.ejecutar(cursor, (nombre, apellido, telefono, email))
             
             if is_postgresql:
                 mecanico_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
             else:
                 mecanico_id = cursor.lastrowid # Para SQLite
 
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-            query_user_mecanico = f'''
-                INSERT INTO usuarios_mecanicos (mecanico_id, username, password)
-                VALUES ({placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query_user_mecanico += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query_user_mecanico, (mecanico_id, username, hashed_password))
+            _SQL_INSERTAR_USUARIO_MECANICO.ejecutar(cursor, (mecanico_id, username, hashed_password))
             
             if is_postgresql:
                 _ = cursor.fetchone()[0] # Consumir el resultado de RETURNING si existe
 
             conn.commit()
+            _invalidar_referencia('mecanicos')
             return True
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
-            print(f"Error al agregar mecánico y usuario: {e}")
+            log.error("Error al agregar mecánico y usuario: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_TODOS_LOS_MECANICOS = sentencias.registrar('todos_los_mecanicos',
+    'SELECT id, nombre, apellido, telefono, email FROM mecanicos ORDER BY apellido, nombre')
+
 def obtener_todos_los_mecanicos():
+    """
+    Lista completa ordenada por apellido y nombre, servida desde la caché de datos de referencia.
+    La lista es compartida entre peticiones: no modificarla.
+    """
+    return _leer_referencia('mecanicos', _leer_todos_los_mecanicos)
+
+def _leer_todos_los_mecanicos():
     conn = obtener_conexion()
-    mecanicos = []
+    mecanicos = None
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute('SELECT id, nombre, apellido, telefono, email FROM mecanicos ORDER BY apellido, nombre')
-            raw_mecanicos = cursor.fetchall()
-            mecanicos = [_map_row_to_dict(cursor, row) for row in raw_mecanicos]
+            _SQL_TODOS_LOS_MECANICOS.ejecutar(cursor)
+            mecanicos = mapeo_filas.todos(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener todos los mecánicos: {e}")
+            log.error("Error al obtener todos los mecánicos: %s", e)
         finally:
             if conn: conn.close()
     return mecanicos
 
+def obtener_mecanicos_paginados(limite=None, despues=None, antes=None):
+    """Página de mecánicos ordenada por (apellido, nombre, id). Devuelve una Pagina."""
+    return _pagina_keyset(
+        'SELECT id, nombre, apellido, telefono, email FROM mecanicos',
+        ('apellido', 'nombre', 'id'), ('apellido', 'nombre', 'id'),
+        limite=limite, despues=despues, antes=antes, contexto="mecánicos")
+
+_SQL_MECANICO_POR_ID = sentencias.registrar('mecanico_por_id',
+    'SELECT id, nombre, apellido, telefono, email FROM mecanicos WHERE id = {p}', preparar=True)
+
 def obtener_mecanico_por_id(mecanico_id):
     conn = obtener_conexion()
     mecanico = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'SELECT id, nombre, apellido, telefono, email FROM mecanicos WHERE id = {placeholder}', (mecanico_id,))
-            raw_mecanico = cursor.fetchone()
-            if raw_mecanico:
-                mecanico = _map_row_to_dict(cursor, raw_mecanico)
+            _SQL_MECANICO_POR_ID.ejecutar(cursor, (mecanico_id,))
+            mecanico = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener mecánico por ID: {e}")
+            log.error("Error al obtener mecánico por ID: %s", e)
         finally:
             if conn: conn.close()
     return mecanico
 
+_SQL_ACTUALIZAR_MECANICO = sentencias.registrar('actualizar_mecanico', '''
+    UPDATE mecanicos
+    SET nombre = {p}, apellido = {p}, telefono = {p}, email = {p}, {sello}
+    WHERE id = {p}
+''')
+
 def actualizar_mecanico(mecanico_id, nombre, apellido, telefono, email):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                UPDATE mecanicos
-                SET nombre = {placeholder}, apellido = {placeholder}, telefono = {placeholder}, email = {placeholder}
-                WHERE id = {placeholder}
-            ''', (nombre, apellido, telefono, email, mecanico_id))
+            _SQL_ACTUALIZAR_MECANICO.ejecutar(cursor, (nombre, apellido, telefono, email, mecanico_id))
             conn.commit()
+            _invalidar_referencia('mecanicos')
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al actualizar mecánico: {e}")
+            log.error("Error al actualizar mecánico: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+# Las reparaciones que lo mostraban cambian (pierden el mecánico): se marcan como modificadas.
+_SQL_SELLAR_REPARACIONES_DE_MECANICO = sentencias.registrar('sellar_reparaciones_de_mecanico',
+    'UPDATE reparaciones SET {sello} WHERE mecanico_id = {p}')
+_SQL_ELIMINAR_MECANICO = sentencias.registrar('eliminar_mecanico', 'DELETE FROM mecanicos WHERE id = {p}')
+
 def eliminar_mecanico(mecanico_id):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'DELETE FROM mecanicos WHERE id = {placeholder}', (mecanico_id,))
+            dias = _dias_de_reparaciones(cursor, _SQL_DIAS_REPARACIONES_MECANICO, (mecanico_id,))
+            _SQL_SELLAR_REPARACIONES_DE_MECANICO.ejecutar(cursor, (mecanico_id,))
+            _SQL_ELIMINAR_MECANICO.ejecutar(cursor, (mecanico_id,))
+            _recalcular_resumen(cursor, dias)
             conn.commit()
+            _invalidar_referencia('mecanicos')
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al eliminar mecánico: {e}")
+            log.error("Error al eliminar mecánico: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_CREDENCIALES_MECANICO = sentencias.registrar('credenciales_mecanico', '''
+    SELECT
+        um.password,
+        um.id AS usuario_mecanico_id,
+        m.id AS mecanico_id,
+        m.nombre,
+        m.apellido,
+        m.telefono,
+        m.email
+    FROM usuarios_mecanicos um
+    JOIN mecanicos m ON um.mecanico_id = m.id
+    WHERE um.username = {p}
+''', preparar=True)
+
 def verificar_credenciales_mecanico(username, password):
     conn = obtener_conexion()
-    mecanico_data = None
+    user_record = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT
-                    um.password,
-                    m.id AS mecanico_id,
-                    m.nombre,
-                    m.apellido,
-                    m.telefono,
-                    m.email
-                FROM usuarios_mecanicos um
-                JOIN mecanicos m ON um.mecanico_id = m.id
-                WHERE um.username = {placeholder}
-            ''', (username,))
-            user_record_raw = cursor.fetchone()
-
-            if user_record_raw:
-                user_record = _map_row_to_dict(cursor, user_record_raw)
+            _SQL_CREDENCIALES_MECANICO.ejecutar(cursor, (username,))
+            user_record = mapeo_filas.uno(cursor)
+            if user_record:
                 user_record['id'] = user_record['mecanico_id']
-                stored_hashed_password = user_record['password'].encode('utf-8')
-                if bcrypt.checkpw(password.encode('utf-8'), stored_hashed_password):
-                    mecanico_data = user_record
-                    del mecanico_data['password']
-                else:
-                    print(f"DEBUG: Contraseña incorrecta para usuario '{username}'.")
             else:
-                print(f"DEBUG: No se encontró mecánico con usuario '{username}'.")
+                log.debug("No se encontró mecánico con usuario '%s'.", username)
 
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al verificar credenciales de mecánico: {e}")
+            log.error("Error al verificar credenciales de mecánico: %s", e)
         finally:
             if conn: conn.close()
-    return mecanico_data
+
+    if not user_record:
+        return None
+    if not contrasenas.verificar(password, user_record['password']):
+        log.debug("Contraseña incorrecta para usuario '%s'.", username)
+        return None
+    usuario_mecanico_id = user_record.pop('usuario_mecanico_id')
+    if contrasenas.necesita_rehash(user_record['password']):
+        _actualizar_hash_usuario('usuarios_mecanicos', usuario_mecanico_id, password)
+    del user_record['password']
+    return user_record
 
 # --- Funciones de Gestión de Vehículos ---
+_SQL_INSERTAR_VEHICULO = sentencias.registrar('insertar_vehiculo', '''
+    INSERT INTO vehiculos (cliente_id, patente, marca, modelo, anio, kilometraje_inicial, actualizado_en)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {ahora}){retornar_id}
+''')
+
 def agregar_vehiculo(cliente_id, patente, marca, modelo, anio, kilometraje_inicial):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
             is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
-            query = f'''
-                INSERT INTO vehiculos (cliente_id, patente, marca, modelo, anio, kilometraje_inicial)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query, (cliente_id, patente, marca, modelo, anio, kilometraje_inicial))
+            _SQL_INSERTAR_VEHICULO.ejecutar(cursor, (cliente_id, patente, marca, modelo, anio, kilometraje_inicial))
             
             if is_postgresql:
                 vehiculo_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
@@ -686,91 +1021,308 @@ def agregar_vehiculo(cliente_id, patente, marca, modelo, anio, kilometraje_inici
             conn.commit()
             return vehiculo_id # Devolver el ID del vehículo
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
-            print(f"Error al agregar vehículo: {e}")
+            log.error("Error al agregar vehículo: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_VEHICULOS_POR_CLIENTE = sentencias.registrar('vehiculos_por_cliente', '''
+    SELECT v.id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente
+    FROM vehiculos v
+    JOIN clientes c ON v.cliente_id = c.id
+    WHERE v.cliente_id = {p}
+    ORDER BY v.patente
+''', preparar=True)
+
 def obtener_vehiculos_por_cliente(cliente_id):
     conn = obtener_conexion()
     vehiculos = []
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT v.id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente
-                FROM vehiculos v
-                JOIN clientes c ON v.cliente_id = c.id
-                WHERE v.cliente_id = {placeholder}
-                ORDER BY v.patente
-            ''', (cliente_id,))
-            raw_vehiculos = cursor.fetchall()
-            vehiculos = [_map_row_to_dict(cursor, row) for row in raw_vehiculos]
+            _SQL_VEHICULOS_POR_CLIENTE.ejecutar(cursor, (cliente_id,))
+            vehiculos = mapeo_filas.todos(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener vehículos por cliente {cliente_id}: {e}")
+            log.error("Error al obtener vehículos por cliente %s: %s", cliente_id, e)
         finally:
             if conn: conn.close()
     return vehiculos
 
+# Tope de parámetros por IN (...): SQLite antiguo admite hasta 999 variables por sentencia.
+_IDS_POR_CONSULTA = 512
+
+_VEHICULOS_CON_CLIENTE = '''
+    SELECT v.id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.dni AS dni_cliente
+    FROM vehiculos v
+    JOIN clientes c ON v.cliente_id = c.id
+'''
+_formas_vehiculos_con_cliente = {}
+
+def _sql_vehiculos_con_cliente(conn, cantidad_ids, con_limite):
+    """
+    Texto para una tanda de `cantidad_ids` ids (None: sin filtro). Las tandas se rellenan hasta
+    la potencia de dos siguiente, así que hay a lo sumo diez formas de IN (...) por dialecto.
+    """
+    clave = (sentencias.dialecto(conn), cantidad_ids, con_limite)
+    sql = _formas_vehiculos_con_cliente.get(clave)
+    if sql is None:
+        plantilla = _VEHICULOS_CON_CLIENTE
+        if cantidad_ids is not None:
+            plantilla += f" WHERE v.cliente_id IN ({', '.join(['{p}'] * cantidad_ids)})"
+        plantilla += ' ORDER BY c.apellido, c.nombre, c.id, v.patente'
+        if con_limite:
+            plantilla += ' LIMIT {p}'
+        sql = _formas_vehiculos_con_cliente[clave] = sentencias.texto_dinamico(conn, plantilla)
+    return sql
+
+def _rellenar_tanda(ids):
+    """Repite el último id hasta la potencia de dos siguiente (repetirlo no cambia el resultado)."""
+    tamano = 1
+    while tamano < len(ids):
+        tamano *= 2
+    return ids + [ids[-1]] * (tamano - len(ids))
+
+def obtener_vehiculos_con_cliente(cliente_ids=None, limite=None):
+    """
+    Carga en una sola consulta los vehículos agrupados por cliente.
+
+    Devuelve una lista de clientes (ordenada por apellido y nombre) con sus vehículos en
+    la clave 'vehiculos'. Sin cliente_ids trae todos los clientes que tienen vehículos;
+    con cliente_ids, sólo esos (en tandas de _IDS_POR_CONSULTA). limite acota el total
+    de vehículos leídos.
+    """
+    conn = obtener_conexion()
+    clientes = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            if cliente_ids is None:
+                tandas = [None]
+            else:
+                ids = list(dict.fromkeys(cliente_ids))
+                tandas = [_rellenar_tanda(ids[i:i + _IDS_POR_CONSULTA]) for i in range(0, len(ids), _IDS_POR_CONSULTA)]
+            filas = []
+            for tanda in tandas:
+                parametros = list(tanda) if tanda is not None else []
+                if limite is not None:
+                    parametros.append(limite - len(filas))
+                sql = _sql_vehiculos_con_cliente(conn, len(tanda) if tanda is not None else None, limite is not None)
+                cursor.execute(sql, parametros)
+                filas.extend(mapeo_filas.todos(cursor))
+                if limite is not None and len(filas) >= limite:
+                    break
+            if len(tandas) > 1:
+                filas.sort(key=lambda v: (v['apellido_cliente'], v['nombre_cliente'], v['cliente_id'], v['patente']))
+
+            por_cliente = {}
+            for vehiculo in filas:
+                cliente = por_cliente.get(vehiculo['cliente_id'])
+                if cliente is None:
+                    cliente = {
+                        'id': vehiculo['cliente_id'],
+                        'nombre': vehiculo['nombre_cliente'],
+                        'apellido': vehiculo['apellido_cliente'],
+                        'dni': vehiculo['dni_cliente'],
+                        'vehiculos': [],
+                    }
+                    por_cliente[vehiculo['cliente_id']] = cliente
+                    clientes.append(cliente)
+                cliente['vehiculos'].append(vehiculo)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener vehículos con cliente: %s", e)
+        finally:
+            if conn: conn.close()
+    return clientes
+
+# --- Búsqueda de texto (typeahead) ---
+# SQLite busca en las tablas FTS5 clientes_busqueda / vehiculos_busqueda (migración 4) por
+# prefijo de palabra; PostgreSQL, con ILIKE '% palabra%' sobre la expresión de su índice trigram.
+# En ambos, cada palabra escrita tiene que coincidir con el comienzo de alguna palabra del
+# registro. Hay una sentencia por cantidad de palabras (PostgreSQL lleva una condición por cada una).
+BUSQUEDA_PALABRAS_MAXIMAS = 4
+
+def _palabras_busqueda(texto):
+    """
+    Palabras del texto buscado, sin los puntos ni guiones con que se suelen escribir DNI y
+    patentes. Los índices de búsqueda guardan esas columnas igual (indices.sin_puntuacion).
+    """
+    palabras = [palabra.replace('.', '').replace('-', '') for palabra in (texto or '').split()]
+    return [palabra for palabra in palabras if palabra][:BUSQUEDA_PALABRAS_MAXIMAS]
+
+def _parametros_busqueda(conn, palabras, repeticiones=1):
+    if sentencias.dialecto(conn) == sentencias.SQLITE:
+        # Cada palabra como frase entre comillas (sin operadores de FTS5) y con * de prefijo.
+        consulta = ' '.join('"' + palabra.replace('"', '""') + '"*' for palabra in palabras)
+        return [consulta] * repeticiones
+    patrones = ['% ' + palabra.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                for palabra in palabras]
+    return patrones * repeticiones
+
+def _condiciones_busqueda(expresion, cantidad):
+    return ' AND '.join([f'{expresion} ILIKE {{p}}'] * cantidad)
+
+_SQL_BUSCAR_CLIENTES = {
+    cantidad: sentencias.registrar(
+        f'buscar_clientes_{cantidad}',
+        sqlite='''
+            SELECT c.id, c.nombre, c.apellido, c.telefono, c.email, c.dni
+            FROM clientes_busqueda
+            JOIN clientes c ON c.id = clientes_busqueda.rowid
+            WHERE clientes_busqueda MATCH {p}
+            ORDER BY clientes_busqueda.rank, c.apellido, c.nombre
+            LIMIT {p}
+        ''',
+        postgresql=f'''
+            SELECT id, nombre, apellido, telefono, email, dni
+            FROM clientes
+            WHERE {_condiciones_busqueda('{texto_clientes}', cantidad)}
+            ORDER BY apellido, nombre, id
+            LIMIT {{p}}
+        ''', preparar=True)
+    for cantidad in range(1, BUSQUEDA_PALABRAS_MAXIMAS + 1)
+}
+
+def buscar_clientes(texto, limite=10):
+    """
+    Búsqueda incremental (typeahead) de clientes por nombre, apellido o DNI, en cualquier orden
+    ("perez 2012" encuentra a Pérez con DNI 20123456). Resuelta por el índice de texto: el costo
+    depende de las coincidencias, no del total de clientes.
+    """
+    palabras = _palabras_busqueda(texto)
+    if not palabras:
+        return []
+    limite = max(1, min(int(limite), PAGINA_MAXIMA))
+    conn = obtener_conexion()
+    clientes = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_BUSCAR_CLIENTES[len(palabras)].ejecutar(cursor, (*_parametros_busqueda(conn, palabras), limite))
+            clientes = mapeo_filas.todos(cursor)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al buscar clientes: %s", e)
+        finally:
+            if conn: conn.close()
+    return clientes
+
+_COLUMNAS_BUSQUEDA_VEHICULOS = '''
+    SELECT v.id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente
+    FROM vehiculos v
+    JOIN clientes c ON v.cliente_id = c.id
+'''
+_SQL_BUSCAR_VEHICULOS = {
+    cantidad: sentencias.registrar(
+        f'buscar_vehiculos_{cantidad}',
+        sqlite=f'''
+            {_COLUMNAS_BUSQUEDA_VEHICULOS}
+            WHERE v.id IN (SELECT rowid FROM vehiculos_busqueda WHERE vehiculos_busqueda MATCH {{p}})
+            UNION
+            {_COLUMNAS_BUSQUEDA_VEHICULOS}
+            WHERE v.cliente_id IN (SELECT rowid FROM clientes_busqueda WHERE clientes_busqueda MATCH {{p}})
+            ORDER BY patente
+            LIMIT {{p}}
+        ''',
+        postgresql=f'''
+            {_COLUMNAS_BUSQUEDA_VEHICULOS} WHERE {_condiciones_busqueda('{texto_vehiculos}', cantidad)}
+            UNION
+            {_COLUMNAS_BUSQUEDA_VEHICULOS} WHERE {_condiciones_busqueda('{texto_clientes}', cantidad)}
+            ORDER BY patente
+            LIMIT {{p}}
+        ''', preparar=True)
+    for cantidad in range(1, BUSQUEDA_PALABRAS_MAXIMAS + 1)
+}
+
+def buscar_vehiculos(texto, limite=20):
+    """
+    Búsqueda incremental (typeahead) de vehículos por patente, marca o modelo, o por nombre,
+    apellido o DNI del cliente. Usa los mismos índices de texto que buscar_clientes.
+    """
+    palabras = _palabras_busqueda(texto)
+    if not palabras:
+        return []
+    limite = max(1, min(int(limite), PAGINA_MAXIMA))
+    conn = obtener_conexion()
+    vehiculos = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_BUSCAR_VEHICULOS[len(palabras)].ejecutar(cursor, (*_parametros_busqueda(conn, palabras, 2), limite))
+            vehiculos = mapeo_filas.todos(cursor)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al buscar vehículos: %s", e)
+        finally:
+            if conn: conn.close()
+    return vehiculos
+
+_SQL_VEHICULO_POR_ID = sentencias.registrar('vehiculo_por_id', '''
+    SELECT v.id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente
+    FROM vehiculos v
+    JOIN clientes c ON v.cliente_id = c.id
+    WHERE v.id = {p}
+''', preparar=True)
+
 def obtener_vehiculo_por_id(vehiculo_id):
     conn = obtener_conexion()
     vehiculo = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT v.id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente
-                FROM vehiculos v
-                JOIN clientes c ON v.cliente_id = c.id
-                WHERE v.id = {placeholder}
-            ''', (vehiculo_id,))
-            raw_vehiculo = cursor.fetchone()
-            if raw_vehiculo:
-                vehiculo = _map_row_to_dict(cursor, raw_vehiculo)
+            _SQL_VEHICULO_POR_ID.ejecutar(cursor, (vehiculo_id,))
+            vehiculo = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener vehículo por ID {vehiculo_id}: {e}")
+            log.error("Error al obtener vehículo por ID %s: %s", vehiculo_id, e)
         finally:
             if conn: conn.close()
     return vehiculo
 
+_SQL_ACTUALIZAR_VEHICULO = sentencias.registrar('actualizar_vehiculo', '''
+    UPDATE vehiculos
+    SET marca = {p}, modelo = {p}, anio = {p}, patente = {p}, kilometraje_inicial = {p}, {sello}
+    WHERE id = {p}
+''')
+
 def actualizar_vehiculo(vehiculo_id, marca, modelo, anio, patente, kilometraje_inicial):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                UPDATE vehiculos
-                SET marca = {placeholder}, modelo = {placeholder}, anio = {placeholder}, patente = {placeholder}, kilometraje_inicial = {placeholder}
-                WHERE id = {placeholder}
-            ''', (marca, modelo, anio, patente, kilometraje_inicial, vehiculo_id))
+            _SQL_ACTUALIZAR_VEHICULO.ejecutar(cursor, (marca, modelo, anio, patente, kilometraje_inicial, vehiculo_id))
             conn.commit()
             return True
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
-            print(f"Error al actualizar vehículo: {e}")
+            log.error("Error al actualizar vehículo: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+# El panel del dueño cambia (pierde el vehículo): se marca el cliente como modificado.
+_SQL_SELLAR_DUENO_DE_VEHICULO = sentencias.registrar('sellar_dueno_de_vehiculo', '''
+    UPDATE clientes SET {sello}
+    WHERE id = (SELECT cliente_id FROM vehiculos WHERE id = {p})
+''')
+_SQL_ELIMINAR_VEHICULO = sentencias.registrar('eliminar_vehiculo', 'DELETE FROM vehiculos WHERE id = {p}')
+
 def eliminar_vehiculo(vehiculo_id):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'DELETE FROM vehiculos WHERE id = {placeholder}', (vehiculo_id,))
+            dias = _dias_de_reparaciones(cursor, _SQL_DIAS_REPARACIONES_VEHICULO, (vehiculo_id,))
+            _SQL_SELLAR_DUENO_DE_VEHICULO.ejecutar(cursor, (vehiculo_id,))
+            _SQL_ELIMINAR_VEHICULO.ejecutar(cursor, (vehiculo_id,))
+            _recalcular_resumen(cursor, dias)
             conn.commit()
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al eliminar vehículo: {e}")
+            log.error("Error al eliminar vehículo: %s", e)
             conn.rollback()
             return False
         finally:
@@ -778,23 +1330,175 @@ def eliminar_vehiculo(vehiculo_id):
     return False
 
 
+# --- Fechas ---
+# Se guardan como texto ISO 8601 en SQLite y como DATE / TIMESTAMP en PostgreSQL; en ambos casos
+# se pasan como 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS', que en SQLite ordena igual que la fecha.
+# Las consultas las devuelven como texto con {fecha:...} y {hora:...} (ver sentencias.py).
+def _fecha_iso(valor):
+    """'YYYY-MM-DD' de una fecha (date, datetime o texto ISO). None o '' -> None; ValueError si no es válida."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if not isinstance(valor, date):
+        valor = date.fromisoformat(str(valor).strip()[:10])
+    return valor.isoformat()
+
+def _momento_iso(valor):
+    """'YYYY-MM-DD HH:MM:SS' de un datetime, un date (a las 00:00) o un texto ISO. ValueError si no es válido."""
+    if not isinstance(valor, datetime):
+        valor = datetime.fromisoformat(valor.isoformat() if isinstance(valor, date) else str(valor).strip())
+    return valor.strftime('%Y-%m-%d %H:%M:%S')
+
+def _fecha_hora_turno(fecha, hora):
+    """
+    fecha_hora de un turno a partir de la fecha y la hora del formulario ('YYYY-MM-DD', 'HH:MM').
+    ValueError si no es válida o si está tan cerca del año 1 o del 9999 que el turno (y el rango
+    en que se buscan superposiciones) no entra en el calendario.
+    """
+    fecha_hora = datetime.fromisoformat(_momento_iso(f'{_fecha_iso(fecha)} {str(hora).strip()}'))
+    if not datetime.min + agenda.DURACION_MAXIMA <= fecha_hora <= datetime.max - agenda.DURACION_MAXIMA:
+        raise ValueError(f'{fecha} {hora}')
+    return _momento_iso(fecha_hora)
+
+
+# --- Agenda: superposiciones y horarios libres ---
+# Cada turno ocupa a su mecánico durante [fecha_hora, fin) (ver agenda.py). Los que pueden
+# superponerse con [inicio, fin) empiezan en (inicio - agenda.DURACION_MAXIMA, fin): un
+# recorrido por rango de idx_turnos_mecanico_agenda (mecanico_id, fecha_hora).
+
+# Serializa las altas y cambios de turnos de un mismo mecánico entre la verificación y la
+# escritura. En SQLite el UPDATE sin efecto abre la transacción de escritura (hay un solo
+# escritor a la vez); en PostgreSQL se bloquea la fila del mecánico.
+_SQL_BLOQUEAR_AGENDA_MECANICO = sentencias.registrar('bloquear_agenda_mecanico',
+    sqlite='UPDATE mecanicos SET version = version WHERE id = {p}',
+    postgresql='SELECT id FROM mecanicos WHERE id = {p} FOR UPDATE')
+
+_SQL_TURNOS_SUPERPUESTOS = sentencias.registrar('turnos_superpuestos', '''
+    SELECT t.id, {fecha:t.fecha_hora} AS fecha, {hora:t.fecha_hora} AS hora, {hora:t.fin} AS hora_fin,
+           t.tipo_trabajo, c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, v.patente
+    FROM turnos t
+    JOIN clientes c ON t.cliente_id = c.id
+    JOIN vehiculos v ON t.vehiculo_id = v.id
+    WHERE t.mecanico_id = {p} AND t.fecha_hora > {p} AND t.fecha_hora < {p} AND t.fin > {p}
+      AND t.estado IN {estados_ocupa} AND t.id <> {p}
+    ORDER BY t.fecha_hora, t.id
+''', preparar=True)
+
+_SQL_OCUPACION_MECANICO = sentencias.registrar('ocupacion_mecanico', '''
+    SELECT fecha_hora, fin
+    FROM turnos
+    WHERE mecanico_id = {p} AND fecha_hora > {p} AND fecha_hora < {p}
+      AND estado IN {estados_ocupa} AND id <> {p}
+    ORDER BY fecha_hora
+''', preparar=True)
+
+def _a_datetime(valor):
+    return valor if isinstance(valor, datetime) else datetime.fromisoformat(valor)
+
+def _fin_turno(fecha_hora, tipo_trabajo):
+    return _momento_iso(_a_datetime(fecha_hora) + agenda.duracion(tipo_trabajo))
+
+def _turnos_superpuestos(cursor, mecanico_id, inicio, fin, excluir_turno_id=None):
+    """Turnos del mecánico que se superponen con [inicio, fin) (textos ISO), sin contar excluir_turno_id."""
+    desde = _momento_iso(_a_datetime(inicio) - agenda.DURACION_MAXIMA)
+    _SQL_TURNOS_SUPERPUESTOS.ejecutar(cursor, (mecanico_id, desde, fin, inicio, excluir_turno_id or 0))
+    return mapeo_filas.todos(cursor)
+
+def obtener_conflictos_turno(mecanico_id, fecha, hora, tipo_trabajo=None, excluir_turno_id=None):
+    """
+    Turnos del mecánico que se superponen con un turno del tipo dado en esa fecha y hora
+    (lista vacía si el horario está libre). excluir_turno_id deja afuera al turno que se modifica.
+    """
+    try:
+        inicio = _fecha_hora_turno(fecha, hora)
+    except (TypeError, ValueError):
+        log.error("Fecha u hora de turno inválida: %s %s", fecha, hora)
+        return []
+    conn = obtener_conexion()
+    conflictos = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            conflictos = _turnos_superpuestos(cursor, mecanico_id, inicio, _fin_turno(inicio, tipo_trabajo),
+                                              excluir_turno_id)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al buscar turnos superpuestos del mecánico %s: %s", mecanico_id, e)
+        finally:
+            if conn: conn.close()
+    return conflictos
+
+def obtener_proximo_horario_libre(mecanico_id, desde=None, tipo_trabajo=None, excluir_turno_id=None):
+    """
+    Primer horario de atención libre del mecánico a partir de `desde` (datetime o texto ISO; por
+    defecto, ahora) para un turno del tipo dado. Devuelve {'fecha', 'hora', 'hora_fin'} o None si
+    no hay lugar dentro de agenda.HORIZONTE. Lee los turnos del mecánico en orden por el índice y
+    deja de leer en el primer hueco.
+    """
+    try:
+        desde = datetime.now() if desde is None else _a_datetime(_momento_iso(desde))
+        ocupados_desde, hasta = desde - agenda.DURACION_MAXIMA, desde + agenda.HORIZONTE
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: fecha válida pero tan cerca del año 1 o del 9999 que el rango no entra.
+        log.error("Fecha inválida para buscar un horario libre: %s", desde)
+        return None
+    largo = agenda.duracion(tipo_trabajo)
+    conn = obtener_conexion()
+    libre = None
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_OCUPACION_MECANICO.ejecutar(cursor, (mecanico_id, _momento_iso(ocupados_desde),
+                                                      _momento_iso(hasta), excluir_turno_id or 0))
+            ocupados = ((_a_datetime(inicio), _a_datetime(fin)) for inicio, fin in cursor)
+            inicio = agenda.primer_horario_libre(ocupados, desde, largo, hasta)
+            if inicio is not None:
+                libre = {'fecha': inicio.strftime('%Y-%m-%d'), 'hora': inicio.strftime('%H:%M'),
+                         'hora_fin': (inicio + largo).strftime('%H:%M')}
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al buscar un horario libre del mecánico %s: %s", mecanico_id, e)
+        finally:
+            if conn: conn.close()
+    return libre
+
+
 # --- Funciones de Gestión de Turnos ---
-def agregar_turno(cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado):
+_SQL_INSERTAR_TURNO = sentencias.registrar('insertar_turno', '''
+    INSERT INTO turnos (cliente_id, vehiculo_id, mecanico_id, fecha_hora, fin, tipo_trabajo, problema_reportado, estado)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {p}, {p}){retornar_id}
+''')
+
+def agregar_turno(cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado,
+                  tipo_trabajo=agenda.TIPO_POR_DEFECTO):
+    """
+    Agenda un turno y devuelve su id. Devuelve False si falla o si el mecánico ya tiene otro
+    turno que se superpone (obtener_conflictos_turno dice cuál).
+    """
+    try:
+        fecha_hora = _fecha_hora_turno(fecha, hora)
+    except (TypeError, ValueError):
+        log.error("Fecha u hora de turno inválida: %s %s", fecha, hora)
+        return False
+    tipo_trabajo = agenda.tipo_valido(tipo_trabajo)
+    fin = _fin_turno(fecha_hora, tipo_trabajo)
+    mecanico_id = mecanico_id or None  # El formulario manda '' para "sin asignar".
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
             is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
-            query = f'''
-                INSERT INTO turnos (cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, estado)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query, (cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, 'Agendado'))
+            if mecanico_id is not None:
+                _SQL_BLOQUEAR_AGENDA_MECANICO.ejecutar(cursor, (mecanico_id,))
+                superpuestos = _turnos_superpuestos(cursor, mecanico_id, fecha_hora, fin)
+                if superpuestos:
+                    log.warning("Turno rechazado: el mecánico %s ya tiene el turno %s a esa hora.",
+                                mecanico_id, superpuestos[0]['id'])
+                    conn.rollback()
+                    return False
+
+            _SQL_INSERTAR_TURNO.ejecutar(cursor, (cliente_id, vehiculo_id, mecanico_id, fecha_hora, fin, tipo_trabajo,
+                                                  problema_reportado, 'Agendado'))
             
             if is_postgresql:
                 turno_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
@@ -804,98 +1508,318 @@ def agregar_turno(cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_re
             conn.commit()
             return turno_id # Devolver el ID del turno
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al agregar turno: {e}")
+            log.error("Error al agregar turno: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_TODOS_LOS_TURNOS = sentencias.registrar('todos_los_turnos', '''
+    SELECT t.id, {fecha:t.fecha_hora} AS fecha, {hora:t.fecha_hora} AS hora, t.problema_reportado, t.estado,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente,
+           v.patente, v.marca, v.modelo,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico
+    FROM turnos t
+    JOIN clientes c ON t.cliente_id = c.id
+    JOIN vehiculos v ON t.vehiculo_id = v.id
+    LEFT JOIN mecanicos m ON t.mecanico_id = m.id
+    WHERE t.estado IN {estados_turno}
+    ORDER BY t.fecha_hora DESC
+''')
+
 def obtener_todos_los_turnos():
     conn = obtener_conexion()
     turnos = []
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT t.id, t.fecha, t.hora, t.problema_reportado, t.estado,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente,
-                       v.patente, v.marca, v.modelo,
-                       m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico
-                FROM turnos t
-                JOIN clientes c ON t.cliente_id = c.id
-                JOIN vehiculos v ON t.vehiculo_id = v.id
-                LEFT JOIN mecanicos m ON t.mecanico_id = m.id
-                WHERE t.estado IN ('Agendado', 'En Progreso', 'Cancelado')
-                ORDER BY t.fecha DESC, t.hora DESC
-            ''')
-            raw_turnos = cursor.fetchall()
-            turnos = [_map_row_to_dict(cursor, row) for row in raw_turnos]
+            _SQL_TODOS_LOS_TURNOS.ejecutar(cursor)
+            turnos = mapeo_filas.todos(cursor)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener todos los turnos: %s", e)
+        finally:
+            if conn: conn.close()
+    return turnos
+
+def iterar_todos_los_turnos():
+    """
+    Igual que obtener_todos_los_turnos, pero entrega registros Turno (namedtuple) a medida que
+    los lee, sin armar la lista completa. La conexión queda tomada hasta agotar o cerrar el iterador.
+    """
+    conn = obtener_conexion()
+    if conn:
+        try:
+            cursor = _cursor_por_lotes(conn, 'turnos')
+            _SQL_TODOS_LOS_TURNOS.ejecutar(cursor)
+            yield from mapeo_filas.iterar(cursor, 'Turno', lote=LOTE_TRANSMISION)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al recorrer los turnos: %s", e)
+        finally:
+            if conn: conn.close()
+
+def obtener_turnos_paginados(limite=None, despues=None, antes=None):
+    """Página de turnos visibles, del más reciente al más antiguo por (fecha_hora, id). Devuelve una Pagina."""
+    return _pagina_keyset(
+        '''
+        SELECT t.id, t.fecha_hora, {fecha:t.fecha_hora} AS fecha, {hora:t.fecha_hora} AS hora,
+               t.problema_reportado, t.estado,
+               c.nombre AS nombre_cliente, c.apellido AS apellido_cliente,
+               v.patente, v.marca, v.modelo,
+               m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico
+        FROM turnos t
+        JOIN clientes c ON t.cliente_id = c.id
+        JOIN vehiculos v ON t.vehiculo_id = v.id
+        LEFT JOIN mecanicos m ON t.mecanico_id = m.id
+        ''',
+        ('t.fecha_hora', 't.id'), ('fecha_hora', 'id'), descendente=True,
+        filtro='t.estado IN {estados_turno}',
+        limite=limite, despues=despues, antes=antes, contexto="turnos")
+
+_COLUMNAS_TURNOS_EN_RANGO = '''
+    SELECT t.id, t.cliente_id, t.vehiculo_id, t.mecanico_id,
+           {fecha:t.fecha_hora} AS fecha, {hora:t.fecha_hora} AS hora,
+           {fecha:t.fin} AS fecha_fin, {hora:t.fin} AS hora_fin, t.tipo_trabajo, t.problema_reportado, t.estado,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente,
+           v.patente, v.marca, v.modelo,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico
+    FROM turnos t
+    JOIN clientes c ON t.cliente_id = c.id
+    JOIN vehiculos v ON t.vehiculo_id = v.id
+    LEFT JOIN mecanicos m ON t.mecanico_id = m.id
+'''
+# Recorridos por rango de idx_turnos_agenda (fecha_hora, id) e idx_turnos_mecanico_agenda (mecanico_id, fecha_hora).
+_SQL_TURNOS_EN_RANGO = sentencias.registrar('turnos_en_rango', _COLUMNAS_TURNOS_EN_RANGO + '''
+    WHERE t.fecha_hora >= {p} AND t.fecha_hora < {p}
+    ORDER BY t.fecha_hora, t.id
+''', preparar=True)
+_SQL_TURNOS_EN_RANGO_MECANICO = sentencias.registrar('turnos_en_rango_mecanico', _COLUMNAS_TURNOS_EN_RANGO + '''
+    WHERE t.mecanico_id = {p} AND t.fecha_hora >= {p} AND t.fecha_hora < {p}
+    ORDER BY t.fecha_hora, t.id
+''', preparar=True)
+
+def obtener_turnos_en_rango(desde, hasta, mecanico_id=None):
+    """
+    Turnos (de cualquier estado) con fecha_hora en [desde, hasta), en orden cronológico; si se pasa
+    mecanico_id, sólo los de ese mecánico. desde y hasta son date, datetime o texto ISO
+    ('2025-03-10' equivale a las 00:00 de ese día), así que un día o una semana de agenda es
+    obtener_turnos_en_rango(lunes, lunes + timedelta(days=7)).
+    """
+    try:
+        desde, hasta = _momento_iso(desde), _momento_iso(hasta)
+    except (TypeError, ValueError):
+        log.error("Rango de fechas inválido: %s - %s", desde, hasta)
+        return []
+    conn = obtener_conexion()
+    turnos = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            if mecanico_id is None:
+                _SQL_TURNOS_EN_RANGO.ejecutar(cursor, (desde, hasta))
+            else:
+                _SQL_TURNOS_EN_RANGO_MECANICO.ejecutar(cursor, (mecanico_id, desde, hasta))
+            turnos = mapeo_filas.todos(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener todos los turnos: {e}")
+            log.error("Error al obtener los turnos entre %s y %s: %s", desde, hasta, e)
         finally:
             if conn: conn.close()
     return turnos
 
+_SQL_TURNO_POR_ID = sentencias.registrar('turno_por_id', '''
+    SELECT t.id, t.cliente_id, t.vehiculo_id, t.mecanico_id, {fecha:t.fecha_hora} AS fecha, {hora:t.fecha_hora} AS hora,
+           {hora:t.fin} AS hora_fin, t.tipo_trabajo, t.problema_reportado, t.estado,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.dni, c.telefono, c.email,
+           v.patente, v.marca AS marca_vehiculo, v.modelo AS modelo_vehiculo, v.anio AS anio_vehiculo,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico
+    FROM turnos t
+    JOIN clientes c ON t.cliente_id = c.id
+    JOIN vehiculos v ON t.vehiculo_id = v.id
+    LEFT JOIN mecanicos m ON t.mecanico_id = m.id
+    WHERE t.id = {p}
+''', preparar=True)
+
 def obtener_turno_por_id(turno_id):
     conn = obtener_conexion()
     turno = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT t.id, t.cliente_id, t.vehiculo_id, t.mecanico_id, t.fecha, t.hora, t.problema_reportado, t.estado,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.dni, c.telefono, c.email,
-                       v.patente, v.marca AS marca_vehiculo, v.modelo AS modelo_vehiculo, v.anio AS anio_vehiculo,
-                       m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico
-                FROM turnos t
-                JOIN clientes c ON t.cliente_id = c.id
-                JOIN vehiculos v ON t.vehiculo_id = v.id
-                LEFT JOIN mecanicos m ON t.mecanico_id = m.id
-                WHERE t.id = {placeholder}
-            ''', (turno_id,))
-            raw_turno = cursor.fetchone()
-            if raw_turno:
-                turno = _map_row_to_dict(cursor, raw_turno)
+            _SQL_TURNO_POR_ID.ejecutar(cursor, (turno_id,))
+            turno = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener turno por ID {turno_id}: {e}")
+            log.error("Error al obtener turno por ID %s: %s", turno_id, e)
         finally:
             if conn: conn.close()
     return turno
 
-def actualizar_turno(turno_id, cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, estado):
+_SQL_ACTUALIZAR_TURNO = sentencias.registrar('actualizar_turno', '''
+    UPDATE turnos
+    SET cliente_id = {p}, vehiculo_id = {p}, mecanico_id = {p}, fecha_hora = {p}, fin = {p}, tipo_trabajo = {p},
+        problema_reportado = {p}, estado = {p}
+    WHERE id = {p}
+''')
+_SQL_TIPO_TRABAJO_TURNO = sentencias.registrar('tipo_trabajo_turno',
+    'SELECT tipo_trabajo FROM turnos WHERE id = {p}', preparar=True)
+
+def actualizar_turno(turno_id, cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, estado,
+                     tipo_trabajo=None):
+    """
+    Modifica un turno; tipo_trabajo=None conserva el que tenía. Devuelve False si falla o si, en
+    un estado que ocupa al mecánico, se superpone con otro de sus turnos.
+    """
+    try:
+        fecha_hora = _fecha_hora_turno(fecha, hora)
+    except (TypeError, ValueError):
+        log.error("Fecha u hora de turno inválida: %s %s", fecha, hora)
+        return False
+    mecanico_id = mecanico_id or None
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                UPDATE turnos
-                SET cliente_id = {placeholder}, vehiculo_id = {placeholder}, mecanico_id = {placeholder}, fecha = {placeholder}, hora = {placeholder}, problema_reportado = {placeholder}, estado = {placeholder}
-                WHERE id = {placeholder}
-            ''', (cliente_id, vehiculo_id, mecanico_id, fecha, hora, problema_reportado, estado, turno_id))
+            if tipo_trabajo is None:
+                _SQL_TIPO_TRABAJO_TURNO.ejecutar(cursor, (turno_id,))
+                fila = cursor.fetchone()
+                tipo_trabajo = fila[0] if fila else None
+            tipo_trabajo = agenda.tipo_valido(tipo_trabajo)
+            fin = _fin_turno(fecha_hora, tipo_trabajo)
+            if mecanico_id is not None and estado in agenda.ESTADOS_OCUPAN:
+                _SQL_BLOQUEAR_AGENDA_MECANICO.ejecutar(cursor, (mecanico_id,))
+                superpuestos = _turnos_superpuestos(cursor, mecanico_id, fecha_hora, fin, turno_id)
+                if superpuestos:
+                    log.warning("Cambio del turno %s rechazado: se superpone con el turno %s del mecánico %s.",
+                                turno_id, superpuestos[0]['id'], mecanico_id)
+                    conn.rollback()
+                    return False
+            _SQL_ACTUALIZAR_TURNO.ejecutar(cursor, (cliente_id, vehiculo_id, mecanico_id, fecha_hora, fin, tipo_trabajo,
+                                                    problema_reportado, estado, turno_id))
             conn.commit()
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al actualizar turno: {e}")
+            log.error("Error al actualizar turno: %s", e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_ELIMINAR_TURNO = sentencias.registrar('eliminar_turno', 'DELETE FROM turnos WHERE id = {p}')
+
 def eliminar_turno(turno_id):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'DELETE FROM turnos WHERE id = {placeholder}', (turno_id,))
+            _SQL_ELIMINAR_TURNO.ejecutar(cursor, (turno_id,))
             conn.commit()
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al eliminar turno: {e}")
+            log.error("Error al eliminar turno: %s", e)
+            conn.rollback()
+            return False
+        finally:
+            if conn: conn.close()
+    return False
+
+
+# --- Resumen diario de reparaciones (tablero) ---
+# resumen_reparaciones_diario (migración 7) tiene una fila por día de ingreso, mecánico y estado.
+# Cada escritura sobre reparaciones vuelve a calcular, en su misma transacción, los días que
+# tocó: se recalcula el día entero desde reparaciones (idx_reparaciones_ingreso) en lugar de
+# sumar y restar diferencias, así un cambio de estado o de costo no puede dejarlo desfasado.
+# Las bajas en cascada (cliente, vehículo) y el SET NULL de un mecánico eliminado toman antes
+# los días afectados. refrescar_resumen_reparaciones() recalcula un período completo.
+_DIAS_EN_TALLER = {
+    sentencias.SQLITE: 'CAST(julianday(fecha_salida) - julianday(fecha_ingreso) AS INTEGER)',
+    sentencias.POSTGRESQL: '(fecha_salida - fecha_ingreso)',
+}
+
+def _plantillas_resumen(filtro):
+    return {dialecto: f'''
+        INSERT INTO resumen_reparaciones_diario (dia, mecanico_id, estado, cantidad, finalizadas, dias_en_taller, facturado)
+        SELECT fecha_ingreso, COALESCE(mecanico_id, 0), estado, COUNT(*), COUNT(fecha_salida),
+               COALESCE(SUM({dias}), 0), COALESCE(SUM(costo_total), 0)
+        FROM reparaciones
+        WHERE {filtro}
+        GROUP BY fecha_ingreso, COALESCE(mecanico_id, 0), estado
+    ''' for dialecto, dias in _DIAS_EN_TALLER.items()}
+
+_SQL_BORRAR_RESUMEN_DIA = sentencias.registrar('borrar_resumen_dia',
+    'DELETE FROM resumen_reparaciones_diario WHERE dia = {p}')
+_SQL_CALCULAR_RESUMEN_DIA = sentencias.registrar('calcular_resumen_dia', **_plantillas_resumen('fecha_ingreso = {p}'))
+_SQL_BORRAR_RESUMEN_RANGO = sentencias.registrar('borrar_resumen_rango',
+    'DELETE FROM resumen_reparaciones_diario WHERE dia >= {p} AND dia < {p}')
+_SQL_CALCULAR_RESUMEN_RANGO = sentencias.registrar('calcular_resumen_rango',
+    **_plantillas_resumen('fecha_ingreso >= {p} AND fecha_ingreso < {p}'))
+_SQL_DIAS_REPARACIONES_CLIENTE = sentencias.registrar('dias_reparaciones_cliente', '''
+    SELECT DISTINCT {fecha:r.fecha_ingreso} FROM reparaciones r
+    JOIN vehiculos v ON r.vehiculo_id = v.id
+    WHERE v.cliente_id = {p}
+''')
+_SQL_DIAS_REPARACIONES_VEHICULO = sentencias.registrar('dias_reparaciones_vehiculo',
+    'SELECT DISTINCT {fecha:fecha_ingreso} FROM reparaciones WHERE vehiculo_id = {p}')
+_SQL_DIAS_REPARACIONES_MECANICO = sentencias.registrar('dias_reparaciones_mecanico',
+    'SELECT DISTINCT {fecha:fecha_ingreso} FROM reparaciones WHERE mecanico_id = {p}')
+_SQL_RESUMEN_REPARACIONES = sentencias.registrar('resumen_reparaciones', '''
+    SELECT {fecha:dia} AS dia, mecanico_id, estado, cantidad, finalizadas, dias_en_taller, facturado
+    FROM resumen_reparaciones_diario
+    WHERE dia >= {p} AND dia < {p}
+    ORDER BY resumen_reparaciones_diario.dia
+''')
+
+def _dias_de_reparaciones(cursor, sentencia, parametros):
+    """Días de ingreso ('YYYY-MM-DD') de las reparaciones que selecciona `sentencia`."""
+    sentencia.ejecutar(cursor, parametros)
+    return [fila[0] for fila in cursor.fetchall()]
+
+def _recalcular_resumen(cursor, dias):
+    """Vuelve a calcular el resumen de cada uno de `dias` dentro de la transacción en curso."""
+    for dia in sorted(set(dias)):
+        _SQL_BORRAR_RESUMEN_DIA.ejecutar(cursor, (dia,))
+        _SQL_CALCULAR_RESUMEN_DIA.ejecutar(cursor, (dia,))
+
+def _limites_resumen(desde, hasta):
+    # Sin uno de los límites, el período queda abierto (como en transmitir_exportacion).
+    return _fecha_iso(desde or date(1900, 1, 1)), _fecha_iso(hasta or date.max)
+
+def obtener_resumen_reparaciones(desde, hasta):
+    """
+    Filas del resumen diario entre desde y hasta (hasta excluido): dicts con dia ('YYYY-MM-DD'),
+    mecanico_id (0 = sin mecánico), estado, cantidad, finalizadas, dias_en_taller y facturado.
+    Cuesta O(días del período), no O(reparaciones). ValueError si una fecha no es válida.
+    """
+    limites = _limites_resumen(desde, hasta)
+    conn = obtener_conexion()
+    filas = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_RESUMEN_REPARACIONES.ejecutar(cursor, limites)
+            filas = mapeo_filas.todos(cursor)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener el resumen de reparaciones: %s", e)
+        finally:
+            if conn: conn.close()
+    return filas
+
+def refrescar_resumen_reparaciones(desde=None, hasta=None):
+    """
+    Recalcula el resumen diario del período (todo el historial si no se indica) desde
+    reparaciones. Es la tarea periódica de reportes.py: corrige lo que se haya cambiado por
+    fuera de este módulo. Devuelve True si se confirmó; ValueError si una fecha no es válida.
+    """
+    limites = _limites_resumen(desde, hasta)
+    conn = obtener_conexion()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_BORRAR_RESUMEN_RANGO.ejecutar(cursor, limites)
+            _SQL_CALCULAR_RESUMEN_RANGO.ejecutar(cursor, limites)
+            conn.commit()
+            return True
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al refrescar el resumen de reparaciones: %s", e)
             conn.rollback()
             return False
         finally:
@@ -904,175 +1828,314 @@ def eliminar_turno(turno_id):
 
 
 # --- Funciones de Gestión de Reparaciones ---
+_SQL_INSERTAR_REPARACION = sentencias.registrar('insertar_reparacion', '''
+    INSERT INTO reparaciones (vehiculo_id, mecanico_id, fecha_ingreso, kilometraje_ingreso, problema_reportado, estado, turno_origen_id, actualizado_en)
+    VALUES ({p}, {p}, {p}, {p}, {p}, {p}, {p}, {ahora}){retornar_id}
+''')
+
 def agregar_reparacion(vehiculo_id, mecanico_id, fecha_ingreso, kilometraje_ingreso, problema_reportado, turno_origen_id=None):
+    try:
+        fecha_ingreso = _fecha_iso(fecha_ingreso)
+    except (TypeError, ValueError):
+        log.error("Fecha de ingreso inválida: %s", fecha_ingreso)
+        return None
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
             is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
-            query = f'''
-                INSERT INTO reparaciones (vehiculo_id, mecanico_id, fecha_ingreso, kilometraje_ingreso, problema_reportado, estado, turno_origen_id)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                query += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(query, (vehiculo_id, mecanico_id, fecha_ingreso, kilometraje_ingreso, problema_reportado, 'En Progreso', turno_origen_id))
+            _SQL_INSERTAR_REPARACION.ejecutar(cursor, (vehiculo_id, mecanico_id, fecha_ingreso, kilometraje_ingreso, problema_reportado, 'En Progreso', turno_origen_id))
             
             if is_postgresql:
                 reparacion_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
             else:
                 reparacion_id = cursor.lastrowid # Para SQLite
 
+            _registrar_evento_reparacion(conn, cursor, reparacion_id, vehiculo_id, 'En Progreso')
+            _recalcular_resumen(cursor, [fecha_ingreso])
             conn.commit()
+            _notificar_cambio_reparacion()
             return reparacion_id
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
             if "duplicate entry" in str(e).lower() or "unique constraint" in str(e).lower(): # Adaptado para PostgreSQL
-                print(f"Advertencia: Ya existe una reparación para el turno de origen {turno_origen_id}.")
+                log.warning("Ya existe una reparación para el turno de origen %s.", turno_origen_id)
             else:
-                print(f"Error de integridad al agregar reparación: {e}")
+                log.error("Error de integridad al agregar reparación: %s", e)
             conn.rollback()
             return None
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al agregar reparación: {e}")
+            log.error("Error al agregar reparación: %s", e)
             conn.rollback()
             return None
         finally:
             if conn: conn.close()
     return None
 
+_SQL_HISTORIAL_VEHICULO = sentencias.registrar('historial_reparaciones_vehiculo', '''
+    SELECT r.id, {fecha:r.fecha_ingreso} AS fecha_ingreso, {fecha:r.fecha_salida} AS fecha_salida,
+           r.kilometraje_ingreso, r.kilometraje_salida,
+           r.problema_reportado, r.trabajos_realizados, r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.id AS cliente_id, v.marca, v.modelo, v.anio, v.patente,
+           r.turno_origen_id
+    FROM reparaciones r
+    LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+    JOIN vehiculos v ON r.vehiculo_id = v.id
+    JOIN clientes c ON v.cliente_id = c.id
+    WHERE r.vehiculo_id = {p}
+    ORDER BY r.fecha_ingreso DESC, r.id DESC
+''', preparar=True)
+
 def obtener_historial_reparaciones_vehiculo(vehiculo_id):
     conn = obtener_conexion()
     historial = []
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT r.id, r.fecha_ingreso, r.fecha_salida, r.kilometraje_ingreso, r.kilometraje_salida,
-                       r.problema_reportado, r.trabajos_realizados, r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado,
-                       m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.id AS cliente_id, v.marca, v.modelo, v.anio, v.patente,
-                       r.turno_origen_id
-                FROM reparaciones r
-                LEFT JOIN mecanicos m ON r.mecanico_id = m.id
-                JOIN vehiculos v ON r.vehiculo_id = v.id
-                JOIN clientes c ON v.cliente_id = c.id
-                WHERE r.vehiculo_id = {placeholder}
-                ORDER BY r.fecha_ingreso DESC, r.id DESC
-            ''', (vehiculo_id,))
-            raw_historial = cursor.fetchall()
-            historial = [_map_row_to_dict(cursor, row) for row in raw_historial]
+            _SQL_HISTORIAL_VEHICULO.ejecutar(cursor, (vehiculo_id,))
+            historial = mapeo_filas.todos(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener historial de reparaciones para vehículo {vehiculo_id}: {e}")
+            log.error("Error al obtener historial de reparaciones para vehículo %s: %s", vehiculo_id, e)
         finally:
             if conn: conn.close()
     return historial
 
+def iterar_historial_reparaciones_vehiculo(vehiculo_id):
+    """Historial del vehículo como registros Reparacion (namedtuple), entregados a medida que se leen."""
+    conn = obtener_conexion()
+    if conn:
+        try:
+            cursor = _cursor_por_lotes(conn, 'historial')
+            _SQL_HISTORIAL_VEHICULO.ejecutar(cursor, (vehiculo_id,))
+            yield from mapeo_filas.iterar(cursor, 'Reparacion', lote=LOTE_TRANSMISION)
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al recorrer el historial de reparaciones del vehículo %s: %s", vehiculo_id, e)
+        finally:
+            if conn: conn.close()
+
+def transmitir_historial_reparaciones_vehiculo(vehiculo_id):
+    """
+    Historial del vehículo como diccionarios, para escribirlo en la respuesta a medida que se lee
+    (ver _transmitir: conexión propia y errores propagados).
+    """
+    return _transmitir(_SQL_HISTORIAL_VEHICULO, (vehiculo_id,),
+                       f'el historial de reparaciones del vehículo {vehiculo_id}')
+
+_SQL_REPARACION_POR_ID = sentencias.registrar('reparacion_por_id', '''
+    SELECT r.id, r.vehiculo_id, r.mecanico_id, {fecha:r.fecha_ingreso} AS fecha_ingreso,
+           {fecha:r.fecha_salida} AS fecha_salida, r.kilometraje_ingreso, r.kilometraje_salida,
+           r.problema_reportado, r.trabajos_realizados, r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado, r.turno_origen_id,
+           v.patente, v.marca, v.modelo, v.anio, v.cliente_id,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.dni AS dni_cliente
+    FROM reparaciones r
+    JOIN vehiculos v ON r.vehiculo_id = v.id
+    JOIN clientes c ON v.cliente_id = c.id
+    LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+    WHERE r.id = {p}
+''', preparar=True)
+
 def obtener_reparacion_por_id(reparacion_id):
     conn = obtener_conexion()
     reparacion = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT r.id, r.vehiculo_id, r.mecanico_id, r.fecha_ingreso, r.fecha_salida, r.kilometraje_ingreso, r.kilometraje_salida,
-                       r.problema_reportado, r.trabajos_realizados, r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado, r.turno_origen_id,
-                       v.patente, v.marca, v.modelo, v.anio, v.cliente_id,
-                       m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente, c.dni AS dni_cliente
-                FROM reparaciones r
-                JOIN vehiculos v ON r.vehiculo_id = v.id
-                JOIN clientes c ON v.cliente_id = c.id
-                LEFT JOIN mecanicos m ON r.mecanico_id = m.id
-                WHERE r.id = {placeholder}
-            ''', (reparacion_id,))
-            raw_reparacion = cursor.fetchone()
-            if raw_reparacion:
-                reparacion = _map_row_to_dict(cursor, raw_reparacion)
+            _SQL_REPARACION_POR_ID.ejecutar(cursor, (reparacion_id,))
+            reparacion = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener reparación por ID {reparacion_id}: {e}")
+            log.error("Error al obtener reparación por ID %s: %s", reparacion_id, e)
         finally:
             if conn: conn.close()
     return reparacion
 
+def _valor_cambiado(nuevo, anterior):
+    """None significa "no se modifica". Los importes llegan como texto desde los formularios."""
+    if nuevo is None:
+        return False
+    try:
+        return float(nuevo) != float(anterior if anterior is not None else 'nan')
+    except (TypeError, ValueError):
+        return str(nuevo) != str(anterior)
+
+_SQL_ESTADO_ANTERIOR_REPARACION = sentencias.registrar('estado_anterior_reparacion',
+    'SELECT vehiculo_id, estado, costo_mano_obra, costo_total, {fecha:fecha_ingreso} FROM reparaciones WHERE id = {p}')
+# Una sola forma para cualquier combinación de campos: None deja el valor actual (COALESCE).
+_SQL_ACTUALIZAR_ESTADO_REPARACION = sentencias.registrar('actualizar_estado_reparacion', '''
+    UPDATE reparaciones
+    SET estado = {p}, {sello},
+        trabajos_realizados = COALESCE({p}, trabajos_realizados),
+        repuestos_usados = COALESCE({p}, repuestos_usados),
+        costo_mano_obra = COALESCE({p}, costo_mano_obra),
+        costo_total = COALESCE({p}, costo_total),
+        fecha_salida = COALESCE({p}, fecha_salida),
+        kilometraje_salida = COALESCE({p}, kilometraje_salida)
+    WHERE id = {p}
+''')
+
 def actualizar_estado_reparacion(reparacion_id, estado, trabajos_realizados=None, repuestos_usados=None, costo_mano_obra=None, costo_total=None, fecha_salida=None, kilometraje_salida=None):
+    try:
+        fecha_salida = _fecha_iso(fecha_salida)
+    except (TypeError, ValueError):
+        log.error("Fecha de salida inválida para la reparación %s: %s", reparacion_id, fecha_salida)
+        return False
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-
-            update_query = f'''
-                UPDATE reparaciones
-                SET estado = {placeholder}
-            '''
-            params = [estado]
-
-            if trabajos_realizados is not None:
-                update_query += f', trabajos_realizados = {placeholder}'
-                params.append(trabajos_realizados)
-            if repuestos_usados is not None:
-                update_query += f', repuestos_usados = {placeholder}'
-                params.append(repuestos_usados)
-            if costo_mano_obra is not None:
-                update_query += f', costo_mano_obra = {placeholder}'
-                params.append(costo_mano_obra)
-            if costo_total is not None:
-                update_query += f', costo_total = {placeholder}'
-                params.append(costo_total)
-            if fecha_salida is not None:
-                update_query += f', fecha_salida = {placeholder}'
-                params.append(fecha_salida)
-            if kilometraje_salida is not None:
-                update_query += f', kilometraje_salida = {placeholder}'
-                params.append(kilometraje_salida)
-
-            update_query += f' WHERE id = {placeholder}'
-            params.append(reparacion_id)
-
-            cursor.execute(update_query, tuple(params))
+            _SQL_ESTADO_ANTERIOR_REPARACION.ejecutar(cursor, (reparacion_id,))
+            anterior = cursor.fetchone()
+            _SQL_ACTUALIZAR_ESTADO_REPARACION.ejecutar(cursor, (
+                estado, trabajos_realizados, repuestos_usados, costo_mano_obra, costo_total,
+                fecha_salida, kilometraje_salida, reparacion_id))
+            # Sólo los cambios que ve el cliente (estado y costos) generan una notificación.
+            notificar = anterior is not None and (
+                estado != anterior[1]
+                or _valor_cambiado(costo_mano_obra, anterior[2])
+                or _valor_cambiado(costo_total, anterior[3])
+            )
+            if notificar:
+                _registrar_evento_reparacion(conn, cursor, reparacion_id, anterior[0], estado)
+            if anterior is not None:
+                _recalcular_resumen(cursor, [anterior[4]])
             conn.commit()
+            if notificar:
+                _notificar_cambio_reparacion()
             return True
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al actualizar estado de reparación {reparacion_id}: {e}")
+            log.error("Error al actualizar estado de reparación %s: %s", reparacion_id, e)
             conn.rollback()
             return False
         finally:
             if conn: conn.close()
     return False
 
+_SQL_REPARACION_ACTIVA_POR_VEHICULO = sentencias.registrar('reparacion_activa_por_vehiculo', '''
+    SELECT r.id, r.vehiculo_id, r.mecanico_id, {fecha:r.fecha_ingreso} AS fecha_ingreso, r.kilometraje_ingreso,
+           r.problema_reportado, r.trabajos_realizados, r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
+           v.patente, v.marca, v.modelo
+    FROM reparaciones r
+    LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+    JOIN vehiculos v ON r.vehiculo_id = v.id
+    WHERE r.vehiculo_id = {p} AND r.estado IN {estados_activa}
+    ORDER BY r.fecha_ingreso DESC
+    LIMIT 1
+''', preparar=True)
+
 def obtener_reparacion_activa_por_vehiculo(vehiculo_id):
     conn = obtener_conexion()
     reparacion_activa = None
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
-            cursor.execute(f'''
-                SELECT r.id, r.vehiculo_id, r.mecanico_id, r.fecha_ingreso, r.kilometraje_ingreso,
-                       r.problema_reportado, r.trabajos_realizados, r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado,
-                       m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
-                       v.patente, v.marca, v.modelo
-                FROM reparaciones r
-                LEFT JOIN mecanicos m ON r.mecanico_id = m.id
-                JOIN vehiculos v ON r.vehiculo_id = v.id
-                WHERE r.vehiculo_id = {placeholder} AND r.estado IN ('En Progreso', 'Pendiente', 'En Espera de Piezas')
-                ORDER BY r.fecha_ingreso DESC
-                LIMIT 1
-            ''', (vehiculo_id,))
-            raw_reparacion = cursor.fetchone()
-            if raw_reparacion:
-                reparacion_activa = _map_row_to_dict(cursor, raw_reparacion)
+            _SQL_REPARACION_ACTIVA_POR_VEHICULO.ejecutar(cursor, (vehiculo_id,))
+            reparacion_activa = mapeo_filas.uno(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener reparación activa para vehículo {vehiculo_id}: {e}")
+            log.error("Error al obtener reparación activa para vehículo %s: %s", vehiculo_id, e)
         finally:
             if conn: conn.close()
     return reparacion_activa
 
+# Tope del historial que devuelve obtener_estado_vehiculos_cliente por vehículo.
+HISTORIAL_RECIENTE_MAXIMO = 20
+
+# orden numera todas las reparaciones de cada vehículo de la más reciente a la más antigua;
+# orden_en_grupo lo hace por separado entre activas y no activas, para tomar la activa más
+# reciente aunque no esté entre las últimas historial_max.
+_ES_ACTIVA = 'CASE WHEN r.estado IN {estados_activa} THEN 1 ELSE 0 END'
+_SQL_ESTADO_VEHICULOS_CLIENTE = sentencias.registrar('estado_vehiculos_cliente', f'''
+    SELECT * FROM (
+        SELECT v.id AS vehiculo_id, v.cliente_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
+               r.id AS reparacion_id, r.mecanico_id,
+               {{fecha:r.fecha_ingreso}} AS fecha_ingreso, {{fecha:r.fecha_salida}} AS fecha_salida,
+               r.kilometraje_ingreso, r.kilometraje_salida, r.problema_reportado, r.trabajos_realizados,
+               r.repuestos_usados, r.costo_mano_obra, r.costo_total, r.estado, r.turno_origen_id,
+               m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
+               {_ES_ACTIVA} AS es_activa,
+               ROW_NUMBER() OVER (PARTITION BY v.id
+                                  ORDER BY r.fecha_ingreso DESC, r.id DESC) AS orden,
+               ROW_NUMBER() OVER (PARTITION BY v.id, {_ES_ACTIVA}
+                                  ORDER BY r.fecha_ingreso DESC, r.id DESC) AS orden_en_grupo
+        FROM vehiculos v
+        LEFT JOIN reparaciones r ON r.vehiculo_id = v.id
+        LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+        WHERE v.cliente_id = {{p}}
+    ) t
+    WHERE orden <= {{p}} OR (es_activa = 1 AND orden_en_grupo = 1)
+    ORDER BY patente, vehiculo_id, orden
+''', preparar=True)
+
+def obtener_estado_vehiculos_cliente(cliente_id, historial_max=5):
+    """
+    Estado de todos los vehículos de un cliente en una sola consulta: para cada vehículo, su
+    reparación activa (o None) y sus últimas `historial_max` reparaciones.
+
+    Devuelve una lista (ordenada por patente) de dicts con las claves 'vehiculo',
+    'reparacion_activa', 'historial' y 'hay_mas_historial'. Sólo incluye vehículos del
+    cliente, así que sirve también como control de pertenencia.
+    """
+    historial_max = max(1, min(int(historial_max), HISTORIAL_RECIENTE_MAXIMO))
+    conn = obtener_conexion()
+    vehiculos = []
+    if conn:
+        try:
+            cursor = conn.cursor()
+            # Se pide una fila más del límite para saber si el historial continúa.
+            _SQL_ESTADO_VEHICULOS_CLIENTE.ejecutar(cursor, (cliente_id, historial_max + 1))
+            columnas_vehiculo = ('cliente_id', 'patente', 'marca', 'modelo', 'anio', 'kilometraje_inicial')
+            por_vehiculo = {}
+            for fila in mapeo_filas.iterar(cursor):
+                item = por_vehiculo.get(fila['vehiculo_id'])
+                if item is None:
+                    vehiculo = {'id': fila['vehiculo_id']}
+                    vehiculo.update((clave, fila[clave]) for clave in columnas_vehiculo)
+                    item = {'vehiculo': vehiculo, 'reparacion_activa': None, 'historial': [], 'hay_mas_historial': False}
+                    por_vehiculo[fila['vehiculo_id']] = item
+                    vehiculos.append(item)
+                if fila['reparacion_id'] is None:
+                    continue  # Vehículo sin reparaciones.
+                reparacion = {'id': fila['reparacion_id'], 'vehiculo_id': fila['vehiculo_id']}
+                for clave in ('mecanico_id', 'fecha_ingreso', 'fecha_salida', 'kilometraje_ingreso',
+                              'kilometraje_salida', 'problema_reportado', 'trabajos_realizados',
+                              'repuestos_usados', 'costo_mano_obra', 'costo_total', 'estado',
+                              'turno_origen_id', 'nombre_mecanico', 'apellido_mecanico'):
+                    reparacion[clave] = fila[clave]
+                if fila['es_activa'] == 1 and fila['orden_en_grupo'] == 1:
+                    item['reparacion_activa'] = reparacion
+                if fila['orden'] <= historial_max:
+                    item['historial'].append(reparacion)
+                elif fila['orden'] == historial_max + 1:
+                    item['hay_mas_historial'] = True
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener el estado de los vehículos del cliente %s: %s", cliente_id, e)
+        finally:
+            if conn: conn.close()
+    return vehiculos
+
+_SQL_VEHICULOS_EN_TALLER = sentencias.registrar('vehiculos_en_taller', '''
+    SELECT r.id AS reparacion_id, v.id AS vehiculo_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
+           c.nombre AS nombre_cliente, c.apellido AS apellido_cliente,
+           r.estado AS estado_reparacion, r.problema_reportado,
+           m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
+           {fecha:r.fecha_ingreso} AS fecha_ingreso_taller,
+           r.turno_origen_id
+    FROM reparaciones r
+    JOIN vehiculos v ON r.vehiculo_id = v.id
+    JOIN clientes c ON v.cliente_id = c.id
+    LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+    WHERE r.estado IN {estados_activa}
+    ORDER BY
+        CASE r.estado
+            WHEN 'En Progreso' THEN 1
+            WHEN 'Pendiente' THEN 2
+            WHEN 'En Espera de Piezas' THEN 3
+            ELSE 4
+        END,
+        r.fecha_ingreso DESC
+''')
+
 def obtener_vehiculos_en_taller():
     """
     Obtiene todos los vehículos que tienen una reparación con estado 'En Progreso', 'Pendiente' o 'En Espera de Piezas'.
@@ -1082,87 +2145,66 @@ def obtener_vehiculos_en_taller():
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT r.id AS reparacion_id, v.id AS vehiculo_id, v.patente, v.marca, v.modelo, v.anio, v.kilometraje_inicial,
-                       c.nombre AS nombre_cliente, c.apellido AS apellido_cliente,
-                       r.estado AS estado_reparacion, r.problema_reportado,
-                       m.nombre AS nombre_mecanico, m.apellido AS apellido_mecanico,
-                       r.fecha_ingreso AS fecha_ingreso_taller,
-                       r.turno_origen_id
-                FROM reparaciones r
-                JOIN vehiculos v ON r.vehiculo_id = v.id
-                JOIN clientes c ON v.cliente_id = c.id
-                LEFT JOIN mecanicos m ON r.mecanico_id = m.id
-                WHERE r.estado IN ('En Progreso', 'Pendiente', 'En Espera de Piezas')
-                ORDER BY
-                    CASE r.estado
-                        WHEN 'En Progreso' THEN 1
-                        WHEN 'Pendiente' THEN 2
-                        WHEN 'En Espera de Piezas' THEN 3
-                        ELSE 4
-                    END,
-                    r.fecha_ingreso DESC
-            ''')
-            raw_data = cursor.fetchall()
-            vehiculos_en_taller = [_map_row_to_dict(cursor, row) for row in raw_data]
+            _SQL_VEHICULOS_EN_TALLER.ejecutar(cursor)
+            vehiculos_en_taller = mapeo_filas.todos(cursor)
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al obtener vehículos en taller: {e}")
+            log.error("Error al obtener vehículos en taller: %s", e)
         finally:
             if conn:
                 conn.close()
     return vehiculos_en_taller
 
+_SQL_REPARACION_DE_TURNO = sentencias.registrar('reparacion_de_turno',
+    'SELECT id FROM reparaciones WHERE turno_origen_id = {p}')
+_SQL_ACTUALIZAR_ESTADO_TURNO = sentencias.registrar('actualizar_estado_turno',
+    'UPDATE turnos SET estado = {p} WHERE id = {p}')
+
 def crear_reparacion_desde_turno(turno_id):
     conn = obtener_conexion()
     if conn:
         try:
             cursor = conn.cursor()
-            placeholder = _get_param_placeholder(conn)
             is_postgresql = isinstance(conn, psycopg2.extensions.connection)
 
             turno = obtener_turno_por_id(turno_id)
             if not turno:
-                print(f"Turno con ID {turno_id} no encontrado para crear reparación.")
+                log.warning("Turno con ID %s no encontrado para crear reparación.", turno_id)
                 return None
 
-            cursor.execute(f'SELECT id FROM reparaciones WHERE turno_origen_id = {placeholder}', (turno_id,))
+            _SQL_REPARACION_DE_TURNO.ejecutar(cursor, (turno_id,))
             existing_reparacion = cursor.fetchone()
             if existing_reparacion:
-                print(f"Advertencia: Ya existe una reparación (ID: {existing_reparacion[0]}) para el turno {turno_id}.")
+                log.warning("Ya existe una reparación (ID: %s) para el turno %s.", existing_reparacion[0], turno_id)
                 return existing_reparacion[0] # Devolver el ID existente
 
             vehiculo = obtener_vehiculo_por_id(turno['vehiculo_id'])
             kilometraje_ingreso_reparacion = vehiculo['kilometraje_inicial'] if vehiculo else 0
 
-            insert_repair_query = f'''
-                INSERT INTO reparaciones (vehiculo_id, mecanico_id, fecha_ingreso, kilometraje_ingreso, problema_reportado, estado, turno_origen_id)
-                VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder}, {placeholder})
-            '''
-            if is_postgresql:
-                insert_repair_query += ' RETURNING id' # ¡CORRECCIÓN CLAVE para PostgreSQL!
-
-            cursor.execute(insert_repair_query, (turno['vehiculo_id'], turno['mecanico_id'], turno['fecha'],
-                                                 kilometraje_ingreso_reparacion,
-                                                 turno['problema_reportado'], 'En Progreso', turno_id))
+            _SQL_INSERTAR_REPARACION.ejecutar(cursor, (turno['vehiculo_id'], turno['mecanico_id'], turno['fecha'],
+                                                       kilometraje_ingreso_reparacion,
+                                                       turno['problema_reportado'], 'En Progreso', turno_id))
 
             if is_postgresql:
                 reparacion_id = cursor.fetchone()[0] # Obtener el ID de RETURNING
             else:
                 reparacion_id = cursor.lastrowid # Para SQLite
 
-            cursor.execute(f'UPDATE turnos SET estado = {placeholder} WHERE id = {placeholder}', ('Completado', turno_id))
+            _SQL_ACTUALIZAR_ESTADO_TURNO.ejecutar(cursor, ('Completado', turno_id))
 
+            _registrar_evento_reparacion(conn, cursor, reparacion_id, turno['vehiculo_id'], 'En Progreso')
+            _recalcular_resumen(cursor, [turno['fecha']])
             conn.commit()
+            _notificar_cambio_reparacion()
             return reparacion_id
         except (sqlite3.IntegrityError, Psycopg2Error) as e:
             if "duplicate entry" in str(e).lower() or "unique constraint" in str(e).lower(): # Adaptado para PostgreSQL
-                print(f"Error: Intento de crear reparación duplicada para turno {turno_id}. Ya existe.")
+                log.error("Intento de crear reparación duplicada para turno %s. Ya existe.", turno_id)
             else:
-                print(f"Error de integridad al agregar reparación desde turno {turno_id}: {e}")
+                log.error("Error de integridad al agregar reparación desde turno %s: %s", turno_id, e)
             conn.rollback()
             return None
         except (sqlite3.Error, Psycopg2Error) as e:
-            print(f"Error al crear reparación desde turno {turno_id}: {e}")
+            log.error("Error al crear reparación desde turno %s: %s", turno_id, e)
             conn.rollback()
             return None
         finally:
@@ -1170,6 +2212,297 @@ def crear_reparacion_desde_turno(turno_id):
                 conn.close()
     return None
 
+# --- Sellos de versión (ETag / Last-Modified) ---
+# Un sello resume, con una consulta agregada sobre claves e índices, todo lo que puede cambiar
+# una respuesta: versiones de las filas involucradas, más cantidad y suma de ids de las filas
+# hijas (para detectar altas y bajas). Si el sello no cambió, la respuesta tampoco.
+Sello = namedtuple('Sello', ['cliente_id', 'version', 'ultima_modificacion'])
+
+def _a_datetime_utc(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = datetime.strptime(valor[:19], '%Y-%m-%d %H:%M:%S')
+    return valor.replace(tzinfo=timezone.utc, microsecond=0)
+
+def _armar_sello(cliente_id, partes, fechas):
+    fechas = [f for f in (_a_datetime_utc(valor) for valor in fechas) if f is not None]
+    return Sello(cliente_id, '.'.join(str(parte) for parte in partes), max(fechas) if fechas else None)
+
+_SQL_SELLO_CLIENTE = sentencias.registrar('sello_cliente', '''
+    SELECT c.id, c.version, COUNT(v.id), COALESCE(SUM(v.id), 0), COALESCE(SUM(v.version), 0),
+           MAX(c.actualizado_en), MAX(v.actualizado_en)
+    FROM clientes c
+    LEFT JOIN vehiculos v ON v.cliente_id = c.id
+    WHERE c.id = {p}
+    GROUP BY c.id, c.version
+''', preparar=True)
+
+def obtener_sello_cliente(cliente_id):
+    """Sello del panel del cliente (sus datos y sus vehículos). None si el cliente no existe."""
+    conn = obtener_conexion()
+    sello = None
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_SELLO_CLIENTE.ejecutar(cursor, (cliente_id,))
+            fila = cursor.fetchone()
+            if fila:
+                sello = _armar_sello(fila[0], ('c', fila[0]) + tuple(fila[1:5]), fila[5:7])
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener el sello del cliente %s: %s", cliente_id, e)
+        finally:
+            if conn: conn.close()
+    return sello
+
+_SQL_SELLO_VEHICULO = sentencias.registrar('sello_vehiculo', '''
+    SELECT v.cliente_id, v.version, c.version,
+           COUNT(r.id), COALESCE(SUM(r.id), 0), COALESCE(SUM(r.version), 0),
+           COUNT(m.id), COALESCE(SUM(m.version), 0),
+           MAX(v.actualizado_en), MAX(c.actualizado_en), MAX(r.actualizado_en), MAX(m.actualizado_en)
+    FROM vehiculos v
+    JOIN clientes c ON v.cliente_id = c.id
+    LEFT JOIN reparaciones r ON r.vehiculo_id = v.id
+    LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+    WHERE v.id = {p}
+    GROUP BY v.id, v.cliente_id, v.version, c.version
+''', preparar=True)
+
+def obtener_sello_vehiculo(vehiculo_id):
+    """
+    Sello del historial y del estado activo de un vehículo: el vehículo, su dueño, sus
+    reparaciones y los mecánicos asignados. None si el vehículo no existe.
+    """
+    conn = obtener_conexion()
+    sello = None
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_SELLO_VEHICULO.ejecutar(cursor, (vehiculo_id,))
+            fila = cursor.fetchone()
+            if fila:
+                sello = _armar_sello(fila[0], ('v', vehiculo_id) + tuple(fila[1:8]), fila[8:12])
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener el sello del vehículo %s: %s", vehiculo_id, e)
+        finally:
+            if conn: conn.close()
+    return sello
+
+_SQL_SELLO_ESTADO_VEHICULOS = sentencias.registrar('sello_estado_vehiculos', '''
+    SELECT COUNT(v.id), COALESCE(SUM(v.id), 0), COALESCE(SUM(v.version), 0),
+           COUNT(r.id), COALESCE(SUM(r.id), 0), COALESCE(SUM(r.version), 0),
+           COUNT(m.id), COALESCE(SUM(m.version), 0),
+           MAX(v.actualizado_en), MAX(r.actualizado_en), MAX(m.actualizado_en)
+    FROM vehiculos v
+    LEFT JOIN reparaciones r ON r.vehiculo_id = v.id
+    LEFT JOIN mecanicos m ON r.mecanico_id = m.id
+    WHERE v.cliente_id = {p}
+''', preparar=True)
+
+def obtener_sello_estado_vehiculos(cliente_id):
+    """Sello de obtener_estado_vehiculos_cliente: vehículos del cliente, sus reparaciones y mecánicos."""
+    conn = obtener_conexion()
+    sello = None
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _SQL_SELLO_ESTADO_VEHICULOS.ejecutar(cursor, (cliente_id,))
+            fila = cursor.fetchone()
+            if fila:
+                sello = _armar_sello(cliente_id, ('e', cliente_id) + tuple(fila[0:8]), fila[8:11])
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al obtener el sello de los vehículos del cliente %s: %s", cliente_id, e)
+        finally:
+            if conn: conn.close()
+    return sello
+
+# --- Importación masiva ---
+# importacion.py lee y valida los archivos; aquí se escriben los lotes ya validados. Cada lote
+# va en su propia transacción sobre una conexión propia (como _transmitir): la transacción no
+# crece con el archivo y lo ya importado queda confirmado aunque un lote posterior falle.
+# En PostgreSQL el lote se carga con COPY. En SQLite se carga con executemany en una tabla
+# temporal y pasa a la tabla real con un solo INSERT ... SELECT: FTS5 vuelca su índice al
+# terminar cada sentencia, así que un INSERT por fila (con el trigger de búsqueda de m0004)
+# crea un segmento del índice por fila y es unas cien veces más lento.
+COLUMNAS_IMPORTABLES = {
+    'clientes': ('nombre', 'apellido', 'telefono', 'email', 'dni'),
+    'vehiculos': ('cliente_id', 'patente', 'marca', 'modelo', 'anio', 'kilometraje_inicial'),
+    'reparaciones': ('vehiculo_id', 'mecanico_id', 'fecha_ingreso', 'fecha_salida', 'kilometraje_ingreso',
+                     'kilometraje_salida', 'problema_reportado', 'trabajos_realizados', 'repuestos_usados',
+                     'costo_mano_obra', 'costo_total', 'estado'),
+}
+_SQL_IMPORTAR = {
+    tabla: sentencias.registrar(f'importar_{tabla}', f'''
+        INSERT INTO {tabla} ({', '.join(columnas)}, actualizado_en)
+        VALUES ({', '.join(['{p}'] * len(columnas))}, {{ahora}})
+    ''')
+    for tabla, columnas in COLUMNAS_IMPORTABLES.items()
+}
+_SQL_IMPORTAR_SQLITE = {
+    tabla: (f"CREATE TEMP TABLE IF NOT EXISTS importacion_{tabla} ({', '.join(columnas)})",
+            f"INSERT INTO temp.importacion_{tabla} VALUES ({', '.join(['?'] * len(columnas))})",
+            f"INSERT INTO {tabla} ({', '.join(columnas)}, actualizado_en) "
+            f"SELECT {', '.join(columnas)}, CURRENT_TIMESTAMP FROM temp.importacion_{tabla} ORDER BY rowid",
+            f"DELETE FROM temp.importacion_{tabla}")
+    for tabla, columnas in COLUMNAS_IMPORTABLES.items()
+}
+_SQL_IDS_POR_CLAVE = {
+    'clientes': sentencias.registrar('ids_clientes_por_dni', 'SELECT dni, id FROM clientes WHERE dni IS NOT NULL'),
+    'vehiculos': sentencias.registrar('ids_vehiculos_por_patente', 'SELECT patente, id FROM vehiculos'),
+}
+
+def obtener_ids_por_clave(tabla):
+    """
+    {clave: id} de todas las filas de 'clientes' (por DNI) o 'vehiculos' (por patente), para
+    resolver las referencias de un archivo de importación en memoria en lugar de una consulta
+    por fila. Se lee de a lotes; el diccionario ocupa unos 100 bytes por fila.
+    """
+    conn = obtener_conexion()
+    ids = {}
+    if conn:
+        try:
+            cursor = _cursor_por_lotes(conn, f'ids_{tabla}')
+            _SQL_IDS_POR_CLAVE[tabla].ejecutar(cursor, ())
+            while True:
+                filas = cursor.fetchmany(LOTE_TRANSMISION * 10)
+                if not filas:
+                    break
+                ids.update((clave, id_fila) for clave, id_fila in filas)
+            cursor.close()
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al leer los ids de %s por clave: %s", tabla, e)
+        finally:
+            if conn: conn.close()
+    return ids
+
+def _copiar_lote(cursor, tabla, columnas, filas):
+    """COPY ... FROM STDIN del lote en formato CSV (un campo vacío sin comillas es NULL)."""
+    ahora = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for fila in filas:
+        escritor.writerow((*fila, ahora))
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {tabla} ({', '.join(columnas)}, actualizado_en) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def _pasar_lote_sqlite(cursor, tabla, filas):
+    crear, cargar, pasar, vaciar = _SQL_IMPORTAR_SQLITE[tabla]
+    cursor.execute(crear)
+    cursor.execute(vaciar)
+    cursor.executemany(cargar, filas)
+    cursor.execute(pasar)
+    cursor.execute(vaciar)
+
+def _insertar_fila_por_fila(conn, cursor, tabla, filas):
+    """Inserta cada fila dentro de un SAVEPOINT y devuelve [(posición, mensaje)] de las rechazadas."""
+    sentencia = _SQL_IMPORTAR[tabla]
+    rechazadas = []
+    if not isinstance(conn, psycopg2.extensions.connection):
+        # sqlite3 no abre la transacción por sí solo antes de un SAVEPOINT (ver unidad_trabajo).
+        cursor.execute('BEGIN')
+    for posicion, fila in enumerate(filas):
+        cursor.execute('SAVEPOINT fila_importada')
+        try:
+            sentencia.ejecutar(cursor, fila)
+        except (sqlite3.IntegrityError, Psycopg2Error) as e:
+            cursor.execute('ROLLBACK TO SAVEPOINT fila_importada')
+            rechazadas.append((posicion, str(e).strip().split('\n')[0]))
+        cursor.execute('RELEASE SAVEPOINT fila_importada')
+    return rechazadas
+
+def importar_lote(tabla, filas):
+    """
+    Inserta en `tabla` las `filas` (tuplas con COLUMNAS_IMPORTABLES[tabla], ya validadas) en una
+    transacción. Si la base rechaza el lote (p. ej. un DNI que alguien cargó mientras tanto), lo
+    repite fila por fila para dejar afuera sólo las rechazadas. Devuelve [(posición en filas,
+    mensaje)] de las que no se insertaron.
+
+    Confirma por su cuenta sobre una conexión propia: no debe llamarse dentro de una unidad de
+    trabajo (en SQLite compartiría la conexión del hilo y confirmaría también su transacción).
+    """
+    columnas = COLUMNAS_IMPORTABLES[tabla]
+    # Días del resumen diario que toca un lote de reparaciones (fecha_ingreso ya viene validada).
+    dias = {fila[columnas.index('fecha_ingreso')] for fila in filas} if tabla == 'reparaciones' else ()
+    conn = _obtener_conexion_del_pool()
+    if conn is None:
+        return [(posicion, 'No hay conexión con la base de datos.') for posicion in range(len(filas))]
+    rechazadas = []
+    try:
+        cursor = conn.cursor()
+        try:
+            if isinstance(conn, psycopg2.extensions.connection):
+                _copiar_lote(cursor, tabla, columnas, filas)
+            else:
+                _pasar_lote_sqlite(cursor, tabla, filas)
+            _recalcular_resumen(cursor, dias)
+            conn.commit()
+        except (sqlite3.IntegrityError, Psycopg2Error) as e:
+            conn.rollback()
+            log.warning("Lote de %s filas de %s rechazado (%s); se reintenta fila por fila.", len(filas), tabla, e)
+            rechazadas = _insertar_fila_por_fila(conn, cursor, tabla, filas)
+            _recalcular_resumen(cursor, dias)
+            conn.commit()
+        if tabla == 'clientes' and len(rechazadas) < len(filas):
+            _invalidar_referencia('clientes')
+    except (sqlite3.Error, Psycopg2Error) as e:
+        log.error("Error al importar un lote de %s: %s", tabla, e)
+        conn.rollback()
+        rechazadas = [(posicion, str(e)) for posicion in range(len(filas))]
+    finally:
+        if conn: conn.close()
+    return rechazadas
+
+# --- Exportación ---
+# exportacion.py escribe los archivos; aquí se leen las tablas con _transmitir (conexión propia,
+# cursor del lado del servidor, de a LOTE_TRANSMISION filas): la memoria no depende del tamaño
+# de la tabla. Las fechas y los importes salen con el tipo de cada motor (texto en SQLite).
+COLUMNAS_EXPORTABLES = {
+    'clientes': ('id', 'nombre', 'apellido', 'telefono', 'email', 'dni', 'version', 'actualizado_en'),
+    'vehiculos': ('id', 'cliente_id', 'patente', 'marca', 'modelo', 'anio', 'kilometraje_inicial', 'version',
+                  'actualizado_en'),
+    'turnos': ('id', 'cliente_id', 'vehiculo_id', 'mecanico_id', 'fecha_hora', 'fin', 'tipo_trabajo',
+               'problema_reportado', 'estado'),
+    'reparaciones': ('id', 'vehiculo_id', 'mecanico_id', 'turno_origen_id', 'fecha_ingreso', 'fecha_salida',
+                     'kilometraje_ingreso', 'kilometraje_salida', 'problema_reportado', 'trabajos_realizados',
+                     'repuestos_usados', 'costo_mano_obra', 'costo_total', 'estado', 'version', 'actualizado_en'),
+}
+# Columna por la que se filtra un rango de fechas y cómo se normalizan sus límites. Clientes y
+# vehículos no tienen fecha propia: se exportan siempre completos.
+_FECHA_EXPORTACION = {
+    'turnos': ('fecha_hora', _momento_iso),
+    'reparaciones': ('fecha_ingreso', _fecha_iso),
+}
+_SQL_EXPORTAR = {
+    tabla: sentencias.registrar(f'exportar_{tabla}',
+                                f"SELECT {', '.join(columnas)} FROM {tabla} ORDER BY id")
+    for tabla, columnas in COLUMNAS_EXPORTABLES.items()
+}
+# Recorren idx_turnos_agenda (fecha_hora, id) e idx_reparaciones_ingreso (fecha_ingreso, id).
+_SQL_EXPORTAR_RANGO = {
+    tabla: sentencias.registrar(f'exportar_{tabla}_rango', f'''
+        SELECT {', '.join(COLUMNAS_EXPORTABLES[tabla])} FROM {tabla}
+        WHERE {columna} >= {{p}} AND {columna} < {{p}}
+        ORDER BY {columna}, id
+    ''')
+    for tabla, (columna, _) in _FECHA_EXPORTACION.items()
+}
+
+def transmitir_exportacion(tabla, desde=None, hasta=None):
+    """
+    Filas de `tabla` (una de COLUMNAS_EXPORTABLES) como diccionarios, entregadas a medida que se
+    leen (ver _transmitir). En turnos y reparaciones, desde / hasta (date o texto ISO; hasta
+    excluido) limitan por fecha_hora o fecha_ingreso; en las demás tablas se ignoran.
+    ValueError si una fecha no es válida.
+    """
+    if tabla not in COLUMNAS_EXPORTABLES:
+        raise ValueError(f"Tabla no exportable: {tabla}")
+    if tabla in _FECHA_EXPORTACION and (desde or hasta):
+        _, normalizar = _FECHA_EXPORTACION[tabla]
+        # Sin uno de los límites, el rango queda abierto (date.min no sirve: strftime no rellena el año 1).
+        limites = (normalizar(desde or date(1900, 1, 1)), normalizar(hasta or date.max))
+        return _transmitir(_SQL_EXPORTAR_RANGO[tabla], limites, f'la exportación de {tabla}')
+    return _transmitir(_SQL_EXPORTAR[tabla], (), f'la exportación de {tabla}')
+
 if __name__ == '__main__':
     crear_tablas()
     pass
@@ -0,0 +1,309 @@
+"""
+Importación masiva de clientes, vehículos y reparaciones históricas desde CSV o JSON.
+
+El archivo se lee de a un registro por vez (nunca entero en memoria): cada registro se valida,
+las referencias se resuelven con diccionarios cargados una sola vez (DNI del cliente -> id,
+patente -> id) y los registros válidos se escriben de a LOTE con gestor_datos.importar_lote,
+una transacción por lote. Los registros con errores no detienen la importación: se informan
+con su número de línea (CSV) o de objeto (JSON) en el Resultado.
+
+Columnas (encabezado del CSV o claves de cada objeto JSON):
+  clientes      nombre*, apellido*, telefono, email, dni
+  vehiculos     dni_cliente*, patente*, marca*, modelo*, anio, kilometraje_inicial
+  reparaciones  patente*, mecanico_id, fecha_ingreso*, fecha_salida, kilometraje_ingreso*,
+                kilometraje_salida, problema_reportado, trabajos_realizados, repuestos_usados,
+                costo_mano_obra, costo_total, estado ('Completado' o 'Cancelado'; por defecto 'Completado')
+(* obligatorias). Las fechas van como 'YYYY-MM-DD' o 'DD/MM/YYYY'; los importes admiten coma decimal.
+El CSV puede separar con ',' o ';'. El JSON puede ser un arreglo de objetos o JSON Lines.
+
+Las reparaciones importadas son historia: no generan eventos de cambio (eventos_reparaciones).
+
+Uso:
+    python importacion.py clientes clientes.csv
+    python importacion.py vehiculos vehiculos.jsonl
+    python importacion.py reparaciones historial.csv --lote 2000
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+from datetime import date, datetime
+
+import bitacora
+import gestor_datos
+
+log = logging.getLogger(__name__)
+
+LOTE = int(os.environ.get('IMPORTACION_LOTE', 5000))
+# Errores que se conservan con su detalle; los demás sólo se cuentan.
+ERRORES_MAXIMOS = int(os.environ.get('IMPORTACION_ERRORES_MAXIMOS', 1000))
+
+ESTADOS_HISTORICOS = ('Completado', 'Cancelado')
+_FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+class Resultado:
+    """Resumen de una importación: registros leídos, importados y errores por registro."""
+
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.leidas = 0
+        self.importadas = 0
+        self.cantidad_errores = 0
+        self.errores = []  # [(número de registro, mensaje)], hasta ERRORES_MAXIMOS
+
+    def agregar_error(self, numero, mensaje):
+        self.cantidad_errores += 1
+        if len(self.errores) < ERRORES_MAXIMOS:
+            self.errores.append((numero, mensaje))
+
+    def como_dict(self):
+        return {'tabla': self.tabla, 'leidas': self.leidas, 'importadas': self.importadas,
+                'cantidad_errores': self.cantidad_errores,
+                'errores': [{'registro': numero, 'mensaje': mensaje} for numero, mensaje in self.errores]}
+
+
+# --- Lectura ---
+
+def leer_csv(archivo):
+    """(número de línea, dict) de cada fila de un CSV con encabezado, separado por ',' o ';'."""
+    encabezado = archivo.readline()
+    separador = ';' if encabezado.count(';') > encabezado.count(',') else ','
+    lector = csv.DictReader(itertools.chain([encabezado], archivo), delimiter=separador)
+    lector.fieldnames = [(campo or '').strip().lower() for campo in lector.fieldnames or []]
+    for registro in lector:
+        yield lector.line_num, registro
+
+
+def leer_json(archivo, tamano=64 * 1024):
+    """
+    (número de objeto, objeto) de un arreglo JSON o de JSON Lines, decodificados a medida que
+    se leen partes de `tamano` caracteres.
+    """
+    decodificador = json.JSONDecoder()
+    buffer, posicion, numero, terminado = '', 0, 0, False
+    while True:
+        # Entre objetos sólo puede haber espacios, comas y los corchetes del arreglo.
+        while posicion < len(buffer) and buffer[posicion] in ' \t\r\n,[]':
+            posicion += 1
+        if posicion == len(buffer):
+            buffer, posicion = archivo.read(tamano), 0
+            if not buffer:
+                return
+            continue
+        try:
+            objeto, posicion = decodificador.raw_decode(buffer, posicion)
+        except json.JSONDecodeError:
+            if terminado:
+                raise
+            parte = archivo.read(tamano)
+            terminado = not parte
+            buffer, posicion = buffer[posicion:] + parte, 0
+            continue
+        numero += 1
+        yield numero, objeto
+
+
+FORMATOS = {'csv': leer_csv, 'json': leer_json}
+
+
+def formato_de(nombre_archivo):
+    return 'json' if nombre_archivo.lower().endswith(('.json', '.jsonl')) else 'csv'
+
+
+# --- Validación ---
+
+def _valor(registro, campo, obligatorio=False, largo=255):
+    valor = registro.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if not valor:
+        if obligatorio:
+            raise FilaInvalida(f"Falta {campo}.")
+        return None
+    if len(valor) > largo:
+        raise FilaInvalida(f"{campo} supera los {largo} caracteres.")
+    return valor
+
+
+def _entero(registro, campo, obligatorio=False, minimo=0, maximo=None):
+    valor = _valor(registro, campo, obligatorio)
+    if valor is None:
+        return None
+    try:
+        numero = int(valor.replace('.', '')) if valor.replace('.', '').isdigit() else int(valor)
+    except ValueError:
+        raise FilaInvalida(f"{campo} no es un número entero: {valor}")
+    if numero < minimo or (maximo is not None and numero > maximo):
+        raise FilaInvalida(f"{campo} fuera de rango: {numero}")
+    return numero
+
+
+def _importe(registro, campo):
+    valor = _valor(registro, campo)
+    if valor is None:
+        return None
+    texto = valor.replace('$', '').replace(' ', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')  # 1.234,50
+    try:
+        importe = round(float(texto), 2)
+    except ValueError:
+        raise FilaInvalida(f"{campo} no es un importe: {valor}")
+    if importe < 0:
+        raise FilaInvalida(f"{campo} no puede ser negativo.")
+    return importe
+
+
+def _fecha(registro, campo, obligatorio=False):
+    valor = _valor(registro, campo, obligatorio)
+    if valor is None:
+        return None
+    for formato in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor[:10], formato).date().isoformat()
+        except ValueError:
+            continue
+    raise FilaInvalida(f"{campo} no es una fecha válida: {valor}")
+
+
+class _Contexto:
+    """Diccionarios para resolver referencias y detectar claves repetidas, cargados una sola vez."""
+
+    def __init__(self, tabla):
+        self.dnis = gestor_datos.obtener_ids_por_clave('clientes') if tabla in ('clientes', 'vehiculos') else {}
+        self.patentes = gestor_datos.obtener_ids_por_clave('vehiculos') if tabla in ('vehiculos', 'reparaciones') else {}
+        self.mecanicos = ({mecanico['id'] for mecanico in gestor_datos.obtener_todos_los_mecanicos()}
+                          if tabla == 'reparaciones' else set())
+
+
+def _fila_cliente(registro, contexto):
+    dni = _valor(registro, 'dni', largo=50)
+    email = _valor(registro, 'email')
+    if email and '@' not in email:
+        raise FilaInvalida(f"email inválido: {email}")
+    fila = (_valor(registro, 'nombre', obligatorio=True), _valor(registro, 'apellido', obligatorio=True),
+            _valor(registro, 'telefono', largo=50), email, dni)
+    if dni:
+        if dni in contexto.dnis:
+            raise FilaInvalida(f"Ya hay un cliente con DNI {dni}.")
+        contexto.dnis[dni] = None
+    return fila
+
+
+def _fila_vehiculo(registro, contexto):
+    dni = _valor(registro, 'dni_cliente', obligatorio=True, largo=50)
+    cliente_id = contexto.dnis.get(dni)
+    if cliente_id is None:
+        raise FilaInvalida(f"No hay un cliente con DNI {dni}.")
+    patente = _valor(registro, 'patente', obligatorio=True, largo=50).upper()
+    fila = (cliente_id, patente, _valor(registro, 'marca', obligatorio=True), _valor(registro, 'modelo', obligatorio=True),
+            _entero(registro, 'anio', minimo=1900, maximo=date.today().year + 1),
+            _entero(registro, 'kilometraje_inicial'))
+    if patente in contexto.patentes:
+        raise FilaInvalida(f"Ya hay un vehículo con patente {patente}.")
+    contexto.patentes[patente] = None
+    return fila
+
+
+def _fila_reparacion(registro, contexto):
+    patente = _valor(registro, 'patente', obligatorio=True, largo=50).upper()
+    vehiculo_id = contexto.patentes.get(patente)
+    if vehiculo_id is None:
+        raise FilaInvalida(f"No hay un vehículo con patente {patente}.")
+    mecanico_id = _entero(registro, 'mecanico_id', minimo=1)
+    if mecanico_id is not None and mecanico_id not in contexto.mecanicos:
+        raise FilaInvalida(f"No hay un mecánico con id {mecanico_id}.")
+    fecha_ingreso = _fecha(registro, 'fecha_ingreso', obligatorio=True)
+    fecha_salida = _fecha(registro, 'fecha_salida')
+    if fecha_salida and fecha_salida < fecha_ingreso:
+        raise FilaInvalida("fecha_salida es anterior a fecha_ingreso.")
+    kilometraje_ingreso = _entero(registro, 'kilometraje_ingreso', obligatorio=True)
+    kilometraje_salida = _entero(registro, 'kilometraje_salida', minimo=kilometraje_ingreso)
+    estado = _valor(registro, 'estado') or ESTADOS_HISTORICOS[0]
+    if estado not in ESTADOS_HISTORICOS:
+        raise FilaInvalida(f"estado debe ser {' o '.join(ESTADOS_HISTORICOS)}: {estado}")
+    return (vehiculo_id, mecanico_id, fecha_ingreso, fecha_salida, kilometraje_ingreso, kilometraje_salida,
+            _valor(registro, 'problema_reportado', largo=10_000), _valor(registro, 'trabajos_realizados', largo=10_000),
+            _valor(registro, 'repuestos_usados', largo=10_000),
+            _importe(registro, 'costo_mano_obra'), _importe(registro, 'costo_total'), estado)
+
+
+TABLAS = {'clientes': _fila_cliente, 'vehiculos': _fila_vehiculo, 'reparaciones': _fila_reparacion}
+
+
+# --- Importación ---
+
+def importar(tabla, archivo, formato='csv', lote=LOTE):
+    """
+    Importa en `tabla` los registros de `archivo` (abierto en modo texto) y devuelve un Resultado.
+    Usa su propia conexión y confirma de a un lote: no debe llamarse dentro de una unidad de trabajo.
+    """
+    validar = TABLAS[tabla]
+    contexto = _Contexto(tabla)
+    resultado = Resultado(tabla)
+    filas, numeros = [], []
+
+    def escribir():
+        rechazadas = gestor_datos.importar_lote(tabla, filas)
+        for posicion, mensaje in rechazadas:
+            resultado.agregar_error(numeros[posicion], mensaje)
+        resultado.importadas += len(filas) - len(rechazadas)
+        filas.clear()
+        numeros.clear()
+
+    try:
+        for numero, registro in FORMATOS[formato](archivo):
+            resultado.leidas += 1
+            try:
+                if not isinstance(registro, dict):
+                    raise FilaInvalida("Se esperaba un objeto con los campos del registro.")
+                filas.append(validar(registro, contexto))
+                numeros.append(numero)
+            except FilaInvalida as e:
+                resultado.agregar_error(numero, str(e))
+            if len(filas) >= lote:
+                escribir()
+    except (csv.Error, ValueError) as e:
+        # Archivo mal formado o con otra codificación: se importa lo leído hasta ahí.
+        resultado.agregar_error(resultado.leidas + 1, f"No se pudo seguir leyendo el archivo: {e}")
+    if filas:
+        escribir()
+    log.info("Importación de %s: %s leídos, %s importados, %s con errores.",
+             tabla, resultado.leidas, resultado.importadas, resultado.cantidad_errores)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('tabla', choices=sorted(TABLAS))
+    parser.add_argument('archivo')
+    parser.add_argument('--formato', choices=sorted(FORMATOS),
+                        help="csv o json (por defecto, según la extensión del archivo)")
+    parser.add_argument('--lote', type=int, default=LOTE, help=f"registros por transacción (por defecto {LOTE})")
+    args = parser.parse_args(argv)
+
+    if not gestor_datos.asegurar_esquema():
+        print("No se pudo preparar la base de datos.", file=sys.stderr)
+        return 2
+    with open(args.archivo, encoding='utf-8-sig', newline='') as archivo:
+        resultado = importar(args.tabla, archivo, args.formato or formato_de(args.archivo), args.lote)
+
+    for numero, mensaje in resultado.errores:
+        print(f"  registro {numero}: {mensaje}")
+    if resultado.cantidad_errores > len(resultado.errores):
+        print(f"  ... y {resultado.cantidad_errores - len(resultado.errores)} errores más.")
+    print(f"{resultado.tabla}: {resultado.leidas} leídos, {resultado.importadas} importados, "
+          f"{resultado.cantidad_errores} con errores.")
+    return 1 if resultado.cantidad_errores else 0
+
+
+if __name__ == '__main__':
+    bitacora.configurar()
+    sys.exit(main())
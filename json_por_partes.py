@@ -0,0 +1,33 @@
+"""
+Respuestas JSON escritas por partes a medida que se leen las filas.
+
+lista_en_partes() arma {**campos, clave: [fila, ...]} sin tener nunca la lista completa en
+memoria: cada fila se serializa al llegar y se acumula hasta TAMANO_PARTE caracteres, que se
+entregan como una parte del cuerpo (transferencia chunked). El uso de memoria queda acotado por
+la parte y por el lote de lectura, no por el tamaño del resultado.
+"""
+import json
+
+TAMANO_PARTE = 64 * 1024
+
+
+def lista_en_partes(campos, clave, filas, dumps=json.dumps, tamano_parte=TAMANO_PARTE):
+    """
+    Genera el texto JSON de {**campos, clave: [filas...]} en partes de unos `tamano_parte`
+    caracteres. `dumps` serializa cada valor (p. ej. app.json.dumps, para usar el mismo
+    formato de fechas y decimales que jsonify).
+    """
+    cabecera = dumps(campos)
+    partes = [cabecera[:-1], ', ' if campos else '', dumps(clave), ': [']
+    largo = sum(map(len, partes))
+    separador = ''
+    for fila in filas:
+        texto = separador + dumps(fila)
+        separador = ', '
+        partes.append(texto)
+        largo += len(texto)
+        if largo >= tamano_parte:
+            yield ''.join(partes)
+            partes, largo = [], 0
+    partes.append(']}')
+    yield ''.join(partes)
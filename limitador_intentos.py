@@ -0,0 +1,126 @@
+"""
+Límite de intentos fallidos de inicio de sesión, por usuario y por IP.
+
+Cada verificación de contraseña cuesta un bcrypt completo. Tras demasiados fallos en la
+ventana, la clave queda bloqueada y los intentos siguientes se rechazan (429) sin verificar
+nada. Cada bloqueo repetido dura el doble que el anterior, hasta un máximo.
+
+El estado vive en memoria del proceso: cada aplicación (mecánicos y clientes) lleva su cuenta.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metricas
+
+LOGIN_FALLOS_USUARIO = int(os.environ.get('LOGIN_FALLOS_USUARIO', '5'))
+LOGIN_FALLOS_IP = int(os.environ.get('LOGIN_FALLOS_IP', '30'))
+LOGIN_VENTANA = float(os.environ.get('LOGIN_VENTANA', '300'))
+LOGIN_BLOQUEO = float(os.environ.get('LOGIN_BLOQUEO', '60'))
+LOGIN_BLOQUEO_MAX = float(os.environ.get('LOGIN_BLOQUEO_MAX', '900'))
+
+
+class _EstadoClave:
+    __slots__ = ('fallos', 'bloqueado_hasta', 'bloqueos')
+
+    def __init__(self):
+        self.fallos = deque()
+        self.bloqueado_hasta = 0.0
+        self.bloqueos = 0
+
+
+class LimitadorIntentos:
+    """
+    Cuenta fallos por clave en una ventana deslizante de `ventana` segundos. Al llegar a
+    `maximo`, la clave se bloquea `bloqueo` segundos (duplicándose en cada bloqueo siguiente,
+    hasta `bloqueo_max`). Guarda a lo sumo `max_claves` claves, descartando las más antiguas.
+    """
+
+    def __init__(self, maximo, ventana=LOGIN_VENTANA, bloqueo=LOGIN_BLOQUEO,
+                 bloqueo_max=LOGIN_BLOQUEO_MAX, max_claves=10000):
+        self.maximo = maximo
+        self.ventana = ventana
+        self.bloqueo = bloqueo
+        self.bloqueo_max = bloqueo_max
+        self.max_claves = max_claves
+        self._claves = OrderedDict()
+        self._lock = threading.Lock()
+        self._rechazos = 0
+
+    def _recortar(self, estado, ahora):
+        while estado.fallos and ahora - estado.fallos[0] > self.ventana:
+            estado.fallos.popleft()
+
+    def espera_restante(self, clave):
+        """Segundos que faltan para que la clave pueda volver a intentar (0 si puede ahora)."""
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._claves.get(clave)
+            if estado is None or estado.bloqueado_hasta <= ahora:
+                return 0.0
+            self._rechazos += 1
+            return estado.bloqueado_hasta - ahora
+
+    def registrar_fallo(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._claves.get(clave)
+            if estado is None:
+                estado = _EstadoClave()
+                self._claves[clave] = estado
+                while len(self._claves) > self.max_claves:
+                    self._claves.popitem(last=False)
+            else:
+                self._claves.move_to_end(clave)
+            self._recortar(estado, ahora)
+            estado.fallos.append(ahora)
+            if len(estado.fallos) >= self.maximo:
+                duracion = min(self.bloqueo * (2 ** estado.bloqueos), self.bloqueo_max)
+                estado.bloqueado_hasta = ahora + duracion
+                estado.bloqueos += 1
+                estado.fallos.clear()
+
+    def registrar_exito(self, clave):
+        with self._lock:
+            self._claves.pop(clave, None)
+
+    def estadisticas(self):
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                'claves': len(self._claves),
+                'bloqueadas': sum(1 for estado in self._claves.values() if estado.bloqueado_hasta > ahora),
+                'rechazos': self._rechazos,
+            }
+
+
+por_usuario = LimitadorIntentos(LOGIN_FALLOS_USUARIO)
+# Más permisivo: varias personas pueden compartir una IP (NAT, el propio taller).
+por_ip = LimitadorIntentos(LOGIN_FALLOS_IP)
+
+metricas.Calculada('taller_login_bloqueados_total', 'Intentos de inicio de sesión rechazados por bloqueo.', ('clave',),
+                   lambda: [(('usuario',), por_usuario.estadisticas()['rechazos']),
+                            (('ip',), por_ip.estadisticas()['rechazos'])],
+                   tipo='counter')
+
+
+def _clave_usuario(username):
+    return (username or '').strip().lower()
+
+
+def espera_login(username, ip):
+    """Segundos que hay que esperar antes de intentar este inicio de sesión (0 si se permite)."""
+    return max(por_usuario.espera_restante(_clave_usuario(username)), por_ip.espera_restante(ip))
+
+
+def registrar_login(username, ip, exito):
+    """
+    Anota el resultado de un intento. Un éxito limpia la cuenta del usuario, pero no la de la IP:
+    si no, un atacante con una cuenta válida podría reiniciarla entre intentos.
+    """
+    if exito:
+        por_usuario.registrar_exito(_clave_usuario(username))
+    else:
+        por_usuario.registrar_fallo(_clave_usuario(username))
+        por_ip.registrar_fallo(ip)
@@ -0,0 +1,73 @@
+"""
+Materialización de las filas de una consulta en diccionarios o registros compactos.
+
+La disposición de columnas (cursor.description) se lee una sola vez por consulta y cada fila
+se arma con dict(zip(columnas, fila)). En SQLite el cursor se cambia a tuplas nativas antes de
+leer: la conexión usa sqlite3.Row, que acá sólo agregaría un objeto intermedio por fila. En
+PostgreSQL el cursor de psycopg2 ya devuelve tuplas.
+
+Los registros son namedtuples (sin __dict__, como __slots__) con un tipo por entidad y
+disposición de columnas, creado una vez y reutilizado, igual que NamedTupleCursor de psycopg2
+pero válido para ambos dialectos. iterar() recorre el resultado por lotes con fetchmany, sin
+armar nunca la lista completa.
+"""
+import sqlite3
+from collections import namedtuple
+from functools import lru_cache
+
+LOTE = 500
+
+
+def columnas(cursor):
+    """Nombres de las columnas del resultado actual del cursor."""
+    return tuple(descripcion[0] for descripcion in cursor.description)
+
+
+def _tuplas(cursor):
+    if isinstance(cursor, sqlite3.Cursor):
+        cursor.row_factory = None
+    return cursor
+
+
+@lru_cache(maxsize=128)
+def tipo_registro(entidad, nombres):
+    """Tipo de registro (namedtuple) para la entidad con esas columnas; se crea una sola vez."""
+    return namedtuple(entidad, nombres, rename=True)
+
+
+def _armador(cursor, entidad):
+    nombres = columnas(cursor)
+    if entidad is None:
+        return lambda fila: dict(zip(nombres, fila))
+    return tipo_registro(entidad, nombres)._make
+
+
+def uno(cursor, entidad=None):
+    """La próxima fila como diccionario (o registro de `entidad`), o None si no quedan."""
+    fila = _tuplas(cursor).fetchone()
+    if fila is None:
+        return None
+    return _armador(cursor, entidad)(fila)
+
+
+def todos(cursor, entidad=None):
+    """Todas las filas restantes como lista de diccionarios (o registros de `entidad`)."""
+    filas = _tuplas(cursor).fetchall()
+    if not filas:
+        return []
+    if entidad is None:
+        nombres = columnas(cursor)
+        return [dict(zip(nombres, fila)) for fila in filas]
+    return list(map(tipo_registro(entidad, columnas(cursor))._make, filas))
+
+
+def iterar(cursor, entidad=None, lote=LOTE):
+    """Recorre las filas restantes de a `lote`, como diccionarios o registros de `entidad`."""
+    filas = _tuplas(cursor).fetchmany(lote)
+    if not filas:
+        return
+    # En un cursor con nombre de psycopg2, description recién está disponible tras la primera lectura.
+    armar = _armador(cursor, entidad)
+    while filas:
+        yield from map(armar, filas)
+        filas = cursor.fetchmany(lote)
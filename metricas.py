@@ -0,0 +1,253 @@
+"""
+Contadores en memoria del proceso para medir latencias sin servicios externos.
+
+Las familias de métricas (Contador, Medidor, HistogramaEtiquetado y las que se calculan al
+leerlas) se registran en este módulo, y exponer() las devuelve en el formato de texto de
+Prometheus. instrumentar_flask() agrega a una aplicación Flask la latencia por ruta, las
+peticiones en curso, el tiempo de render de plantillas y el endpoint /metrics.
+Las latencias se observan en milisegundos y se exponen en segundos, como pide Prometheus.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Límites superiores (en milisegundos) de los buckets de latencia por defecto.
+LIMITES_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histograma:
+    """
+    Histograma de buckets fijos: cuenta observaciones por límite superior, más la suma y el máximo.
+    observar() es O(log buckets) bajo un lock propio, así que se puede llamar desde cualquier hilo.
+    """
+
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = tuple(limites)
+        self._cuentas = [0] * (len(self.limites) + 1)  # El último es +Inf.
+        self._suma = 0.0
+        self._maximo = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self._cuentas[indice] += 1
+            self._suma += valor
+            if valor > self._maximo:
+                self._maximo = valor
+
+    def instantanea(self):
+        """Copia consistente: {'buckets': [(limite, acumulado), ...], 'cantidad', 'suma', 'maximo'}."""
+        with self._lock:
+            cuentas = list(self._cuentas)
+            suma, maximo = self._suma, self._maximo
+        acumulado, buckets = 0, []
+        for limite, cuenta in zip(self.limites + (float('inf'),), cuentas):
+            acumulado += cuenta
+            buckets.append((limite, acumulado))
+        return {'buckets': buckets, 'cantidad': acumulado, 'suma': suma, 'maximo': maximo}
+
+    def percentil(self, p, instantanea=None):
+        """Estimación del percentil p (0-100): el límite del primer bucket que lo alcanza."""
+        datos = instantanea or self.instantanea()
+        if not datos['cantidad']:
+            return 0.0
+        objetivo = datos['cantidad'] * p / 100.0
+        for limite, acumulado in datos['buckets']:
+            if acumulado >= objetivo:
+                return limite if limite != float('inf') else datos['maximo']
+        return datos['maximo']
+
+
+# --- Familias de métricas con etiquetas ---
+_familias = []
+_familias_lock = threading.Lock()
+
+
+def _registrar(familia):
+    with _familias_lock:
+        _familias.append(familia)
+    return familia
+
+
+class _Familia:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+        _registrar(self)
+
+    def _clave(self, valores):
+        if len(valores) != len(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}, se recibió {valores}")
+        return tuple(str(valor) for valor in valores)
+
+
+class Contador(_Familia):
+    """Valor que sólo crece (peticiones atendidas, rechazos...)."""
+    tipo = 'counter'
+
+    def incrementar(self, *valores, cantidad=1):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def muestras(self):
+        with self._lock:
+            return [('', clave, valor) for clave, valor in self._valores.items()]
+
+
+class Medidor(Contador):
+    """Valor que sube y baja (peticiones en curso)."""
+    tipo = 'gauge'
+
+    def sumar(self, delta, *valores):
+        self.incrementar(*valores, cantidad=delta)
+
+
+class HistogramaEtiquetado(_Familia):
+    """Un Histograma (en milisegundos) por combinación de etiquetas."""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_MS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = limites
+
+    def observar(self, milisegundos, *valores):
+        clave = self._clave(valores)
+        histograma = self._valores.get(clave)
+        if histograma is None:
+            with self._lock:
+                histograma = self._valores.setdefault(clave, Histograma(self.limites))
+        histograma.observar(milisegundos)
+
+    def muestras(self):
+        with self._lock:
+            histogramas = list(self._valores.items())
+        return _muestras_histograma((clave, histograma.instantanea()) for clave, histograma in histogramas)
+
+
+class Calculada(_Familia):
+    """
+    Familia cuyo valor se calcula al leerla: `funcion()` devuelve [(valores_etiquetas, valor)]
+    (o, si tipo='histogram', [(valores_etiquetas, instantanea_de_Histograma)]).
+    Sirve para exponer estadísticas que otro módulo ya lleva, sin contarlas dos veces.
+    """
+
+    def __init__(self, nombre, ayuda, etiquetas, funcion, tipo='gauge'):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+        self.tipo = tipo
+
+    def muestras(self):
+        resultados = [(self._clave(valores), valor) for valores, valor in self.funcion()]
+        if self.tipo == 'histogram':
+            return _muestras_histograma(resultados)
+        return [('', clave, valor) for clave, valor in resultados]
+
+
+def _muestras_histograma(instantaneas):
+    muestras = []
+    for clave, datos in instantaneas:
+        for limite, acumulado in datos['buckets']:
+            le = '+Inf' if limite == float('inf') else _numero(limite / 1000.0)
+            muestras.append(('_bucket', clave + (('le', le),), acumulado))
+        muestras.append(('_sum', clave, datos['suma'] / 1000.0))
+        muestras.append(('_count', clave, datos['cantidad']))
+    return muestras
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(valor) if not valor.is_integer() else str(int(valor))
+    return str(valor)
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def exponer():
+    """Todas las familias registradas, en el formato de texto de Prometheus (versión 0.0.4)."""
+    lineas = []
+    with _familias_lock:
+        familias = list(_familias)
+    for familia in familias:
+        lineas.append(f'# HELP {familia.nombre} {familia.ayuda}')
+        lineas.append(f'# TYPE {familia.nombre} {familia.tipo}')
+        for sufijo, clave, valor in familia.muestras():
+            pares = []
+            for indice, elemento in enumerate(clave):
+                if isinstance(elemento, tuple):  # ('le', ...) de los buckets
+                    pares.append(f'{elemento[0]}="{elemento[1]}"')
+                else:
+                    pares.append(f'{familia.etiquetas[indice]}="{_escapar(elemento)}"')
+            etiquetas = '{' + ','.join(pares) + '}' if pares else ''
+            lineas.append(f'{familia.nombre}{sufijo}{etiquetas} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+# --- Instrumentación de las aplicaciones Flask ---
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+
+peticiones_duracion = HistogramaEtiquetado(
+    'taller_peticion_duracion_seconds', 'Duración de las peticiones HTTP por ruta.', ('app', 'ruta'))
+peticiones_total = Contador(
+    'taller_peticiones_total', 'Peticiones HTTP atendidas por ruta y código de estado.', ('app', 'ruta', 'codigo'))
+peticiones_en_curso = Medidor(
+    'taller_peticiones_en_curso', 'Peticiones HTTP que se están atendiendo ahora.', ('app',))
+plantillas_duracion = HistogramaEtiquetado(
+    'taller_plantilla_render_seconds', 'Tiempo de render de cada plantilla Jinja.', ('app', 'plantilla'))
+
+
+def instrumentar_flask(app, nombre):
+    """
+    Mide cada petición de `app` y agrega GET /metrics. Conviene llamarla justo después de crear
+    la aplicación: así sus hooks envuelven a los demás (incluida la confirmación de la unidad de trabajo).
+    Si METRICAS_TOKEN está definido, /metrics exige 'Authorization: Bearer <token>'.
+    """
+    from flask import Response, abort, before_render_template, g, request, template_rendered
+
+    @app.before_request
+    def _metricas_inicio():
+        g.metricas_inicio = time.perf_counter()
+        peticiones_en_curso.sumar(1, nombre)
+
+    @app.after_request
+    def _metricas_estado(response):
+        g.metricas_codigo = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metricas_fin(error):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None:
+            return
+        peticiones_en_curso.sumar(-1, nombre)
+        # Las rutas inexistentes (404) comparten una etiqueta: no se crean series por URL.
+        ruta = request.endpoint or 'sin_ruta'
+        peticiones_duracion.observar((time.perf_counter() - inicio) * 1000.0, nombre, ruta)
+        codigo = g.pop('metricas_codigo', 500)
+        peticiones_total.incrementar(nombre, ruta, codigo)
+
+    def _plantilla_inicio(sender, template, context, **extra):
+        g.metricas_plantilla = time.perf_counter()
+
+    def _plantilla_fin(sender, template, context, **extra):
+        inicio = g.pop('metricas_plantilla', None)
+        if inicio is not None:
+            plantillas_duracion.observar((time.perf_counter() - inicio) * 1000.0, nombre, template.name or '?')
+
+    before_render_template.connect(_plantilla_inicio, app, weak=False)
+    template_rendered.connect(_plantilla_fin, app, weak=False)
+
+    @app.route('/metrics')
+    def metricas_prometheus():
+        if METRICAS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICAS_TOKEN}':
+            abort(401)
+        return Response(exponer(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,116 @@
+"""
+Migraciones versionadas del esquema de la base de datos.
+
+Cada módulo mXXXX_*.py define VERSION, DESCRIPCION y aplicar(cursor, es_postgresql).
+La tabla schema_version registra las versiones aplicadas; aplicar_pendientes() ejecuta
+en orden sólo las que faltan, dentro de una única transacción, y después sincroniza los
+índices secundarios declarados en indices.py.
+"""
+import logging
+
+import psycopg2
+
+from . import indices
+from . import m0001_esquema_inicial
+from . import m0002_eventos_reparaciones
+from . import m0003_versiones_filas
+from . import m0004_busqueda_texto
+from . import m0005_fechas_nativas
+from . import m0006_duracion_turnos
+from . import m0007_resumen_reparaciones
+
+log = logging.getLogger(__name__)
+
+# Orden de aplicación. Para agregar una migración: crear el módulo y sumarlo al final.
+MIGRACIONES = [
+    m0001_esquema_inicial,
+    m0002_eventos_reparaciones,
+    m0003_versiones_filas,
+    m0004_busqueda_texto,
+    m0005_fechas_nativas,
+    m0006_duracion_turnos,
+    m0007_resumen_reparaciones,
+]
+
+# Clave arbitraria para pg_advisory_xact_lock: evita que dos procesos migren a la vez.
+_CLAVE_BLOQUEO_POSTGRES = 4242001
+
+
+class MigracionFallida(Exception):
+    """Una migración no pudo aplicarse; la transacción ya se deshizo. Conserva versión y causa."""
+
+    def __init__(self, migracion, causa):
+        super().__init__(f"migración {migracion.VERSION} ({migracion.DESCRIPCION}): {causa}")
+        self.version = migracion.VERSION
+        self.causa = causa
+
+
+def version_mas_reciente():
+    return MIGRACIONES[-1].VERSION if MIGRACIONES else 0
+
+
+def _crear_tabla_versiones(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            descripcion VARCHAR(255) NOT NULL,
+            aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def version_actual(cursor):
+    """Devuelve la última versión aplicada (0 si la base todavía no tiene migraciones)."""
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    fila = cursor.fetchone()
+    return fila[0] if fila and fila[0] is not None else 0
+
+
+def aplicar_pendientes(conn):
+    """
+    Aplica en orden las migraciones que faltan y confirma la transacción.
+    Devuelve la lista de versiones aplicadas (vacía si el esquema ya estaba al día).
+    Si una migración falla, se deshace todo y se lanza MigracionFallida con su versión.
+    """
+    es_postgresql = isinstance(conn, psycopg2.extensions.connection)
+    placeholder = '%s' if es_postgresql else '?'
+    cursor = conn.cursor()
+    try:
+        if es_postgresql:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', (_CLAVE_BLOQUEO_POSTGRES,))
+        else:
+            # Toma el bloqueo de escritura desde el principio para serializar procesos concurrentes.
+            cursor.execute('BEGIN IMMEDIATE')
+
+        _crear_tabla_versiones(cursor)
+        actual = version_actual(cursor)
+
+        aplicadas = []
+        for migracion in MIGRACIONES:
+            if migracion.VERSION <= actual:
+                continue
+            try:
+                migracion.aplicar(cursor, es_postgresql)
+            except Exception as e:
+                raise MigracionFallida(migracion, e) from e
+            cursor.execute(
+                f'INSERT INTO schema_version (version, descripcion) VALUES ({placeholder}, {placeholder})',
+                (migracion.VERSION, migracion.DESCRIPCION)
+            )
+            aplicadas.append(migracion.VERSION)
+
+        creados, eliminados = indices.sincronizar(cursor, es_postgresql)
+        if creados:
+            log.info("Índices creados: %s", ', '.join(creados))
+        if eliminados:
+            log.info("Índices obsoletos eliminados: %s", ', '.join(eliminados))
+        if not es_postgresql:
+            # SQLite no mantiene estadísticas por sí solo; sin ellas el planificador
+            # prefiere ordenar en memoria antes que recorrer los índices de orden.
+            cursor.execute('PRAGMA optimize' if not creados else 'ANALYZE')
+
+        conn.commit()
+        return aplicadas
+    except Exception:
+        conn.rollback()
+        raise
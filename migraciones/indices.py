@@ -0,0 +1,112 @@
+"""
+Índices secundarios declarados del esquema.
+
+INDICES es el estado deseado: al arrancar, sincronizar() crea los índices declarados que
+falten y elimina los índices administrados (prefijo idx_) que ya no figuran en la lista.
+Para cambiar la definición de un índice hay que darle un nombre nuevo.
+"""
+from collections import namedtuple
+
+PREFIJO = 'idx_'
+
+# Mismo literal que usan las consultas de reparaciones activas: los índices parciales sólo
+# se aprovechan si la condición de la consulta coincide con la del índice.
+ESTADOS_REPARACION_ACTIVA = "('En Progreso', 'Pendiente', 'En Espera de Piezas')"
+ESTADOS_TURNO_LISTADO = "('Agendado', 'En Progreso', 'Cancelado')"
+# Turnos que ocupan al mecánico en la agenda (agenda.ESTADOS_OCUPAN).
+ESTADOS_TURNO_OCUPA = "('Agendado', 'En Progreso')"
+
+
+def sin_puntuacion(expresion):
+    """Expresión SQL con `expresion` sin '-' ni '.': '20.123.456' -> '20123456', 'AB-123-CD' -> 'AB123CD'."""
+    return f"replace(replace({expresion}, '-', ''), '.', '')"
+
+
+# Texto en el que busca el typeahead en PostgreSQL: la consulta tiene que usar la misma expresión
+# que el índice trigram de m0004 para aprovecharlo. Empieza con espacio para que '% texto%'
+# coincida sólo al comienzo de una palabra, igual que las búsquedas por prefijo de FTS5 en SQLite.
+# DNI y patente van sin puntos ni guiones, igual que las palabras buscadas.
+TEXTO_BUSQUEDA_CLIENTES = f"(' ' || nombre || ' ' || apellido || ' ' || COALESCE({sin_puntuacion('dni')}, ''))"
+TEXTO_BUSQUEDA_VEHICULOS = f"(' ' || {sin_puntuacion('patente')} || ' ' || marca || ' ' || modelo)"
+
+Indice = namedtuple('Indice', ['nombre', 'tabla', 'columnas', 'donde'])
+Indice.__new__.__defaults__ = (None,)
+
+INDICES = [
+    # clientes / mecanicos: listados paginados por (apellido, nombre, id) y búsqueda por nombre y apellido.
+    Indice('idx_clientes_apellido_nombre_id', 'clientes', ('apellido', 'nombre', 'id')),
+    Indice('idx_mecanicos_apellido_nombre_id', 'mecanicos', ('apellido', 'nombre', 'id')),
+
+    # vehiculos: obtener_vehiculos_por_cliente filtra por cliente y ordena por patente.
+    Indice('idx_vehiculos_cliente_patente', 'vehiculos', ('cliente_id', 'patente')),
+
+    # reparaciones: historial por vehículo (ORDER BY fecha_ingreso DESC, id DESC), por mecánico y por estado.
+    Indice('idx_reparaciones_vehiculo_fecha', 'reparaciones', ('vehiculo_id', 'fecha_ingreso', 'id')),
+    Indice('idx_reparaciones_mecanico', 'reparaciones', ('mecanico_id',)),
+    Indice('idx_reparaciones_estado', 'reparaciones', ('estado',)),
+    # Rangos y días de fecha_ingreso sobre todas las reparaciones (exportación por período, resumen diario).
+    Indice('idx_reparaciones_ingreso', 'reparaciones', ('fecha_ingreso', 'id')),
+    # Parciales sobre las reparaciones activas (obtener_vehiculos_en_taller / obtener_reparacion_activa_por_vehiculo).
+    Indice('idx_reparaciones_activas_fecha', 'reparaciones', ('fecha_ingreso',),
+           f'estado IN {ESTADOS_REPARACION_ACTIVA}'),
+    Indice('idx_reparaciones_activas_vehiculo', 'reparaciones', ('vehiculo_id', 'fecha_ingreso'),
+           f'estado IN {ESTADOS_REPARACION_ACTIVA}'),
+
+    # turnos: filtro por estado, rangos de fecha_hora (agenda), y claves foráneas usadas en filtros y borrados en cascada.
+    Indice('idx_turnos_estado', 'turnos', ('estado',)),
+    Indice('idx_turnos_agenda', 'turnos', ('fecha_hora', 'id')),
+    # Parcial para el listado paginado de turnos (estados visibles, orden fecha_hora/id).
+    Indice('idx_turnos_listado_agenda', 'turnos', ('fecha_hora', 'id'),
+           f'estado IN {ESTADOS_TURNO_LISTADO}'),
+    Indice('idx_turnos_cliente', 'turnos', ('cliente_id',)),
+    Indice('idx_turnos_vehiculo', 'turnos', ('vehiculo_id',)),
+    # Agenda de un mecánico por rango; también cubre la clave foránea (ON DELETE SET NULL).
+    Indice('idx_turnos_mecanico_agenda', 'turnos', ('mecanico_id', 'fecha_hora')),
+
+    # eventos_reparaciones: la lectura avanza por id; la purga periódica filtra por antigüedad.
+    Indice('idx_eventos_reparaciones_creado', 'eventos_reparaciones', ('creado_en',)),
+]
+
+
+def sentencia_creacion(indice):
+    sql = f"CREATE INDEX IF NOT EXISTS {indice.nombre} ON {indice.tabla} ({', '.join(indice.columnas)})"
+    if indice.donde:
+        sql += f" WHERE {indice.donde}"
+    return sql
+
+
+def indices_existentes(cursor, es_postgresql):
+    """Devuelve {nombre: tabla} de los índices administrados (prefijo idx_) presentes en la base."""
+    if es_postgresql:
+        cursor.execute(
+            "SELECT indexname, tablename FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND indexname LIKE 'idx\\_%'"
+        )
+    else:
+        cursor.execute(
+            "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\'"
+        )
+    return {fila[0]: fila[1] for fila in cursor.fetchall()}
+
+
+def verificar(cursor, es_postgresql):
+    """Compara lo declarado con la base. Devuelve (faltantes, sobrantes) como listas de nombres."""
+    existentes = indices_existentes(cursor, es_postgresql)
+    declarados = {indice.nombre for indice in INDICES}
+    faltantes = [indice.nombre for indice in INDICES if indice.nombre not in existentes]
+    sobrantes = sorted(nombre for nombre in existentes if nombre not in declarados)
+    return faltantes, sobrantes
+
+
+def sincronizar(cursor, es_postgresql):
+    """
+    Crea los índices declarados que falten y elimina los administrados que sobren.
+    Devuelve (creados, eliminados). No confirma la transacción.
+    """
+    faltantes, sobrantes = verificar(cursor, es_postgresql)
+    por_nombre = {indice.nombre: indice for indice in INDICES}
+    for nombre in faltantes:
+        cursor.execute(sentencia_creacion(por_nombre[nombre]))
+    for nombre in sobrantes:
+        cursor.execute(f'DROP INDEX IF EXISTS {nombre}')
+    return faltantes, sobrantes
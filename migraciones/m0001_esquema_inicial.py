@@ -0,0 +1,113 @@
+"""Esquema inicial: las tablas que antes creaba gestor_datos.crear_tablas()."""
+
+VERSION = 1
+DESCRIPCION = 'Esquema inicial (clientes, mecánicos, usuarios, vehículos, turnos, reparaciones)'
+
+
+def aplicar(cursor, es_postgresql):
+    # Define el tipo de ID auto-incremental según la base de datos
+    if es_postgresql:
+        id_type_sql = 'SERIAL PRIMARY KEY'
+    else:
+        id_type_sql = 'INTEGER PRIMARY KEY AUTOINCREMENT'
+
+    # IF NOT EXISTS: las bases creadas antes de existir las migraciones ya tienen estas tablas.
+
+    # Tabla Clientes
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS clientes (
+            id {id_type_sql},
+            nombre VARCHAR(255) NOT NULL,
+            apellido VARCHAR(255) NOT NULL,
+            telefono VARCHAR(50),
+            email VARCHAR(255),
+            dni VARCHAR(50) UNIQUE
+        )
+    ''')
+
+    # Tabla Usuarios_Clientes
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS usuarios_clientes (
+            id {id_type_sql},
+            cliente_id INT UNIQUE NOT NULL,
+            username VARCHAR(255) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Tabla Mecanicos
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS mecanicos (
+            id {id_type_sql},
+            nombre VARCHAR(255) NOT NULL,
+            apellido VARCHAR(255) NOT NULL,
+            telefono VARCHAR(50),
+            email VARCHAR(255)
+        )
+    ''')
+
+    # Tabla Usuarios_Mecanicos
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS usuarios_mecanicos (
+            id {id_type_sql},
+            mecanico_id INT UNIQUE NOT NULL,
+            username VARCHAR(255) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Tabla Vehiculos
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS vehiculos (
+            id {id_type_sql},
+            cliente_id INT NOT NULL,
+            patente VARCHAR(50) UNIQUE NOT NULL,
+            marca VARCHAR(255) NOT NULL,
+            modelo VARCHAR(255) NOT NULL,
+            anio INT,
+            kilometraje_inicial INT,
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Tabla Turnos
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS turnos (
+            id {id_type_sql},
+            cliente_id INT NOT NULL,
+            vehiculo_id INT NOT NULL,
+            mecanico_id INT,
+            fecha VARCHAR(50) NOT NULL,
+            hora VARCHAR(50) NOT NULL,
+            problema_reportado TEXT NOT NULL,
+            estado VARCHAR(50) NOT NULL DEFAULT 'Agendado',
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE,
+            FOREIGN KEY (vehiculo_id) REFERENCES vehiculos(id) ON DELETE CASCADE,
+            FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id) ON DELETE SET NULL
+        )
+    ''')
+
+    # Tabla Reparaciones
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS reparaciones (
+            id {id_type_sql},
+            vehiculo_id INT NOT NULL,
+            mecanico_id INT,
+            fecha_ingreso VARCHAR(50) NOT NULL,
+            fecha_salida VARCHAR(50),
+            kilometraje_ingreso INT NOT NULL,
+            kilometraje_salida INT,
+            problema_reportado TEXT,
+            trabajos_realizados TEXT,
+            repuestos_usados TEXT,
+            costo_mano_obra DECIMAL(10, 2),
+            costo_total DECIMAL(10, 2),
+            estado VARCHAR(50) NOT NULL DEFAULT 'En Progreso',
+            turno_origen_id INT UNIQUE,
+            FOREIGN KEY (vehiculo_id) REFERENCES vehiculos(id) ON DELETE CASCADE,
+            FOREIGN KEY (mecanico_id) REFERENCES mecanicos(id) ON DELETE SET NULL,
+            FOREIGN KEY (turno_origen_id) REFERENCES turnos(id) ON DELETE SET NULL
+        )
+    ''')
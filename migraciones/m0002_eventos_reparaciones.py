@@ -0,0 +1,23 @@
+"""Bandeja de salida de cambios en reparaciones, leída por el canal de eventos del portal de clientes."""
+
+VERSION = 2
+DESCRIPCION = 'Tabla eventos_reparaciones (notificaciones de cambios de estado y costos)'
+
+
+def aplicar(cursor, es_postgresql):
+    if es_postgresql:
+        id_type_sql = 'BIGSERIAL PRIMARY KEY'
+    else:
+        id_type_sql = 'INTEGER PRIMARY KEY AUTOINCREMENT'
+
+    # Una fila por cambio confirmado. Los lectores avanzan por id (clave primaria),
+    # así que consultar "lo nuevo desde el último id visto" no recorre la tabla.
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS eventos_reparaciones (
+            id {id_type_sql},
+            reparacion_id INT NOT NULL,
+            vehiculo_id INT NOT NULL,
+            estado VARCHAR(50),
+            creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
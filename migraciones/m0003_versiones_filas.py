@@ -0,0 +1,17 @@
+"""Versión y fecha de última modificación por fila, para los ETag/Last-Modified del portal de clientes."""
+
+VERSION = 3
+DESCRIPCION = 'Columnas version y actualizado_en en clientes, mecanicos, vehiculos y reparaciones'
+
+TABLAS_VERSIONADAS = ('clientes', 'mecanicos', 'vehiculos', 'reparaciones')
+
+
+def aplicar(cursor, es_postgresql):
+    # actualizado_en se guarda en UTC en ambos motores (CURRENT_TIMESTAMP de SQLite ya es UTC).
+    ahora = "(CURRENT_TIMESTAMP AT TIME ZONE 'UTC')" if es_postgresql else 'CURRENT_TIMESTAMP'
+    for tabla in TABLAS_VERSIONADAS:
+        # SQLite no admite un DEFAULT no constante al agregar columnas: gestor_datos completa
+        # actualizado_en en cada INSERT/UPDATE, y aquí se inicializan las filas existentes.
+        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN version INT NOT NULL DEFAULT 1')
+        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN actualizado_en TIMESTAMP')
+        cursor.execute(f'UPDATE {tabla} SET actualizado_en = {ahora}')
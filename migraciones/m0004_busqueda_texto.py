@@ -0,0 +1,77 @@
+"""Índices de búsqueda de texto para el typeahead de clientes y vehículos."""
+from .indices import TEXTO_BUSQUEDA_CLIENTES, TEXTO_BUSQUEDA_VEHICULOS, sin_puntuacion
+
+VERSION = 4
+DESCRIPCION = 'Búsqueda de texto en clientes (nombre, apellido, dni) y vehiculos (patente, marca, modelo)'
+
+# (tabla, tabla FTS5, columnas indexadas, columnas que además se indexan sin puntos ni guiones,
+#  expresión para el índice trigram de PostgreSQL)
+BUSQUEDAS = [
+    ('clientes', 'clientes_busqueda', ('nombre', 'apellido', 'dni'), ('dni',), TEXTO_BUSQUEDA_CLIENTES),
+    ('vehiculos', 'vehiculos_busqueda', ('patente', 'marca', 'modelo'), ('patente',), TEXTO_BUSQUEDA_VEHICULOS),
+]
+
+
+def _valores(fila, columnas, compactas):
+    return ', '.join([f'{fila}.{columna}' for columna in columnas]
+                     + [sin_puntuacion(f'{fila}.{columna}') for columna in compactas])
+
+
+def _aplicar_sqlite(cursor):
+    cursor.execute('PRAGMA compile_options')
+    if 'ENABLE_FTS5' not in {fila[0] for fila in cursor.fetchall()}:
+        raise RuntimeError("La búsqueda de texto necesita SQLite compilado con FTS5.")
+    for tabla, fts, columnas, compactas, _ in BUSQUEDAS:
+        lista = ', '.join([*columnas, *(f'{columna}_compacto' for columna in compactas)])
+        nuevas = _valores('new', columnas, compactas)
+        viejas = _valores('old', columnas, compactas)
+        # unicode61 parte "AB-123-CD" en ab/123/cd: la copia sin puntuación (patente_compacto,
+        # dni_compacto) es la que encuentra "AB123" o "AB-123", que se buscan como "AB123".
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS {fts}_contenido AS
+            SELECT id, {', '.join(columnas)},
+                   {', '.join(f'{sin_puntuacion(columna)} AS {columna}_compacto' for columna in compactas)}
+            FROM {tabla}
+        ''')
+        # Tabla FTS5 de contenido externo: guarda sólo el índice invertido y lee las columnas de
+        # la vista anterior. remove_diacritics hace que "perez" encuentre "Pérez"; prefix agrega
+        # índices para los prefijos cortos que escribe el typeahead.
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {lista}, content='{fts}_contenido', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+            )
+        ''')
+        # Los triggers la mantienen al día. El de UPDATE sólo mira las columnas indexadas:
+        # los sellos de versión no reescriben el índice.
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {fts} (rowid, {lista}) VALUES (new.id, {nuevas});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejas});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {', '.join(columnas)} ON {tabla} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejas});
+                INSERT INTO {fts} (rowid, {lista}) VALUES (new.id, {nuevas});
+            END
+        ''')
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _aplicar_postgresql(cursor):
+    cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for tabla, fts, _, _, expresion in BUSQUEDAS:
+        # Sin el prefijo idx_: indices.sincronizar() no los administra (no son portables a SQLite).
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {fts}_trgm ON {tabla} USING GIN ({expresion} gin_trgm_ops)')
+
+
+def aplicar(cursor, es_postgresql):
+    if es_postgresql:
+        _aplicar_postgresql(cursor)
+    else:
+        _aplicar_sqlite(cursor)
@@ -0,0 +1,154 @@
+"""
+Fechas como fechas: turnos pasa de fecha + hora (texto) a una sola columna fecha_hora TIMESTAMP,
+y las fechas de reparaciones se normalizan a 'YYYY-MM-DD' (DATE en PostgreSQL).
+
+SQLite no tiene tipos de fecha: guarda texto ISO 8601 ('YYYY-MM-DD HH:MM:SS'), que ordena y
+compara igual que las fechas, así que los índices sirven para consultas por rango. Por eso
+allí basta con normalizar el texto; cambiar el tipo declarado exigiría reconstruir la tabla.
+
+Si alguna fecha u hora no se reconoce, la migración no se aplica (no hay un valor que inventar
+para ellas). `python db_setup.py fechas` las lista antes de migrar y `--corregir` permite
+reemplazarlas una por una.
+"""
+from datetime import datetime
+
+VERSION = 5
+DESCRIPCION = 'Columna turnos.fecha_hora (TIMESTAMP) y fechas de reparaciones normalizadas'
+
+# Formatos que aceptaron los formularios a lo largo del tiempo, además de ISO 8601.
+_FORMATOS_FECHA = ('%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+_FORMATOS_HORA = ('%H:%M', '%H:%M:%S', '%H.%M', '%I:%M %p')
+_LOTE = 1000
+
+
+def _fecha(texto):
+    texto = (texto or '').strip()
+    if not texto:
+        return None
+    try:
+        return datetime.fromisoformat(texto).date()
+    except ValueError:
+        pass
+    for formato in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(texto)
+
+
+def _hora(texto):
+    texto = (texto or '').strip()
+    for formato in _FORMATOS_HORA:
+        try:
+            return datetime.strptime(texto, formato).time()
+        except ValueError:
+            continue
+    raise ValueError(texto)
+
+
+def _fecha_requerida(texto):
+    fecha = _fecha(texto)
+    if fecha is None:
+        raise ValueError(texto)
+    return fecha
+
+
+# Qué exige esta migración de cada columna de fecha del esquema anterior.
+CONVERTIDORES = {
+    'turnos': {'fecha': _fecha_requerida, 'hora': _hora},
+    'reparaciones': {'fecha_ingreso': _fecha_requerida, 'fecha_salida': _fecha},
+}
+
+
+def _columnas_no_reconocidas(valores, convertidores):
+    invalidas = []
+    for columna, convertir in convertidores.items():
+        try:
+            convertir(valores[columna])
+        except ValueError:
+            invalidas.append(columna)
+    return invalidas
+
+
+def fechas_no_reconocidas(cursor):
+    """
+    Filas que esta migración no podría convertir: [(tabla, id, {columna: valor}), ...] con sólo
+    las columnas rechazadas. Lee el esquema anterior, así que sirve mientras la versión sea < 5.
+    """
+    encontradas = []
+    for tabla, convertidores in CONVERTIDORES.items():
+        columnas = list(convertidores)
+        cursor.execute(f"SELECT id, {', '.join(columnas)} FROM {tabla} ORDER BY id")
+        for fila in cursor.fetchall():
+            valores = dict(zip(columnas, fila[1:]))
+            invalidas = _columnas_no_reconocidas(valores, convertidores)
+            if invalidas:
+                encontradas.append((tabla, fila[0], {columna: valores[columna] for columna in invalidas}))
+    return encontradas
+
+
+def _sin_reconocer(descripcion, invalidos):
+    return RuntimeError(f"{descripcion} con fecha u hora no reconocida: "
+                        f"{', '.join(map(str, invalidos[:20]))}{' ...' if len(invalidos) > 20 else ''}. "
+                        f"Revisar y corregir esas fechas con 'python db_setup.py fechas --corregir' antes de migrar.")
+
+
+def _actualizar_en_lotes(cursor, sql, filas):
+    for inicio in range(0, len(filas), _LOTE):
+        cursor.executemany(sql, filas[inicio:inicio + _LOTE])
+
+
+def _migrar_turnos(cursor, es_postgresql, p):
+    cursor.execute('ALTER TABLE turnos ADD COLUMN fecha_hora TIMESTAMP')
+    cursor.execute('SELECT id, fecha, hora FROM turnos')
+    filas, invalidos = [], []
+    for turno_id, fecha, hora in cursor.fetchall():
+        try:
+            fecha_hora = datetime.combine(_fecha_requerida(fecha), _hora(hora))
+        except ValueError:
+            invalidos.append(turno_id)
+            continue
+        filas.append((fecha_hora.strftime('%Y-%m-%d %H:%M:%S'), turno_id))
+    if invalidos:
+        raise _sin_reconocer('Turnos', invalidos)
+    _actualizar_en_lotes(cursor, f'UPDATE turnos SET fecha_hora = {p} WHERE id = {p}', filas)
+
+    # SQLite no elimina una columna que forma parte de un índice: se quitan antes los índices
+    # sobre fecha/hora (indices.sincronizar los borraría recién después de las migraciones).
+    cursor.execute('DROP INDEX IF EXISTS idx_turnos_fecha_hora')
+    cursor.execute('DROP INDEX IF EXISTS idx_turnos_listado_fecha_hora_id')
+    cursor.execute('ALTER TABLE turnos DROP COLUMN fecha')
+    cursor.execute('ALTER TABLE turnos DROP COLUMN hora')
+    if es_postgresql:
+        # En SQLite no se puede agregar NOT NULL a una columna existente; gestor_datos siempre la completa.
+        cursor.execute('ALTER TABLE turnos ALTER COLUMN fecha_hora SET NOT NULL')
+
+
+def _migrar_reparaciones(cursor, es_postgresql, p):
+    cursor.execute('SELECT id, fecha_ingreso, fecha_salida FROM reparaciones')
+    filas, invalidos = [], []
+    for reparacion_id, ingreso, salida in cursor.fetchall():
+        try:
+            nuevo_ingreso, nueva_salida = _fecha_requerida(ingreso), _fecha(salida)
+        except ValueError:
+            invalidos.append(reparacion_id)
+            continue
+        nuevo_ingreso = nuevo_ingreso.isoformat()
+        nueva_salida = nueva_salida.isoformat() if nueva_salida else None
+        if (nuevo_ingreso, nueva_salida) != (ingreso, salida):
+            filas.append((nuevo_ingreso, nueva_salida, reparacion_id))
+    if invalidos:
+        raise _sin_reconocer('Reparaciones', invalidos)
+    _actualizar_en_lotes(cursor, f'UPDATE reparaciones SET fecha_ingreso = {p}, fecha_salida = {p} WHERE id = {p}',
+                         filas)
+    if es_postgresql:
+        cursor.execute('ALTER TABLE reparaciones '
+                       'ALTER COLUMN fecha_ingreso TYPE DATE USING fecha_ingreso::date, '
+                       'ALTER COLUMN fecha_salida TYPE DATE USING fecha_salida::date')
+
+
+def aplicar(cursor, es_postgresql):
+    p = '%s' if es_postgresql else '?'
+    _migrar_turnos(cursor, es_postgresql, p)
+    _migrar_reparaciones(cursor, es_postgresql, p)
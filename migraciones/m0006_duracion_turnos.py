@@ -0,0 +1,16 @@
+"""Duración de los turnos: tipo de trabajo y hora de fin, para detectar superposiciones en la agenda."""
+
+VERSION = 6
+DESCRIPCION = 'Columnas tipo_trabajo y fin en turnos'
+
+
+def aplicar(cursor, es_postgresql):
+    cursor.execute("ALTER TABLE turnos ADD COLUMN tipo_trabajo VARCHAR(50) NOT NULL DEFAULT 'General'")
+    cursor.execute('ALTER TABLE turnos ADD COLUMN fin TIMESTAMP')
+    # Los turnos existentes quedan con la duración del tipo 'General' (60 minutos).
+    if es_postgresql:
+        cursor.execute("UPDATE turnos SET fin = fecha_hora + INTERVAL '60 minutes'")
+        cursor.execute('ALTER TABLE turnos ALTER COLUMN fin SET NOT NULL')
+    else:
+        # datetime() devuelve 'YYYY-MM-DD HH:MM:SS', el mismo formato que fecha_hora.
+        cursor.execute("UPDATE turnos SET fin = datetime(fecha_hora, '+60 minutes')")
@@ -0,0 +1,36 @@
+"""
+Resumen diario de reparaciones para el tablero: una fila por día de ingreso, mecánico y estado
+con la cantidad de reparaciones, las que ya salieron, sus días en el taller y la suma de
+costo_total. gestor_datos lo mantiene al día en cada escritura sobre reparaciones; aquí se
+carga con las reparaciones existentes.
+"""
+
+VERSION = 7
+DESCRIPCION = 'Tabla resumen_reparaciones_diario (indicadores del tablero)'
+
+
+def aplicar(cursor, es_postgresql):
+    # mecanico_id 0 agrupa las reparaciones sin mecánico (una clave primaria no admite NULL).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_reparaciones_diario (
+            dia DATE NOT NULL,
+            mecanico_id INT NOT NULL,
+            estado VARCHAR(50) NOT NULL,
+            cantidad INT NOT NULL,
+            finalizadas INT NOT NULL,
+            dias_en_taller INT NOT NULL,
+            facturado DECIMAL(12, 2) NOT NULL,
+            PRIMARY KEY (dia, mecanico_id, estado)
+        )
+    ''')
+    if es_postgresql:
+        dias = 'fecha_salida - fecha_ingreso'
+    else:
+        dias = 'CAST(julianday(fecha_salida) - julianday(fecha_ingreso) AS INTEGER)'
+    cursor.execute(f'''
+        INSERT INTO resumen_reparaciones_diario (dia, mecanico_id, estado, cantidad, finalizadas, dias_en_taller, facturado)
+        SELECT fecha_ingreso, COALESCE(mecanico_id, 0), estado, COUNT(*), COUNT(fecha_salida),
+               COALESCE(SUM({dias}), 0), COALESCE(SUM(costo_total), 0)
+        FROM reparaciones
+        GROUP BY fecha_ingreso, COALESCE(mecanico_id, 0), estado
+    ''')
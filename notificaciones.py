@@ -0,0 +1,192 @@
+"""
+Canal de notificaciones de cambios en reparaciones para el portal de clientes.
+
+La aplicación de mecánicos y la de clientes son procesos distintos: los cambios llegan a
+través de la tabla eventos_reparaciones (ver gestor_datos). En cada proceso, un único hilo
+lector reparte los eventos nuevos entre las suscripciones abiertas (una por conexión de
+Server-Sent Events), filtrando por vehículo.
+
+El hilo sólo existe mientras haya suscripciones: sin clientes conectados no hay consultas.
+Con PostgreSQL espera un NOTIFY en una conexión dedicada; con SQLite consulta la tabla cada
+INTERVALO_SONDEO segundos (una lectura por clave primaria, sin importar cuántos clientes
+estén conectados). Los cambios hechos en el mismo proceso lo despiertan de inmediato.
+"""
+import logging
+import os
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error as Psycopg2Error
+
+import gestor_datos
+
+log = logging.getLogger(__name__)
+
+INTERVALO_SONDEO = float(os.environ.get('EVENTOS_INTERVALO_SONDEO', '2'))
+# Conexiones de eventos abiertas a la vez por proceso: cada una ocupa un hilo del servidor
+# mientras dura. Las que pasan el límite reciben un canal vacío y reintentan más tarde.
+CONEXIONES_MAXIMAS = int(os.environ.get('EVENTOS_CONEXIONES_MAXIMAS', '50'))
+# Con LISTEN/NOTIFY igualmente se relee la tabla cada tanto, por si se perdió un aviso.
+ESPERA_MAXIMA_NOTIFY = 30.0
+RETENCION_HORAS = 24
+INTERVALO_PURGA = 3600.0
+CAPACIDAD_SUSCRIPCION = 100
+LOTE_EVENTOS = 500
+
+# Evento que indica al cliente que recargue todo (su cola se desbordó).
+RESINCRONIZAR = {'tipo': 'resincronizar'}
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión, limitada a los vehículos del cliente."""
+
+    def __init__(self, vehiculo_ids):
+        self.vehiculo_ids = frozenset(vehiculo_ids)
+        self._cola = queue.Queue(maxsize=CAPACIDAD_SUSCRIPCION)
+        self._desbordada = False
+
+    def entregar(self, evento):
+        if evento['vehiculo_id'] not in self.vehiculo_ids:
+            return
+        try:
+            self._cola.put_nowait(evento)
+        except queue.Full:
+            self._desbordada = True
+
+    def esperar(self, timeout):
+        """Devuelve el próximo evento, RESINCRONIZAR si se perdieron eventos, o None si venció el timeout."""
+        if self._desbordada:
+            self._desbordada = False
+            while True:
+                try:
+                    self._cola.get_nowait()
+                except queue.Empty:
+                    return RESINCRONIZAR
+        try:
+            return self._cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class CentralNotificaciones:
+    """Reparte los eventos de eventos_reparaciones entre las suscripciones del proceso."""
+
+    def __init__(self, intervalo=INTERVALO_SONDEO):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._hilo = None
+        self._despertar = threading.Event()
+        self._ultimo_id = 0
+        self._ultima_purga = 0.0
+
+    def suscribir(self, vehiculo_ids, maximo=CONEXIONES_MAXIMAS):
+        """Abre una suscripción; devuelve None si el proceso ya tiene `maximo` abiertas."""
+        suscripcion = Suscripcion(vehiculo_ids)
+        with self._lock:
+            if len(self._suscripciones) >= maximo:
+                return None
+            self._suscripciones.add(suscripcion)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escuchar, name='notificaciones-reparaciones', daemon=True)
+                self._hilo.start()
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+        self._despertar.set()
+
+    def despertar(self):
+        """Pide al hilo lector que revise la tabla ya (se llama tras confirmar un cambio en este proceso)."""
+        self._despertar.set()
+
+    def publicar(self, evento):
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(evento)
+
+    def cantidad_suscripciones(self):
+        with self._lock:
+            return len(self._suscripciones)
+
+    def _debe_terminar(self):
+        with self._lock:
+            if not self._suscripciones:
+                self._hilo = None
+                return True
+            return False
+
+    def _abrir_escucha_postgres(self):
+        """Conexión dedicada (fuera del pool) en autocommit para LISTEN; None con SQLite o si falla."""
+        if not gestor_datos.DATABASE_URL:
+            return None
+        try:
+            conn = psycopg2.connect(gestor_datos.DATABASE_URL)
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f'LISTEN {gestor_datos.CANAL_EVENTOS_REPARACIONES}')
+            cursor.close()
+            return conn
+        except Psycopg2Error as e:
+            log.warning("No se pudo escuchar notificaciones de PostgreSQL, se usará sondeo: %s", e)
+            return None
+
+    def _esperar_cambios(self, escucha):
+        if escucha is None:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            return escucha
+        try:
+            # El evento local no interrumpe select(); los cambios de este proceso igual llegan por NOTIFY.
+            if select.select([escucha], [], [], ESPERA_MAXIMA_NOTIFY) != ([], [], []):
+                escucha.poll()
+                escucha.notifies.clear()
+            self._despertar.clear()
+            return escucha
+        except (Psycopg2Error, OSError) as e:
+            log.warning("Se perdió la conexión de notificaciones de PostgreSQL: %s", e)
+            try:
+                escucha.close()
+            except Psycopg2Error:
+                pass
+            return None
+
+    def _leer_nuevos(self):
+        while True:
+            eventos = gestor_datos.obtener_eventos_reparaciones_desde(self._ultimo_id, LOTE_EVENTOS)
+            for evento in eventos:
+                self._ultimo_id = evento['id']
+                self.publicar(evento)
+            if len(eventos) < LOTE_EVENTOS:
+                return
+
+    def _escuchar(self):
+        # Sólo interesan los cambios posteriores a la conexión: el estado inicial lo piden los clientes.
+        escucha = self._abrir_escucha_postgres()
+        self._ultimo_id = gestor_datos.obtener_ultimo_evento_reparaciones()
+        try:
+            while not self._debe_terminar():
+                try:
+                    self._leer_nuevos()
+                    if time.monotonic() - self._ultima_purga > INTERVALO_PURGA:
+                        self._ultima_purga = time.monotonic()
+                        gestor_datos.purgar_eventos_reparaciones(RETENCION_HORAS)
+                except Exception as e:
+                    log.error("Error al leer eventos de reparaciones: %s", e)
+                escucha = self._esperar_cambios(escucha)
+        finally:
+            if escucha is not None:
+                try:
+                    escucha.close()
+                except Psycopg2Error:
+                    pass
+
+
+# Una central por proceso.
+central = CentralNotificaciones()
+gestor_datos.suscribir_cambios_reparaciones(central.despertar)
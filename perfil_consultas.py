@@ -0,0 +1,252 @@
+"""
+Perfil de las consultas a la base de datos.
+
+Las conexiones del pool usan los cursores medidos de este módulo: cada execute() registra su
+duración, las filas que devuelve o modifica y la función de gestor_datos que la emitió.
+Las mediciones se agregan por (función, sentencia) en histogramas de latencia, y las que
+superan CONSULTA_LENTA_MS se escriben en el log 'perfil_consultas.lentas' sin los valores de
+los parámetros (sólo sus tipos). instantanea() devuelve el resumen que muestra /admin/consultas.
+
+PERFIL_CONSULTAS=0 desactiva la medición (las conexiones vuelven a los cursores nativos).
+"""
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from psycopg2 import extensions as psycopg2_ext
+
+import metricas
+
+ACTIVO = os.environ.get('PERFIL_CONSULTAS', '1') != '0'
+CONSULTA_LENTA_MS = float(os.environ.get('CONSULTA_LENTA_MS', '250'))
+# Tope de sentencias distintas que se agregan; las que superan el tope se cuentan aparte.
+MAX_SENTENCIAS = 2000
+
+log_lentas = logging.getLogger('perfil_consultas.lentas')
+
+_PLACEHOLDERS_REPETIDOS = re.compile(r'(?:\?|%s)(?:\s*,\s*(?:\?|%s))+')
+
+
+class EstadisticaConsulta:
+    __slots__ = ('funcion', 'sql', 'histograma', 'filas', 'lectura_ms', '_lock')
+
+    def __init__(self, funcion, sql):
+        self.funcion = funcion
+        self.sql = sql
+        self.histograma = metricas.Histograma()
+        self.filas = 0
+        self.lectura_ms = 0.0
+        self._lock = threading.Lock()
+
+    def sumar(self, filas, lectura_ms=0.0):
+        with self._lock:
+            self.filas += filas
+            self.lectura_ms += lectura_ms
+
+
+_estadisticas = {}
+_descartadas = 0
+_lock = threading.Lock()
+
+
+def _normalizar(sql):
+    """Sentencia en una línea, con las listas de placeholders (IN (?, ?, ...)) colapsadas."""
+    return _PLACEHOLDERS_REPETIDOS.sub('?, ...', ' '.join(sql.split()))
+
+
+def _redactar(parametros):
+    """Describe los parámetros sin sus valores: sólo los tipos."""
+    if not parametros:
+        return '[]'
+    if isinstance(parametros, dict):
+        return '{' + ', '.join(f'{clave}: {type(valor).__name__}' for clave, valor in parametros.items()) + '}'
+    return '[' + ', '.join(type(valor).__name__ for valor in parametros) + ']'
+
+
+def _funcion_llamadora():
+    """
+    Función pública de gestor_datos que originó la consulta: la más externa de la cadena de
+    llamadas dentro de gestor_datos (así _pagina_keyset se atribuye a obtener_clientes_paginados).
+    Si la consulta no viene de gestor_datos, el primer llamador fuera de este módulo.
+    """
+    marco = sys._getframe(2)
+    elegida = None
+    primera = None
+    while marco is not None:
+        modulo = marco.f_globals.get('__name__')
+        if modulo == 'gestor_datos':
+            elegida = marco.f_code.co_name
+        elif elegida is not None:
+            break
+        elif primera is None and modulo != __name__:
+            primera = f'{modulo}.{marco.f_code.co_name}'
+        marco = marco.f_back
+    return elegida or primera or '?'
+
+
+def _entrada(funcion, sql):
+    global _descartadas
+    clave = (funcion, sql)
+    entrada = _estadisticas.get(clave)
+    if entrada is None:
+        with _lock:
+            entrada = _estadisticas.get(clave)
+            if entrada is None:
+                if len(_estadisticas) >= MAX_SENTENCIAS:
+                    _descartadas += 1
+                    return None
+                entrada = EstadisticaConsulta(funcion, sql)
+                _estadisticas[clave] = entrada
+    return entrada
+
+
+def registrar(sql, parametros, duracion_ms, filas):
+    """Anota una ejecución. Devuelve la entrada agregada (para sumarle las filas leídas después)."""
+    funcion = _funcion_llamadora()
+    texto = _normalizar(sql)
+    entrada = _entrada(funcion, texto)
+    if entrada is not None:
+        entrada.histograma.observar(duracion_ms)
+        if filas > 0:
+            entrada.sumar(filas)
+    if duracion_ms >= CONSULTA_LENTA_MS:
+        log_lentas.warning("Consulta lenta (%.1f ms, %s filas) en %s: %s | parámetros: %s",
+                           duracion_ms, filas if filas >= 0 else '?', funcion, texto, _redactar(parametros))
+    return entrada
+
+
+def instantanea(limite=50):
+    """Las `limite` sentencias con más tiempo acumulado, con sus percentiles y filas."""
+    with _lock:
+        entradas = list(_estadisticas.values())
+        descartadas = _descartadas
+    resumen = []
+    for entrada in entradas:
+        datos = entrada.histograma.instantanea()
+        if not datos['cantidad']:
+            continue
+        resumen.append({
+            'funcion': entrada.funcion,
+            'sql': entrada.sql,
+            'ejecuciones': datos['cantidad'],
+            'total_ms': round(datos['suma'], 3),
+            'promedio_ms': round(datos['suma'] / datos['cantidad'], 3),
+            'p50_ms': entrada.histograma.percentil(50, datos),
+            'p95_ms': entrada.histograma.percentil(95, datos),
+            'p99_ms': entrada.histograma.percentil(99, datos),
+            'max_ms': round(datos['maximo'], 3),
+            'filas': entrada.filas,
+            'filas_por_ejecucion': round(entrada.filas / datos['cantidad'], 2),
+            'lectura_ms': round(entrada.lectura_ms, 3),
+            'histograma': [[limite_ms if limite_ms != float('inf') else '+Inf', acumulado]
+                           for limite_ms, acumulado in datos['buckets']],
+        })
+    resumen.sort(key=lambda fila: fila['total_ms'], reverse=True)
+    return {
+        'umbral_lenta_ms': CONSULTA_LENTA_MS,
+        'sentencias': len(entradas),
+        'sentencias_descartadas': descartadas,
+        'consultas': resumen[:limite],
+    }
+
+
+def _histogramas_por_funcion():
+    """Suma los histogramas de todas las sentencias de cada función (para /metrics)."""
+    with _lock:
+        entradas = list(_estadisticas.values())
+    por_funcion = {}
+    for entrada in entradas:
+        datos = entrada.histograma.instantanea()
+        total = por_funcion.get(entrada.funcion)
+        if total is None:
+            por_funcion[entrada.funcion] = datos
+            continue
+        total['buckets'] = [(limite, acumulado + otro)
+                            for (limite, acumulado), (_, otro) in zip(total['buckets'], datos['buckets'])]
+        total['cantidad'] += datos['cantidad']
+        total['suma'] += datos['suma']
+        total['maximo'] = max(total['maximo'], datos['maximo'])
+    return [((funcion,), datos) for funcion, datos in por_funcion.items()]
+
+
+metricas.Calculada('taller_db_consulta_duracion_seconds', 'Duración de las sentencias SQL por función de gestor_datos.',
+                   ('funcion',), _histogramas_por_funcion, tipo='histogram')
+
+
+def reiniciar():
+    global _descartadas
+    with _lock:
+        _estadisticas.clear()
+        _descartadas = 0
+
+
+# --- Cursores medidos ---
+class CursorPostgresMedido(psycopg2_ext.cursor):
+    """
+    Cursor de psycopg2 que mide cada sentencia. El cursor es del lado del cliente: al terminar
+    execute() el resultado ya está en memoria, así que rowcount ya tiene las filas.
+    """
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            registrar(query, vars, (time.perf_counter() - inicio) * 1000.0, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            registrar(query, None, (time.perf_counter() - inicio) * 1000.0, self.rowcount)
+
+
+class CursorSQLiteMedido(sqlite3.Cursor):
+    """
+    Cursor de sqlite3 que mide cada sentencia. SQLite produce las filas a medida que se leen:
+    execute() mide hasta la primera fila, y las lecturas posteriores suman sus filas y su
+    tiempo (lectura_ms) a la misma sentencia.
+    """
+    _entrada = None
+
+    def execute(self, sql, parameters=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._entrada = registrar(sql, parameters, (time.perf_counter() - inicio) * 1000.0, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._entrada = registrar(sql, None, (time.perf_counter() - inicio) * 1000.0, self.rowcount)
+
+    def _leido(self, inicio, filas):
+        entrada = self._entrada
+        if entrada is not None:
+            entrada.sumar(filas, (time.perf_counter() - inicio) * 1000.0)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        self._leido(inicio, 1 if fila is not None else 0)
+        return fila
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        self._leido(inicio, len(filas))
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        self._leido(inicio, len(filas))
+        return filas
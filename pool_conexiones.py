@@ -0,0 +1,388 @@
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+
+import psycopg2
+from psycopg2 import Error as Psycopg2Error
+from psycopg2 import extensions as psycopg2_ext
+
+import metricas
+import perfil_consultas
+
+log = logging.getLogger(__name__)
+
+espera_conexion = metricas.HistogramaEtiquetado(
+    'taller_db_espera_conexion_seconds', 'Tiempo hasta obtener una conexión del pool de PostgreSQL.')
+
+
+class PoolAgotadoError(Exception):
+    """Se lanza cuando no se libera ninguna conexión dentro del tiempo de espera configurado."""
+
+
+# --- Conexiones que vuelven al pool al llamar a close() ---
+# Todo gestor_datos termina sus funciones con conn.close(). Subclasificando las conexiones
+# nativas, close() devuelve la conexión al pool sin tocar ese código, y las comprobaciones
+# isinstance(conn, psycopg2.extensions.connection) siguen funcionando igual.
+# Si la conexión pertenece a una unidad de trabajo (ver unidad_trabajo.py), commit(),
+# rollback() y close() actúan sobre el savepoint de la función en lugar de la transacción.
+class _ConexionAdministrada:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._unidad = None
+        self._ultimo_uso = time.monotonic()
+
+    def commit(self):
+        if self._unidad is not None:
+            self._unidad.confirmar_marca()
+        else:
+            super().commit()
+
+    def rollback(self):
+        if self._unidad is not None:
+            self._unidad.deshacer_marca()
+        else:
+            super().rollback()
+
+    def close(self):
+        if self._unidad is not None:
+            self._unidad.salir()
+        elif self._pool is not None:
+            self._pool.devolver(self)
+        else:
+            super().close()
+
+    def commit_fisico(self):
+        """Confirma la transacción real, aunque la conexión esté en una unidad de trabajo."""
+        super().commit()
+
+    def rollback_fisico(self):
+        """Deshace la transacción real, aunque la conexión esté en una unidad de trabajo."""
+        super().rollback()
+
+    def cerrar_definitivamente(self):
+        """Cierra la conexión física, sin devolverla al pool."""
+        self._pool = None
+        self._unidad = None
+        super().close()
+
+
+class ConexionPostgresPool(_ConexionAdministrada, psycopg2_ext.connection):
+    """Conexión de psycopg2 administrada por un PoolPostgreSQL."""
+
+
+class ConexionSQLitePool(_ConexionAdministrada, sqlite3.Connection):
+    """Conexión de sqlite3 administrada por un PoolSQLitePorHilo."""
+    # Equivalente al cursor_factory de psycopg2: clase de cursor por defecto de la conexión.
+    fabrica_cursor = sqlite3.Cursor
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or self.fabrica_cursor)
+
+
+# --- Pool para PostgreSQL ---
+class PoolPostgreSQL:
+    """
+    Pool acotado de conexiones a PostgreSQL.
+    Mantiene entre `minimo` y `maximo` conexiones físicas; si todas están en uso,
+    obtener() espera hasta `timeout` segundos y luego lanza PoolAgotadoError.
+    Las conexiones inactivas por más de `verificar_tras` segundos se comprueban con
+    un SELECT 1 antes de entregarse, y las que superan `inactividad_maxima` se cierran
+    (respetando el mínimo).
+    """
+
+    def __init__(self, dsn, minimo=1, maximo=10, timeout=30.0, verificar_tras=30.0, inactividad_maxima=600.0):
+        if minimo < 0 or maximo < 1 or minimo > maximo:
+            raise ValueError(f"Tamaños de pool inválidos: minimo={minimo}, maximo={maximo}")
+        self.dsn = dsn
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout = timeout
+        self.verificar_tras = verificar_tras
+        self.inactividad_maxima = inactividad_maxima
+
+        self._cond = threading.Condition()
+        self._inactivas = deque()
+        self._en_uso = 0
+        self._total = 0
+        self._cerrado = False
+
+        self._obtenciones = 0
+        self._esperas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+        self._agotamientos = 0
+        self._creadas = 0
+        self._descartadas = 0
+
+        for _ in range(minimo):
+            try:
+                conn = self._nueva_conexion()
+            except Psycopg2Error as e:
+                log.error("Error al precargar el pool de PostgreSQL: %s", e)
+                break
+            with self._cond:
+                self._total += 1
+                self._inactivas.append(conn)
+
+    def _nueva_conexion(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=ConexionPostgresPool)
+        conn._pool = self
+        if perfil_consultas.ACTIVO:
+            conn.cursor_factory = perfil_consultas.CursorPostgresMedido
+        self._creadas += 1
+        log.debug("Nueva conexión a PostgreSQL abierta en el pool.")
+        return conn
+
+    def _esta_sana(self, conn):
+        """Comprobación en la entrega: estado local siempre, y ping si estuvo inactiva un tiempo."""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == psycopg2_ext.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - conn._ultimo_uso >= self.verificar_tras:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+                conn.rollback_fisico()
+            except Psycopg2Error:
+                return False
+        return True
+
+    def _descartar(self, conn):
+        self._descartadas += 1
+        try:
+            conn.cerrar_definitivamente()
+        except Psycopg2Error:
+            pass
+
+    def obtener(self):
+        """Entrega una conexión libre, creando una nueva si hay cupo o esperando si no lo hay."""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        hubo_espera = False
+        with self._cond:
+            while True:
+                if self._cerrado:
+                    raise PoolAgotadoError("El pool de conexiones está cerrado.")
+                if self._inactivas:
+                    conn = self._inactivas.pop()
+                    break
+                if self._total < self.maximo:
+                    self._total += 1
+                    conn = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._agotamientos += 1
+                    raise PoolAgotadoError(
+                        f"No se obtuvo una conexión en {self.timeout}s ({self.maximo} en uso)."
+                    )
+                hubo_espera = True
+                self._cond.wait(restante)
+
+            self._en_uso += 1
+            self._obtenciones += 1
+            espera = time.monotonic() - inicio
+            espera_conexion.observar(espera * 1000.0)
+            if hubo_espera:
+                self._esperas += 1
+                self._tiempo_espera_total += espera
+                self._tiempo_espera_max = max(self._tiempo_espera_max, espera)
+
+        # La conexión física se crea o comprueba fuera del lock para no bloquear al resto.
+        try:
+            if conn is not None and not self._esta_sana(conn):
+                self._descartar(conn)
+                conn = None
+            if conn is None:
+                conn = self._nueva_conexion()
+        except Exception:
+            with self._cond:
+                self._en_uso -= 1
+                self._total -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def devolver(self, conn):
+        """Recibe una conexión liberada: descarta la transacción abierta y la deja disponible."""
+        sana = False
+        if not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2_ext.TRANSACTION_STATUS_IDLE:
+                    conn.rollback_fisico()
+                sana = True
+            except Psycopg2Error:
+                sana = False
+
+        a_cerrar = []
+        with self._cond:
+            self._en_uso -= 1
+            if sana and not self._cerrado:
+                conn._ultimo_uso = time.monotonic()
+                self._inactivas.append(conn)
+            else:
+                self._total -= 1
+                a_cerrar.append(conn)
+            # Las más antiguas quedan a la izquierda: se recortan mientras sobren conexiones.
+            ahora = time.monotonic()
+            while (self._inactivas and self._total > self.minimo
+                   and ahora - self._inactivas[0]._ultimo_uso > self.inactividad_maxima):
+                a_cerrar.append(self._inactivas.popleft())
+                self._total -= 1
+            self._cond.notify()
+
+        for vieja in a_cerrar:
+            self._descartar(vieja)
+
+    def cerrar(self):
+        """Cierra todas las conexiones inactivas; las que están en uso se cierran al devolverse."""
+        with self._cond:
+            self._cerrado = True
+            inactivas = list(self._inactivas)
+            self._inactivas.clear()
+            self._total -= len(inactivas)
+            self._cond.notify_all()
+        for conn in inactivas:
+            self._descartar(conn)
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                'motor': 'postgresql',
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'total': self._total,
+                'en_uso': self._en_uso,
+                'inactivas': len(self._inactivas),
+                'obtenciones': self._obtenciones,
+                'esperas': self._esperas,
+                'tiempo_espera_total': self._tiempo_espera_total,
+                'tiempo_espera_max': self._tiempo_espera_max,
+                'tiempo_espera_promedio': (self._tiempo_espera_total / self._esperas) if self._esperas else 0.0,
+                'agotamientos': self._agotamientos,
+                'creadas': self._creadas,
+                'descartadas': self._descartadas,
+            }
+
+
+# --- Pool para SQLite ---
+class PoolSQLitePorHilo:
+    """
+    Reutiliza una conexión SQLite por hilo (sqlite3 no permite compartirlas entre hilos).
+    Las llamadas anidadas del mismo hilo reciben la misma conexión; sólo al liberarse la
+    última se descarta cualquier transacción que haya quedado abierta.
+    """
+
+    def __init__(self, ruta, timeout=30.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._abiertas = 0
+        self._en_uso = 0
+        self._obtenciones = 0
+        self._creadas = 0
+        self._descartadas = 0
+
+    def _al_liberarse(self):
+        with self._lock:
+            self._abiertas -= 1
+
+    def _nueva_conexion(self):
+        # La caché de sentencias compiladas tiene que abarcar todas las de sentencias.py (más las
+        # formas de paginación); con el tope por defecto (128) se desalojarían unas a otras.
+        conn = sqlite3.connect(self.ruta, timeout=self.timeout, factory=ConexionSQLitePool,
+                               cached_statements=512)
+        conn.row_factory = sqlite3.Row # Esto ya debería permitir acceso por nombre
+        # Cada petición mantiene abierta su transacción (unidad de trabajo). Con el journal
+        # clásico, esas lecturas solapadas impiden confirmar a cualquier escritor hasta agotar
+        # el timeout; en modo WAL los lectores no bloquean al escritor ni el escritor a ellos.
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn._pool = self
+        if perfil_consultas.ACTIVO:
+            conn.fabrica_cursor = perfil_consultas.CursorSQLiteMedido
+        # Si el hilo termina, threading.local suelta la conexión y se descuenta aquí.
+        weakref.finalize(conn, self._al_liberarse)
+        with self._lock:
+            self._abiertas += 1
+            self._creadas += 1
+        log.debug("Nueva conexión a SQLite abierta para este hilo.")
+        return conn
+
+    @staticmethod
+    def _esta_sana(conn):
+        try:
+            conn.total_changes
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+    def obtener(self):
+        conn = getattr(self._local, 'conexion', None)
+        if conn is not None and self._local.profundidad == 0 and not self._esta_sana(conn):
+            with self._lock:
+                self._descartadas += 1
+            self._local.conexion = conn = None
+        if conn is None:
+            conn = self._nueva_conexion()
+            self._local.conexion = conn
+            self._local.profundidad = 0
+        if self._local.profundidad == 0:
+            with self._lock:
+                self._en_uso += 1
+        self._local.profundidad += 1
+        with self._lock:
+            self._obtenciones += 1
+        return conn
+
+    def devolver(self, conn):
+        if getattr(self._local, 'conexion', None) is not conn:
+            # Conexión ajena a este hilo (no debería ocurrir): se cierra sin más.
+            conn.cerrar_definitivamente()
+            return
+        self._local.profundidad -= 1
+        if self._local.profundidad > 0:
+            return
+        with self._lock:
+            self._en_uso -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback_fisico()
+        except sqlite3.Error:
+            self._local.conexion = None
+            with self._lock:
+                self._descartadas += 1
+            conn.cerrar_definitivamente()
+
+    def cerrar(self):
+        """Cierra la conexión del hilo actual (las de otros hilos se cierran al terminar cada hilo)."""
+        conn = getattr(self._local, 'conexion', None)
+        if conn is not None:
+            self._local.conexion = None
+            conn.cerrar_definitivamente()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'motor': 'sqlite',
+                'minimo': 0,
+                'maximo': None,
+                'total': self._abiertas,
+                'en_uso': self._en_uso,
+                'inactivas': max(self._abiertas - self._en_uso, 0),
+                'obtenciones': self._obtenciones,
+                'esperas': 0,
+                'tiempo_espera_total': 0.0,
+                'tiempo_espera_max': 0.0,
+                'tiempo_espera_promedio': 0.0,
+                'agotamientos': 0,
+                'creadas': self._creadas,
+                'descartadas': self._descartadas,
+            }
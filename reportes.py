@@ -0,0 +1,115 @@
+"""
+Indicadores del taller para el tablero: reparaciones por semana, tiempo promedio en el taller,
+facturación (suma de costo_total) y carga de cada mecánico.
+
+Se calculan desde resumen_reparaciones_diario, una fila por día de ingreso, mecánico y estado
+que gestor_datos mantiene al día en cada escritura sobre reparaciones: leer un período cuesta
+O(días del período), no O(reparaciones). Cada reparación cuenta en la semana en que ingresó;
+su tiempo en el taller y su costo se suman allí cuando sale o cambia de estado.
+
+La tarea periódica (cron, Programador de tareas) recalcula el resumen desde reparaciones, por
+si algo las modificó por fuera de la aplicación:
+    python reportes.py                          # todo el historial
+    python reportes.py --desde 2025-01-01       # sólo desde una fecha
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+import agenda
+import bitacora
+import gestor_datos
+
+SEMANAS = int(os.environ.get('REPORTES_SEMANAS', 12))
+SEMANAS_MAXIMO = 104
+
+# Mismo criterio que ESTADOS_REPARACION_ACTIVA en SQL.
+ESTADOS_EN_CURSO = ('En Progreso', 'Pendiente', 'En Espera de Piezas')
+# Estados cuyo costo_total cuenta como facturado.
+ESTADOS_FACTURADOS = ('Completado',)
+SIN_MECANICO = 'Sin asignar'
+
+
+def _acumulado():
+    return {'reparaciones': 0, 'en_curso': 0, 'finalizadas': 0, 'dias_en_taller': 0, 'facturado': 0.0}
+
+
+def _sumar(acumulado, fila):
+    acumulado['reparaciones'] += fila['cantidad']
+    acumulado['finalizadas'] += fila['finalizadas']
+    acumulado['dias_en_taller'] += fila['dias_en_taller']
+    if fila['estado'] in ESTADOS_EN_CURSO:
+        acumulado['en_curso'] += fila['cantidad']
+    if fila['estado'] in ESTADOS_FACTURADOS:
+        acumulado['facturado'] += float(fila['facturado'])  # Decimal en PostgreSQL.
+
+
+def _con_promedio(acumulado):
+    """Agrega promedio_dias (días en el taller de las que ya salieron; None si ninguna salió)."""
+    finalizadas = acumulado['finalizadas']
+    acumulado['promedio_dias'] = round(acumulado['dias_en_taller'] / finalizadas, 1) if finalizadas else None
+    acumulado['facturado'] = round(acumulado['facturado'], 2)
+    return acumulado
+
+
+def tablero(semanas=SEMANAS, hoy=None):
+    """
+    Indicadores de las últimas `semanas` semanas (de lunes a domingo, la actual incluida):
+    {'desde', 'hasta', 'totales', 'semanas': [...], 'mecanicos': [...], 'estados': [...]}.
+    Cada semana, mecánico y estado trae reparaciones, en_curso, finalizadas, promedio_dias y
+    facturado. Están todas las semanas del período y todos los mecánicos, aunque no tengan datos.
+    """
+    semanas = max(1, min(int(semanas), SEMANAS_MAXIMO))
+    lunes, hasta = agenda.semana(hoy or date.today())
+    desde = lunes - timedelta(weeks=semanas - 1)
+
+    nombres = {mecanico['id']: f"{mecanico['nombre']} {mecanico['apellido']}"
+               for mecanico in gestor_datos.obtener_todos_los_mecanicos()}
+    totales = _acumulado()
+    por_semana = {desde + timedelta(weeks=n): _acumulado() for n in range(semanas)}
+    por_mecanico = {mecanico_id: _acumulado() for mecanico_id in nombres}
+    por_estado = {}
+    for fila in gestor_datos.obtener_resumen_reparaciones(desde, hasta):
+        dia = date.fromisoformat(fila['dia'])
+        for acumulado in (totales, por_semana[agenda.semana(dia)[0]],
+                          por_mecanico.setdefault(fila['mecanico_id'], _acumulado()),
+                          por_estado.setdefault(fila['estado'], _acumulado())):
+            _sumar(acumulado, fila)
+
+    mecanicos = [{'mecanico_id': mecanico_id or None,
+                  'nombre': nombres.get(mecanico_id, SIN_MECANICO if not mecanico_id else f'#{mecanico_id}'),
+                  **_con_promedio(acumulado)}
+                 for mecanico_id, acumulado in por_mecanico.items()]
+    mecanicos.sort(key=lambda mecanico: (-mecanico['en_curso'], -mecanico['reparaciones'], mecanico['nombre']))
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'totales': _con_promedio(totales),
+        'semanas': [{'semana': lunes_semana.isoformat(), **_con_promedio(acumulado)}
+                    for lunes_semana, acumulado in por_semana.items()],
+        'mecanicos': mecanicos,
+        'estados': [{'estado': estado, **_con_promedio(acumulado)}
+                    for estado, acumulado in sorted(por_estado.items(), key=lambda item: -item[1]['reparaciones'])],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula el resumen diario de reparaciones del tablero.")
+    parser.add_argument('--desde', type=date.fromisoformat, help="fecha de ingreso inicial (YYYY-MM-DD)")
+    parser.add_argument('--hasta', type=date.fromisoformat, help="fecha de ingreso final, excluida")
+    args = parser.parse_args(argv)
+
+    if not gestor_datos.asegurar_esquema():
+        print("No se pudo preparar la base de datos.", file=sys.stderr)
+        return 2
+    if not gestor_datos.refrescar_resumen_reparaciones(args.desde, args.hasta):
+        print("No se pudo recalcular el resumen de reparaciones.", file=sys.stderr)
+        return 1
+    print("Resumen de reparaciones recalculado.")
+    return 0
+
+
+if __name__ == '__main__':
+    bitacora.configurar()
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Registro de las sentencias SQL de gestor_datos, armadas una sola vez por dialecto.
+
+Cada sentencia se escribe una vez como plantilla con estos campos:
+  {p}                   marcador de parámetro ('?' en SQLite, '%s' en PostgreSQL)
+  {ahora}               fecha y hora actual en UTC
+  {sello}               asignaciones que marcan una fila como modificada (version, actualizado_en)
+  {retornar_id}         ' RETURNING id' en PostgreSQL; en SQLite se usa cursor.lastrowid
+  {estados_activa}      ESTADOS_REPARACION_ACTIVA como lista SQL
+  {estados_turno}       ESTADOS_TURNO_LISTADO como lista SQL
+  {estados_ocupa}       ESTADOS_TURNO_OCUPA como lista SQL
+  {texto_clientes}      TEXTO_BUSQUEDA_CLIENTES (expresión del índice trigram de clientes)
+  {texto_vehiculos}     TEXTO_BUSQUEDA_VEHICULOS (ídem para vehiculos)
+  {fecha:columna}       la columna de fecha como texto 'YYYY-MM-DD' (p. ej. {fecha:t.fecha_hora})
+  {hora:columna}        la columna de fecha y hora como texto 'HH:MM'
+y registrar() la traduce al importar el módulo. Así el texto de cada sentencia es siempre el
+mismo: la caché de sentencias de sqlite3 la reutiliza en lugar de volver a compilarla, y en
+PostgreSQL las marcadas con preparar=True se preparan (PREPARE) una vez por conexión física y
+luego sólo se ejecutan (EXECUTE), sin volver a analizarlas ni planificarlas.
+
+DB_SENTENCIAS_PREPARADAS=0 desactiva PREPARE (p. ej. detrás de PgBouncer en modo transacción,
+donde la sesión no pertenece a una sola conexión física).
+"""
+import os
+import string
+
+import psycopg2
+from psycopg2 import errors as psycopg2_errors
+
+from migraciones.indices import (ESTADOS_REPARACION_ACTIVA, ESTADOS_TURNO_LISTADO, ESTADOS_TURNO_OCUPA,
+                                 TEXTO_BUSQUEDA_CLIENTES, TEXTO_BUSQUEDA_VEHICULOS)
+
+SQLITE = 'sqlite'
+POSTGRESQL = 'postgresql'
+
+PREPARADAS = os.environ.get('DB_SENTENCIAS_PREPARADAS', '1') != '0'
+
+_AHORA_UTC = {
+    SQLITE: 'CURRENT_TIMESTAMP',  # En SQLite CURRENT_TIMESTAMP ya es UTC.
+    POSTGRESQL: "(CURRENT_TIMESTAMP AT TIME ZONE 'UTC')",
+}
+
+# Las fechas se devuelven como texto con el mismo formato en ambos motores (el que usan los
+# formularios y las respuestas JSON), aunque PostgreSQL las guarde como DATE / TIMESTAMP.
+_FORMATO_FECHA = {SQLITE: 'date({})', POSTGRESQL: "to_char({}, 'YYYY-MM-DD')"}
+_FORMATO_HORA = {SQLITE: "strftime('%H:%M', {})", POSTGRESQL: "to_char({}, 'HH24:MI')"}
+
+
+class _Formato:
+    """Campo con la columna como especificación: '{fecha:t.fecha_hora}' -> date(t.fecha_hora)."""
+
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+    def __format__(self, columna):
+        return self.plantilla.format(columna)
+
+
+def _fragmentos(dialecto, marcador):
+    ahora = _AHORA_UTC[dialecto]
+    return {
+        'p': marcador,
+        'ahora': ahora,
+        'sello': f'version = version + 1, actualizado_en = {ahora}',
+        'retornar_id': ' RETURNING id' if dialecto == POSTGRESQL else '',
+        'estados_activa': str(ESTADOS_REPARACION_ACTIVA),
+        'estados_turno': str(ESTADOS_TURNO_LISTADO),
+        'estados_ocupa': str(ESTADOS_TURNO_OCUPA),
+        'texto_clientes': TEXTO_BUSQUEDA_CLIENTES,
+        'texto_vehiculos': TEXTO_BUSQUEDA_VEHICULOS,
+        'fecha': _Formato(_FORMATO_FECHA[dialecto]),
+        'hora': _Formato(_FORMATO_HORA[dialecto]),
+    }
+
+
+class _Numerados:
+    """Marcador que al formatearse devuelve $1, $2, ... (parámetros de PREPARE)."""
+
+    def __init__(self):
+        self.cantidad = 0
+
+    def __format__(self, especificacion):
+        self.cantidad += 1
+        return f'${self.cantidad}'
+
+
+def _campos(plantilla):
+    return {campo for _, campo, _, _ in string.Formatter().parse(plantilla) if campo}
+
+
+def dialecto(conn):
+    return POSTGRESQL if isinstance(conn, psycopg2.extensions.connection) else SQLITE
+
+
+def marcador(conn):
+    return '%s' if isinstance(conn, psycopg2.extensions.connection) else '?'
+
+
+class Sentencia:
+    """
+    Una sentencia con su texto para cada dialecto. ejecutar(cursor, parametros) elige el
+    texto según la conexión del cursor y, si corresponde, usa la versión preparada.
+    """
+
+    def __init__(self, nombre, plantillas, preparar=False):
+        self.nombre = nombre
+        self.preparar = preparar
+        self.textos = {d: ' '.join(plantillas[d].format(**_fragmentos(d, marcador_d)).split())
+                       for d, marcador_d in ((SQLITE, '?'), (POSTGRESQL, '%s'))}
+        self._preparar_sql = self._ejecutar_sql = None
+        if preparar:
+            numerados = _Numerados()
+            cuerpo = ' '.join(plantillas[POSTGRESQL].format(**_fragmentos(POSTGRESQL, numerados)).split())
+            nombre_pg = f'taller_{nombre}'
+            self._preparar_sql = f'PREPARE {nombre_pg} AS {cuerpo}'
+            argumentos = ', '.join(['%s'] * numerados.cantidad)
+            self._ejecutar_sql = f'EXECUTE {nombre_pg} ({argumentos})' if argumentos else f'EXECUTE {nombre_pg}'
+
+    def texto(self, conn):
+        return self.textos[dialecto(conn)]
+
+    def ejecutar(self, cursor, parametros=()):
+        conn = cursor.connection
+        if not isinstance(conn, psycopg2.extensions.connection):
+            return cursor.execute(self.textos[SQLITE], parametros)
+        # Un cursor con nombre envuelve la sentencia en DECLARE ... CURSOR FOR, que no admite EXECUTE.
+        if not (self.preparar and PREPARADAS) or cursor.name is not None:
+            return cursor.execute(self.textos[POSTGRESQL], parametros)
+        # Las sentencias preparadas viven en la sesión: se anotan en la conexión física.
+        preparadas = getattr(conn, '_sentencias_preparadas', None)
+        if preparadas is None:
+            preparadas = conn._sentencias_preparadas = set()
+        if self.nombre not in preparadas:
+            cursor.execute(self._preparar_sql)
+            preparadas.add(self.nombre)
+        try:
+            return cursor.execute(self._ejecutar_sql, parametros)
+        except psycopg2_errors.InvalidSqlStatementName:
+            # La sesión perdió la sentencia (DISCARD, reinicio de sesión): se vuelve a preparar la próxima vez.
+            preparadas.discard(self.nombre)
+            raise
+
+
+_registro = {}
+
+
+def registrar(nombre, plantilla=None, preparar=False, **por_dialecto):
+    """
+    Registra la sentencia `nombre` y la devuelve. `plantilla` sirve para ambos dialectos;
+    si difieren, se pasan sqlite=... y postgresql=... por separado.
+    """
+    if nombre in _registro:
+        raise ValueError(f"La sentencia '{nombre}' ya está registrada.")
+    plantillas = {SQLITE: por_dialecto.get(SQLITE, plantilla), POSTGRESQL: por_dialecto.get(POSTGRESQL, plantilla)}
+    if None in plantillas.values():
+        raise ValueError(f"La sentencia '{nombre}' necesita una plantilla para cada dialecto.")
+    desconocidos = set().union(*(_campos(p) for p in plantillas.values())) - set(_fragmentos(SQLITE, '?'))
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos en la sentencia '{nombre}': {', '.join(sorted(desconocidos))}")
+    sentencia = Sentencia(nombre, plantillas, preparar)
+    _registro[nombre] = sentencia
+    return sentencia
+
+
+def registradas():
+    """Todas las sentencias registradas, por nombre."""
+    return dict(_registro)
+
+
+def texto_dinamico(conn, plantilla):
+    """
+    Traduce una plantilla que no se puede registrar de antemano (se arma con partes variables).
+    Quien la use debe acotar sus formas posibles para no anular la caché de sentencias.
+    """
+    return ' '.join(plantilla.format(**_fragmentos(dialecto(conn), marcador(conn))).split())
@@ -239,10 +239,11 @@ const RegisterComponent = ({ onRegisterSuccess, onNavigateToLogin }) => {
  * @param {object} props - Propiedades del componente.
  * @param {object} props.cliente - Objeto con los datos del cliente.
  * @param {Array<object>} props.vehiculos - Array de objetos con los datos de los vehículos del cliente.
+ * @param {object} props.estados - Estado de cada vehículo (por id), cargado por App en una sola petición.
  * @param {function} props.onSelectVehicle - Función a llamar al seleccionar un vehículo para ver sus detalles.
  * @param {function} props.onLogout - Función a llamar para cerrar la sesión.
  */
-const DashboardComponent = ({ cliente, vehiculos, onSelectVehicle, onLogout }) => {
+const DashboardComponent = ({ cliente, vehiculos, estados, onSelectVehicle, onLogout }) => {
     // Estados internos para asegurar que los datos se actualizan si las props cambian
     const [clienteDataState, setClienteDataState] = React.useState(cliente);
     const [vehiculosDataState, setVehiculosDataState] = React.useState(vehiculos);
@@ -280,6 +281,7 @@ const DashboardComponent = ({ cliente, vehiculos, onSelectVehicle, onLogout }) =
                             React.createElement("p", { className: "text-lg text-gray-700" }, "Patente: ", React.createElement("span", { className: "font-semibold" }, vehiculo.patente)),
                             React.createElement("p", { className: "text-sm text-gray-600" }, `Año: ${vehiculo.anio}`),
                             React.createElement("p", { className: "text-sm text-gray-600" }, `KM inicial: ${vehiculo.kilometraje_inicial}`),
+                            estados[vehiculo.id] && estados[vehiculo.id].reparacion_activa && React.createElement("p", { className: "mt-2 text-sm font-semibold text-yellow-800" }, `En taller: ${estados[vehiculo.id].reparacion_activa.estado}`),
                             React.createElement("button", { className: "mt-4 bg-blue-500 text-white px-4 py-2 rounded-md text-sm hover:bg-blue-600 transition duration-300" }, "Ver Detalles")
                         )
                     ))
@@ -292,72 +294,40 @@ const DashboardComponent = ({ cliente, vehiculos, onSelectVehicle, onLogout }) =
 /**
  * Componente para mostrar los detalles de un vehículo y su historial de reparaciones.
  * También muestra el estado actual de la reparación si el vehículo está en taller.
+ * Los datos los carga App para todos los vehículos a la vez (ver fetchEstadoVehiculos).
  * @param {object} props - Propiedades del componente.
  * @param {object} props.vehicle - Objeto con los datos del vehículo seleccionado.
+ * @param {object} props.estado - Estado del vehículo: reparacion_activa, historial reciente y hay_mas_historial.
  * @param {function} props.onBackToDashboard - Función a llamar para volver al dashboard.
  */
-const VehicleDetailComponent = ({ vehicle, onBackToDashboard }) => {
-    const [historial, setHistorial] = React.useState([]);
-    const [activeRepair, setActiveRepair] = React.useState(null);
+const VehicleDetailComponent = ({ vehicle, estado, onBackToDashboard }) => {
+    // Historial completo, sólo si el cliente lo pide (el estado trae las últimas reparaciones).
+    const [historialCompleto, setHistorialCompleto] = React.useState(null);
     const [message, setMessage] = React.useState('');
-    const [pollingInterval, setPollingInterval] = React.useState(null);
-    const [lastKnownStatus, setLastKnownStatus] = React.useState(null); // Para notificaciones de cambio de estado
 
-    // Función asíncrona para obtener el estado actual y el historial del vehículo
-    const fetchVehicleData = async () => {
-        setMessage(''); // Limpia mensajes anteriores
+    React.useEffect(() => {
+        setHistorialCompleto(null);
+        setMessage('');
+    }, [vehicle.id]);
+
+    const activeRepair = estado ? estado.reparacion_activa : null;
+    const historial = historialCompleto || (estado ? estado.historial : []);
+
+    const fetchHistorialCompleto = async () => {
         try {
-            // Petición para obtener el Historial de Reparaciones
             const historialResponse = await fetch(`${API_BASE_URL}/api/vehiculo/${vehicle.id}/historial`);
             const historialData = await historialResponse.json();
-            console.log("DEBUG REACT: Respuesta historial:", historialData);
             if (historialData.success) {
-                setHistorial(historialData.historial);
+                setHistorialCompleto(historialData.historial);
             } else {
                 setMessage('Error al cargar el historial: ' + (historialData.message || 'Error desconocido.'));
-                console.error("DEBUG REACT: Error en historial API:", historialData);
-            }
-
-            // Petición para obtener el Estado Activo de la Reparación
-            const activeResponse = await fetch(`${API_BASE_URL}/api/vehiculo/${vehicle.id}/estado_activo`);
-            const activeData = await activeResponse.json();
-            console.log("DEBUG REACT: Respuesta estado activo:", activeData);
-            if (activeData.success && activeData.reparacion) {
-                setActiveRepair(activeData.reparacion);
-                // Lógica para reproducir un sonido si el estado de la reparación ha cambiado
-                if (lastKnownStatus && lastKnownStatus !== activeData.reparacion.estado) {
-                    notificationSound.play(); 
-                    alert(`¡Actualización de estado para ${vehicle.patente}! Nuevo estado: ${activeData.reparacion.estado}`);
-                }
-                setLastKnownStatus(activeData.reparacion.estado); // Actualiza el último estado conocido
-            } else {
-                setActiveRepair(null); // No hay reparación activa
-                setLastKnownStatus(null);
-                setMessage('No hay reparación activa para este vehículo.');
-                console.error("DEBUG REACT: Error en estado activo API o no hay datos:", activeData);
             }
         } catch (error) {
-            setMessage('Error de conexión al cargar datos del vehículo.');
-            console.error('DEBUG REACT: Error en fetch general:', error);
+            setMessage('Error de conexión al cargar el historial del vehículo.');
+            console.error('DEBUG REACT: Error al cargar historial completo:', error);
         }
     };
 
-    React.useEffect(() => {
-        console.log("DEBUG: VehicleDetailComponent montado. ID del vehículo:", vehicle.id);
-        fetchVehicleData(); // Carga inicial de datos al montar el componente
-
-        // Configura un intervalo para "polling" (obtener actualizaciones periódicamente)
-        const interval = setInterval(fetchVehicleData, 15000); // Poll cada 15 segundos
-        setPollingInterval(interval);
-
-        // Función de limpieza: se ejecuta al desmontar el componente para limpiar el intervalo
-        return () => {
-            if (pollingInterval) {
-                clearInterval(pollingInterval);
-            }
-        };
-    }, [vehicle.id]); // El efecto se re-ejecuta si el ID del vehículo cambia
-
     if (!vehicle) {
         return React.createElement("div", { className: "text-center p-8" }, "Seleccione un vehículo.");
     }
@@ -369,7 +339,9 @@ const VehicleDetailComponent = ({ vehicle, onBackToDashboard }) => {
             React.createElement("p", { className: "text-xl text-gray-700 mb-6" }, `${vehicle.marca} ${vehicle.modelo} (${vehicle.anio})`),
             message && React.createElement("p", { className: "mb-4 text-center text-red-500" }, message),
             React.createElement("h3", { className: "text-2xl font-semibold mb-4 text-gray-700" }, "Estado Actual en Taller:"),
-            activeRepair ? (
+            !estado ? (
+                React.createElement("p", { className: "text-gray-600 mb-8" }, "Cargando estado del vehículo...")
+            ) : activeRepair ? (
                 React.createElement("div", { className: "bg-yellow-50 p-6 rounded-lg shadow-md border border-yellow-200 mb-8" },
                     React.createElement("p", { className: "text-lg font-bold text-yellow-800 mb-2" }, `Estado: ${activeRepair.estado}`),
                     React.createElement("p", { className: "text-gray-700" }, `Fecha de Ingreso: ${activeRepair.fecha_ingreso}`),
@@ -400,7 +372,11 @@ const VehicleDetailComponent = ({ vehicle, onBackToDashboard }) => {
                         )
                     ))
                 )
-            )
+            ),
+            estado && estado.hay_mas_historial && !historialCompleto && React.createElement("button", {
+                onClick: fetchHistorialCompleto,
+                className: "mt-6 bg-blue-500 text-white px-4 py-2 rounded-md text-sm hover:bg-blue-600 transition duration-300"
+            }, "Ver historial completo")
         )
     );
 };
@@ -415,6 +391,11 @@ const App = () => {
     const [clienteData, setClienteData] = React.useState(null);
     const [vehiculosData, setVehiculosData] = React.useState([]);
     const [selectedVehicle, setSelectedVehicle] = React.useState(null); 
+    // Estado de cada vehículo (por id): reparación activa e historial reciente.
+    const [estadoVehiculos, setEstadoVehiculos] = React.useState({});
+    // Último estado conocido de la reparación activa de cada vehículo, para avisar cuando cambia.
+    // Es una ref para que los manejadores del canal de eventos lean siempre el valor actual.
+    const lastKnownStatus = React.useRef({});
     const [currentView, setCurrentView] = React.useState('login'); // Vista inicial: login
 
     // Efecto para verificar la sesión del usuario al cargar la aplicación
@@ -485,6 +466,60 @@ const App = () => {
         fetchDashboardData();
     }, [isLoggedIn, clienteId]); // Se ejecuta cuando el estado de login o el ID del cliente cambian
 
+    // Carga el estado de todos los vehículos del cliente en una sola petición.
+    const fetchEstadoVehiculos = async () => {
+        try {
+            const response = await fetch(`${API_BASE_URL}/api/cliente/vehiculos/estado`);
+            const data = await response.json();
+            if (!data.success) {
+                console.error('Error al cargar el estado de los vehículos:', data.message);
+                return;
+            }
+            const porVehiculo = {};
+            data.vehiculos.forEach(item => {
+                const vehiculo = item.vehiculo;
+                porVehiculo[vehiculo.id] = item;
+                const nuevoEstado = item.reparacion_activa ? item.reparacion_activa.estado : null;
+                const estadoAnterior = lastKnownStatus.current[vehiculo.id];
+                // Reproduce un sonido si el estado de la reparación ha cambiado
+                if (estadoAnterior && nuevoEstado && estadoAnterior !== nuevoEstado) {
+                    notificationSound.play();
+                    alert(`¡Actualización de estado para ${vehiculo.patente}! Nuevo estado: ${nuevoEstado}`);
+                }
+                lastKnownStatus.current[vehiculo.id] = nuevoEstado;
+            });
+            setEstadoVehiculos(porVehiculo);
+        } catch (error) {
+            console.error('Error de conexión al cargar el estado de los vehículos:', error);
+        }
+    };
+
+    // Efecto para mantener actualizado el estado de los vehículos mientras hay sesión
+    React.useEffect(() => {
+        if (!isLoggedIn || !clienteId) {
+            return undefined;
+        }
+        fetchEstadoVehiculos(); // Carga inicial
+
+        // En lugar de consultar periódicamente, el servidor avisa por Server-Sent Events cuando
+        // cambia el estado o los costos de una reparación; sólo entonces se recarga el estado.
+        const eventos = new EventSource(`${API_BASE_URL}/api/cliente/eventos`);
+        eventos.addEventListener('reparacion', () => fetchEstadoVehiculos());
+        // El servidor pide recargar todo si se perdieron eventos.
+        eventos.addEventListener('resincronizar', () => fetchEstadoVehiculos());
+        // EventSource se reconecta solo; al reconectar se recarga por si hubo cambios mientras tanto.
+        let conectadoAntes = false;
+        eventos.onopen = () => {
+            if (conectadoAntes) {
+                fetchEstadoVehiculos();
+            }
+            conectadoAntes = true;
+        };
+
+        // Función de limpieza: cierra el canal de eventos al cerrar sesión
+        return () => eventos.close();
+    }, [isLoggedIn, clienteId]);
+
     // Callback para cuando el login es exitoso
     const handleLoginSuccess = (id) => {
         setClienteId(id);
@@ -501,6 +536,8 @@ const App = () => {
             setClienteData(null);
             setVehiculosData([]);
             setSelectedVehicle(null);
+            setEstadoVehiculos({});
+            lastKnownStatus.current = {};
             setCurrentView('login'); // Vuelve a la vista de login
             console.log("DEBUG: Sesión cerrada y estado reseteado.");
         } catch (error) {
@@ -536,13 +573,13 @@ const App = () => {
                 return React.createElement(RegisterComponent, { onRegisterSuccess: () => setCurrentView('login'), onNavigateToLogin: () => setCurrentView('login') });
             case 'dashboard':
                 return isLoggedIn && clienteData ? (
-                    React.createElement(DashboardComponent, { cliente: clienteData, vehiculos: vehiculosData, onSelectVehicle: handleSelectVehicle, onLogout: handleLogout })
+                    React.createElement(DashboardComponent, { cliente: clienteData, vehiculos: vehiculosData, estados: estadoVehiculos, onSelectVehicle: handleSelectVehicle, onLogout: handleLogout })
                 ) : (
                     React.createElement('div', { className: 'text-center p-8' }, 'Cargando dashboard...')
                 );
             case 'vehicleDetail':
                 return selectedVehicle ? (
-                    React.createElement(VehicleDetailComponent, { vehicle: selectedVehicle, onBackToDashboard: handleBackToDashboard })
+                    React.createElement(VehicleDetailComponent, { vehicle: selectedVehicle, estado: estadoVehiculos[selectedVehicle.id], onBackToDashboard: handleBackToDashboard })
                 ) : (
                     React.createElement('div', { className: "text-center p-8" }, 'Vehículo no seleccionado.')
                 );
@@ -0,0 +1,48 @@
+"""Typeahead de clientes y vehículos: DNI y patentes se encuentran con o sin puntos y guiones."""
+import pytest
+
+import gestor_datos
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    gestor_datos.cerrar_pool()
+    monkeypatch.setattr(gestor_datos, 'DATABASE_FILE', str(tmp_path / 'taller_mecanico.db'))
+    monkeypatch.setattr(gestor_datos, '_esquema_verificado', False)
+    assert gestor_datos.asegurar_esquema()
+    cliente_id = gestor_datos.agregar_cliente('Juan', 'Pérez', '1155550000', 'juan@example.com', '20.123.456')
+    otro_id = gestor_datos.agregar_cliente('Ana', 'Gómez', '1155551111', 'ana@example.com', '30111222')
+    gestor_datos.agregar_vehiculo(cliente_id, 'AB-123-CD', 'Ford', 'Ka', 2015, 80000)
+    gestor_datos.agregar_vehiculo(otro_id, 'AC456DE', 'Fiat', 'Uno', 2012, 120000)
+    yield cliente_id
+    gestor_datos.cerrar_pool()
+
+
+@pytest.mark.parametrize('texto', ['AB-123-CD', 'AB-123', 'AB123', 'ab123cd', 'AB 123', 'ford ab-1'])
+def test_patente_con_guiones(base, texto):
+    assert [vehiculo['patente'] for vehiculo in gestor_datos.buscar_vehiculos(texto)] == ['AB-123-CD']
+
+
+@pytest.mark.parametrize('texto', ['AC-456-DE', 'AC-456', 'AC456'])
+def test_patente_sin_guiones(base, texto):
+    assert [vehiculo['patente'] for vehiculo in gestor_datos.buscar_vehiculos(texto)] == ['AC456DE']
+
+
+@pytest.mark.parametrize('texto', ['20.123.456', '20123456', '20.123', '2012', 'perez 20.123'])
+def test_dni_con_puntos(base, texto):
+    assert [cliente['dni'] for cliente in gestor_datos.buscar_clientes(texto)] == ['20.123.456']
+
+
+@pytest.mark.parametrize('texto', ['30.111.222', '30111222', '30.111'])
+def test_dni_sin_puntos(base, texto):
+    assert [cliente['dni'] for cliente in gestor_datos.buscar_clientes(texto)] == ['30111222']
+
+
+def test_vehiculos_por_dni_del_cliente(base):
+    assert [vehiculo['patente'] for vehiculo in gestor_datos.buscar_vehiculos('20123456')] == ['AB-123-CD']
+
+
+def test_actualizar_dni_reindexa(base):
+    assert gestor_datos.actualizar_cliente(base, 'Juan', 'Pérez', '1155550000', 'juan@example.com', '21.000.000')
+    assert [cliente['dni'] for cliente in gestor_datos.buscar_clientes('21000000')] == ['21.000.000']
+    assert gestor_datos.buscar_clientes('20123456') == []
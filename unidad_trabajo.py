@@ -0,0 +1,183 @@
+import itertools
+import logging
+import sqlite3
+import threading
+
+import psycopg2
+from psycopg2 import Error as Psycopg2Error
+
+log = logging.getLogger(__name__)
+
+# Unidad de trabajo activa en el hilo actual (una por petición HTTP).
+_local = threading.local()
+
+
+class UnidadDeTrabajo:
+    """
+    Agrupa todas las llamadas a gestor_datos de una petición sobre una sola conexión
+    y una sola transacción.
+    Las acciones registradas con al_confirmar() se ejecutan después del commit real
+    y se descartan si la unidad se deshace.
+
+    La conexión se pide al pool recién cuando alguna función de datos la necesita.
+    Cada función que la usa trabaja dentro de su propio SAVEPOINT: su commit() libera el
+    savepoint, su rollback() vuelve a él y su close() descarta lo que no confirmó. Así cada
+    función conserva su comportamiento, pero nada se confirma en la base hasta finalizar().
+
+    En SQLite la transacción de una unidad de escritura (`escritura=True`, las peticiones que no
+    son GET) empieza con BEGIN IMMEDIATE: toma el bloqueo de escritura de entrada, esperando el
+    busy_timeout si otro lo tiene. Con un BEGIN diferido, una lectura fija la instantánea del WAL
+    y, si otro escritor confirma antes de la primera escritura de la unidad, esa escritura falla
+    en el acto con "database is locked" (SQLite no puede reintentarla: la instantánea ya quedó
+    vieja). Las unidades de lectura siguen con BEGIN diferido, sin bloquear a nadie.
+    """
+
+    def __init__(self, obtener_del_pool, escritura=False):
+        self._obtener_del_pool = obtener_del_pool
+        self.escritura = escritura
+        self.conexion = None
+        self._es_postgresql = False
+        self._marcas = []  # Pila de [nombre_savepoint, abierto]
+        self._contador = itertools.count(1)
+        self._fallida = False
+        self._al_confirmar = []
+        # Tablas que la unidad modificó y todavía no confirmó: sus lecturas no pasan por la caché.
+        self.tablas_escritas = set()
+
+    def al_confirmar(self, funcion):
+        """Registra una función a llamar (sin argumentos) sólo si la unidad se confirma."""
+        self._al_confirmar.append(funcion)
+
+    def _ejecutar(self, *sentencias):
+        cursor = self.conexion.cursor()
+        try:
+            if self._es_postgresql:
+                cursor.execute('; '.join(sentencias))
+            else:
+                for sentencia in sentencias:
+                    cursor.execute(sentencia)
+        finally:
+            cursor.close()
+
+    def entrar(self):
+        """Devuelve la conexión de la unidad abriendo un savepoint para la función que la pide."""
+        if self.conexion is None:
+            conn = self._obtener_del_pool()
+            if conn is None:
+                return None
+            self._es_postgresql = isinstance(conn, psycopg2.extensions.connection)
+            self.conexion = conn
+            if not self._es_postgresql:
+                # sqlite3 no abre la transacción por sí solo antes de un SAVEPOINT.
+                try:
+                    self._ejecutar('BEGIN IMMEDIATE' if self.escritura else 'BEGIN')
+                except sqlite3.Error as e:
+                    log.error("Error al abrir la transacción de la unidad de trabajo: %s", e)
+                    self.conexion = None
+                    conn.close()
+                    self._fallida = True
+                    return None
+            conn._unidad = self
+        nombre = f'unidad_{next(self._contador)}'
+        try:
+            self._ejecutar(f'SAVEPOINT {nombre}')
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al abrir savepoint en la unidad de trabajo: %s", e)
+            self._fallida = True
+            return None
+        self._marcas.append([nombre, True])
+        return self.conexion
+
+    def confirmar_marca(self):
+        """commit() de una función dentro de la unidad: libera su savepoint."""
+        if not self._marcas or not self._marcas[-1][1]:
+            return
+        marca = self._marcas[-1]
+        marca[1] = False
+        try:
+            self._ejecutar(f'RELEASE SAVEPOINT {marca[0]}')
+        except (sqlite3.Error, Psycopg2Error):
+            self._fallida = True
+            raise
+
+    def deshacer_marca(self):
+        """rollback() de una función dentro de la unidad: vuelve al estado previo a su savepoint."""
+        if not self._marcas or not self._marcas[-1][1]:
+            return
+        marca = self._marcas[-1]
+        marca[1] = False
+        try:
+            self._ejecutar(f'ROLLBACK TO SAVEPOINT {marca[0]}', f'RELEASE SAVEPOINT {marca[0]}')
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al deshacer savepoint %s: %s", marca[0], e)
+            self._fallida = True
+
+    def salir(self):
+        """close() de una función dentro de la unidad: descarta lo que no confirmó, como al cerrar una conexión."""
+        if not self._marcas:
+            return
+        if self._marcas[-1][1]:
+            self.deshacer_marca()
+        self._marcas.pop()
+
+    def finalizar(self, exito=True):
+        """
+        Confirma (o deshace) la transacción completa y devuelve la conexión al pool.
+        Devuelve True si los cambios quedaron confirmados.
+        """
+        conn = self.conexion
+        pendientes, self._al_confirmar = self._al_confirmar, []
+        if conn is None:
+            return True
+        self.conexion = None
+        self._marcas = []
+        conn._unidad = None
+        confirmado = False
+        try:
+            if exito and not self._fallida:
+                conn.commit_fisico()
+                confirmado = True
+            else:
+                conn.rollback_fisico()
+        except (sqlite3.Error, Psycopg2Error) as e:
+            log.error("Error al finalizar la unidad de trabajo: %s", e)
+            try:
+                conn.rollback_fisico()
+            except (sqlite3.Error, Psycopg2Error):
+                pass
+        finally:
+            conn.close()
+        if confirmado:
+            for funcion in pendientes:
+                try:
+                    funcion()
+                except Exception as e:
+                    log.error("Error en una acción posterior a la confirmación: %s", e)
+        return confirmado
+
+
+def activa():
+    """Devuelve la unidad de trabajo del hilo actual, o None."""
+    return getattr(_local, 'unidad', None)
+
+
+def iniciar(obtener_del_pool, escritura=False):
+    """
+    Abre una unidad de trabajo en el hilo actual (cerrando sin confirmar una anterior si quedó
+    abierta). `escritura` indica que la unidad va a escribir (ver UnidadDeTrabajo).
+    """
+    anterior = activa()
+    if anterior is not None:
+        anterior.finalizar(exito=False)
+    unidad = UnidadDeTrabajo(obtener_del_pool, escritura)
+    _local.unidad = unidad
+    return unidad
+
+
+def finalizar(exito=True):
+    """Finaliza la unidad de trabajo del hilo actual. Sin unidad activa, no hace nada y devuelve True."""
+    unidad = activa()
+    if unidad is None:
+        return True
+    _local.unidad = None
+    return unidad.finalizar(exito)